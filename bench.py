@@ -0,0 +1,320 @@
+"""Benchmarks for pathcleaner's registry and filesystem hot paths.
+
+Runs the ``main.py`` options against an instrumented in-memory registry and
+a fake filesystem, so it works on any OS and never touches the real PATH.
+For every operation and PATH size it reports wall time, registry calls and
+stat calls, and it can save the results as a baseline and fail when a later
+run regresses past a threshold.
+
+    python bench.py
+    python bench.py --sizes 10 100 --latency 0.001
+    python bench.py --save-baseline bench_baseline.json
+    python bench.py --baseline bench_baseline.json --threshold 0.25
+    python bench.py --startup-only --startup-budget 30
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import stat
+import sys
+import tempfile
+import time
+from collections import Counter
+from unittest import mock
+
+import fakereg
+import main
+import registry as registry_module
+
+
+DEFAULT_SIZES = [10, 100, 1000, 5000]
+DEFAULT_OPERATIONS = ["list", "get", "add", "remove", "audit", "clean"]
+DEFAULT_THRESHOLD = 0.25
+
+# Variables referenced by synthetic entries, and what they expand to.
+VARIABLES = {
+    "SystemRoot": "C:\\Windows",
+    "ProgramFiles": "C:\\Program Files",
+    "ProgramData": "C:\\ProgramData",
+    "LOCALAPPDATA": "C:\\Users\\bench\\AppData\\Local",
+}
+
+
+class InstrumentedWinreg(fakereg.FakeWinreg):
+    """A :class:`fakereg.FakeWinreg` that counts every API call."""
+
+    API = ["OpenKey", "CreateKey", "QueryValueEx", "SetValueEx", "DeleteValue", "EnumValue", "EnumKey", "FlushKey"]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: Counter = Counter()
+        for name in self.API:
+            setattr(self, name, self._counted(name, getattr(self, name)))
+
+    def _counted(self, name, method):
+        def counted(*args, **kwargs):
+            self.calls[name] += 1
+            return method(*args, **kwargs)
+
+        return counted
+
+
+class FakeFilesystem:
+    """Answers ``os.path.exists``/``os.stat`` for Windows-style paths from a set.
+
+    Paths that contain no backslash and no drive are passed through to the
+    real functions, so temp files and imports keep working. Every faked
+    probe sleeps for ``latency`` seconds and is counted.
+    """
+
+    def __init__(self, directories: set[str], latency: float = 0.0) -> None:
+        self.directories = {d.lower().rstrip("\\") for d in directories}
+        self.latency = latency
+        self.calls = 0
+        self._exists = os.path.exists
+        self._stat = os.stat
+
+    @staticmethod
+    def handles(path) -> bool:
+        path = os.fspath(path) if not isinstance(path, int) else ""
+        return "\\" in path or path[1:2] == ":"
+
+    def _probe(self, path) -> bool:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return os.fspath(path).lower().rstrip("\\") in self.directories
+
+    def exists(self, path) -> bool:
+        if not self.handles(path):
+            return self._exists(path)
+        return self._probe(path)
+
+    def stat(self, path, *args, **kwargs):
+        if not self.handles(path):
+            return self._stat(path, *args, **kwargs)
+        if not self._probe(path):
+            raise FileNotFoundError(2, "No such file or directory", path)
+        return os.stat_result((stat.S_IFDIR | 0o755, 0, 0, 1, 0, 0, 0, 0, 0, 0))
+
+    @contextlib.contextmanager
+    def installed(self):
+        with mock.patch("os.path.exists", self.exists), mock.patch("os.stat", self.stat):
+            yield self
+
+
+def synthetic_path(size: int, seed: int = 0, broken: float = 0.2) -> tuple[list[str], set[str]]:
+    """Generates a PATH of ``size`` entries and the directories that exist.
+
+    The mix includes plain local directories, ``%VAR%`` entries, UNC paths
+    and duplicates (exact and case/trailing-slash variants). About
+    ``broken`` of the entries do not exist.
+    """
+    rng = random.Random(seed)
+    entries: list[str] = []
+    existing: set[str] = set()
+    for i in range(size):
+        roll = rng.random()
+        if entries and roll < 0.08:
+            original = rng.choice(entries)
+            entries.append(rng.choice([original, original.upper(), original + "\\"]))
+            continue
+        if roll < 0.3:
+            name = rng.choice(list(VARIABLES))
+            entry = f"%{name}%\\Tool{i}\\bin"
+            target = f"{VARIABLES[name]}\\Tool{i}\\bin"
+        elif roll < 0.4:
+            entry = target = f"\\\\fileserver{i % 7}\\tools\\app{i}\\bin"
+        else:
+            entry = target = f"C:\\Program Files\\Vendor{i % 50}\\App{i}\\bin"
+        entries.append(entry)
+        if rng.random() >= broken:
+            existing.add(target)
+    return entries, existing
+
+
+def run_operation(operation: str, entries: list[str]) -> None:
+    target = "C:\\Bench\\New\\bin"
+    match operation:
+        case "list":
+            main.list_option([], [])
+        case "get":
+            registry_module.get_path_variable(system=True)
+            registry_module.get_path_variable(system=False)
+        case "add":
+            main.add_option([target], [])
+        case "remove":
+            main.remove_option([entries[len(entries) // 2]], [])
+        case "audit":
+            main.audit_option([], ["--no-cache"])
+        case "clean":
+            main.clean_option([], ["--no-cache"])
+        case _:
+            raise ValueError(f"unknown operation {operation!r}")
+
+
+def measure(operation: str, size: int, latency: float, repeat: int) -> dict:
+    """Runs one operation ``repeat`` times on a fresh PATH of ``size`` entries.
+
+    Returns the best wall time and the call counts of the last run.
+    """
+    entries, existing = synthetic_path(size)
+    value = ";".join(entries)
+    best = float("inf")
+    for _ in range(repeat):
+        reg = InstrumentedWinreg()
+        reg.set_value(fakereg.HKEY_LOCAL_MACHINE, fakereg.SYSTEM_ENVIRONMENT, "Path", value)
+        reg.set_value(fakereg.HKEY_CURRENT_USER, fakereg.USER_ENVIRONMENT, "Path", value)
+        reg.calls.clear()
+        fs = FakeFilesystem(existing, latency)
+        with tempfile.TemporaryDirectory() as home, \
+                mock.patch.dict(os.environ, {**VARIABLES, "PATHCLEANER_HOME": home}), \
+                mock.patch.object(registry_module, "winreg", reg), \
+                contextlib.redirect_stdout(io.StringIO()), \
+                fs.installed():
+            start = time.perf_counter()
+            run_operation(operation, entries)
+            best = min(best, time.perf_counter() - start)
+    return {
+        "operation": operation,
+        "size": size,
+        "seconds": best,
+        "registry_calls": sum(reg.calls.values()),
+        "stat_calls": fs.calls,
+    }
+
+
+STARTUP_COMMANDS = ["list", "get", "help", "history"]
+DEFAULT_STARTUP_BUDGET_MS = 30.0
+
+
+def import_time(command: str, runs: int = 5) -> dict:
+    """Measures ``python -X importtime main.py <command>``.
+
+    Returns the best total import time in milliseconds, the best wall time
+    and the slowest top-level imports of that run. Only read-only commands
+    should be measured, since the real registry is used on Windows.
+    """
+    import subprocess
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    best = None
+    with tempfile.TemporaryDirectory() as home:
+        env = {**os.environ, "PATHCLEANER_HOME": home}
+        for _ in range(runs):
+            start = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, "-X", "importtime", script, command],
+                capture_output=True, text=True, env=env,
+            )
+            seconds = time.perf_counter() - start
+            modules = {}
+            for line in completed.stderr.splitlines():
+                if not line.startswith("import time:") or "|" not in line:
+                    continue
+                _, cumulative, name = line[len("import time:"):].split("|")
+                # top-level imports are the ones without indentation
+                if cumulative.strip().isdigit() and not name.startswith("  "):
+                    modules[name.strip()] = int(cumulative) / 1000
+            total = sum(modules.values())
+            if best is None or total < best["import_ms"]:
+                slowest = sorted(modules, key=modules.get, reverse=True)[:3]
+                best = {"import_ms": total, "seconds": seconds, "slowest": slowest}
+    return {
+        "operation": f"startup:{command}",
+        "size": 0,
+        "seconds": best["seconds"],
+        "registry_calls": 0,
+        "stat_calls": 0,
+        "import_ms": best["import_ms"],
+        "slowest": best["slowest"],
+    }
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> list[str]:
+    """Returns a description of every result that regressed past ``threshold``."""
+    previous = {(r["operation"], r["size"]): r for r in baseline}
+    failures = []
+    for result in results:
+        before = previous.get((result["operation"], result["size"]))
+        if before is None:
+            continue
+        for metric in ("seconds", "registry_calls", "stat_calls", "import_ms"):
+            if metric not in before or metric not in result:
+                continue
+            old, new = before[metric], result[metric]
+            # Ignore sub-millisecond timing noise.
+            floor = {"seconds": 0.001, "import_ms": 1.0}.get(metric, 0)
+            if new > old * (1 + threshold) and new - old > floor:
+                failures.append(f"{result['operation']} n={result['size']}: {metric} {old:g} -> {new:g}")
+    return failures
+
+
+def print_table(results: list[dict]) -> None:
+    measured = [r for r in results if "import_ms" not in r]
+    startup = [r for r in results if "import_ms" in r]
+    if measured:
+        print(f"{'operation':<10} {'size':>6} {'seconds':>10} {'registry':>9} {'stat':>7}")
+        for r in measured:
+            print(f"{r['operation']:<10} {r['size']:>6} {r['seconds']:>10.4f} {r['registry_calls']:>9} {r['stat_calls']:>7}")
+    if startup:
+        if measured:
+            print()
+        print(f"{'startup':<16} {'imports ms':>10} {'wall ms':>9}  slowest imports")
+        for r in startup:
+            print(f"{r['operation']:<16} {r['import_ms']:>10.2f} {r['seconds'] * 1000:>9.1f}  {', '.join(r['slowest'])}")
+
+
+def run() -> int:
+    parser = argparse.ArgumentParser(prog="bench", description="Benchmark pathcleaner against a fake registry")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="PATH sizes to generate")
+    parser.add_argument("--operations", nargs="+", default=DEFAULT_OPERATIONS, choices=DEFAULT_OPERATIONS)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds each fake stat call sleeps")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the fastest is kept")
+    parser.add_argument("--baseline", help="Fail if results regress against this saved baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed relative regression")
+    parser.add_argument("--save-baseline", help="Write the results to this file")
+    parser.add_argument("--startup", action="store_true", help="Also measure interpreter startup and imports per command")
+    parser.add_argument("--startup-only", action="store_true", help="Only measure startup")
+    parser.add_argument("--startup-budget", type=float, default=DEFAULT_STARTUP_BUDGET_MS, help="Allowed import milliseconds per command")
+    options = parser.parse_args()
+
+    results = []
+    if not options.startup_only:
+        results = [
+            measure(operation, size, options.latency, options.repeat)
+            for size in options.sizes
+            for operation in options.operations
+        ]
+    if options.startup or options.startup_only:
+        results += [import_time(command, options.repeat) for command in STARTUP_COMMANDS]
+    print_table(results)
+
+    over_budget = [r for r in results if r.get("import_ms", 0) > options.startup_budget]
+    if over_budget:
+        print(f"\nover the {options.startup_budget:g} ms import budget:")
+        for r in over_budget:
+            print(f"    {r['operation']}: {r['import_ms']:.2f} ms")
+        return 1
+
+    if options.save_baseline:
+        with open(options.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if options.baseline:
+        with open(options.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        failures = compare(results, baseline, options.threshold)
+        if failures:
+            print("\nregressions:")
+            for failure in failures:
+                print("   ", failure)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
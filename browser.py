@@ -0,0 +1,280 @@
+"""The ``path browse`` window.
+
+Both PATH scopes are shown in one ``ttk.Treeview``, which only draws the
+rows scrolled into view. Every entry is classified by ``survey.survey`` on
+a background :class:`Auditor` thread, and each row is updated in place as
+its result arrives, so a slow share never freezes the window. Tk may only
+be used from the thread that created it, so results are handed over
+through a queue the window polls.
+
+Adding, removing and reordering entries only edits a
+``registry.PathSession``; nothing is written until Apply is pressed, and
+then each changed scope is written once.
+"""
+import os
+import queue
+import threading
+from typing import Callable, Iterable
+
+from registry import PathManager, PathSession
+
+
+# milliseconds between polls of the auditor's results
+POLL_INTERVAL = 50
+# results applied per poll, so a burst of them never stalls the window
+POLL_BATCH = 200
+
+SCOPES = {True: "system", False: "user"}
+
+STATUS_COLORS = {
+    "VALID": "#1a7f37", "NO EXECUTABLES": "#9a6700", "EMPTY": "#9a6700", "ACCESS DENIED": "#9a6700",
+    "MISSING": "#cf222e", "NOT A DIRECTORY": "#cf222e", "BROKEN LINK": "#cf222e", "TIMEOUT": "#9a6700",
+}
+
+
+class Auditor:
+    """Classifies PATH entries on a background thread.
+
+    Paths passed to :meth:`submit` are listed in batches, each path once,
+    and every ``survey.DirectoryReport`` is put on :attr:`results` as soon
+    as its listing finishes.
+
+    Parameters
+    ----------
+    expand : Callable[[str], str]
+        Expands variable references, e.g. an ``expand.Expander``.
+    extensions : Iterable[str], optional
+        The executable extensions. Defaults to ``resolve.pathext()``.
+    """
+
+    def __init__(self, expand: Callable[[str], str], extensions: Iterable[str] = None) -> None:
+        from resolve import pathext
+
+        self.expand = expand
+        self.extensions = list(extensions) if extensions is not None else pathext()
+        self.results: queue.Queue = queue.Queue()
+        self._requests: queue.Queue = queue.Queue()
+        self._submitted: set[str] = set()
+        threading.Thread(target=self._run, name="pathcleaner-browse", daemon=True).start()
+
+    def submit(self, paths: Iterable[str]) -> None:
+        """Queues the paths that were not submitted before."""
+        new = [path for path in dict.fromkeys(paths) if path not in self._submitted]
+        self._submitted.update(new)
+        if new:
+            self._requests.put(new)
+
+    def close(self) -> None:
+        """Stops the thread once the batch in progress is done."""
+        self._requests.put(None)
+
+    def _run(self) -> None:
+        from survey import survey
+
+        while True:
+            paths = self._requests.get()
+            if paths is None:
+                return
+            for report in survey(paths, self.expand, self.extensions, ordered=False):
+                self.results.put(report)
+
+
+class Browser:
+    """The browse window.
+
+    Parameters
+    ----------
+    manager : PathManager, optional
+        The PATH values to show and edit.
+    initialdir : str, optional
+        Where the Add dialog starts.
+    """
+
+    COLUMNS = {"status": ("Status", 130), "executables": ("Executables", 90), "listing": ("Listing", 80)}
+
+    def __init__(self, manager: PathManager = None, initialdir: str = None) -> None:
+        import tkinter as tk
+        from tkinter import ttk
+
+        self.manager = manager if manager is not None else PathManager()
+        self.session = PathSession(self.manager)
+        self.initialdir = initialdir
+        self.auditor = Auditor(self.manager.expander().expand)
+        self.reports = {}
+        # raw entry -> the rows that show it
+        self.rows: dict[str, list[str]] = {}
+
+        self.root = tk.Tk()
+        self.root.title("pathcleaner")
+        self.root.geometry("900x560")
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+        frame = ttk.Frame(self.root, padding=8)
+        frame.pack(fill="both", expand=True)
+        self.tree = ttk.Treeview(frame, columns=list(self.COLUMNS), selectmode="extended")
+        self.tree.heading("#0", text="Entry")
+        self.tree.column("#0", width=560)
+        for column, (heading, width) in self.COLUMNS.items():
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width, stretch=False, anchor="e" if column != "status" else "w")
+        for status, color in STATUS_COLORS.items():
+            self.tree.tag_configure(status, foreground=color)
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        scrollbar.grid(row=0, column=1, sticky="ns")
+        frame.rowconfigure(0, weight=1)
+        frame.columnconfigure(0, weight=1)
+        for system, scope in SCOPES.items():
+            self.tree.insert("", "end", iid=scope, text=f"{scope.capitalize()} PATH", open=True)
+
+        buttons = ttk.Frame(frame, padding=(0, 8, 0, 0))
+        buttons.grid(row=1, column=0, columnspan=2, sticky="ew")
+        # bound methods, not lambdas over a loop variable
+        for text, command in (
+            ("Add...", self.add), ("Remove", self.remove), ("Move up", self.move_up), ("Move down", self.move_down),
+        ):
+            ttk.Button(buttons, text=text, command=command).pack(side="left", padx=(0, 6))
+        for text, command in (("Close", self.close), ("Apply", self.apply), ("Revert", self.revert)):
+            ttk.Button(buttons, text=text, command=command).pack(side="right", padx=(6, 0))
+        self.status = tk.StringVar()
+        ttk.Label(frame, textvariable=self.status).grid(row=2, column=0, columnspan=2, sticky="w", pady=(8, 0))
+
+        for system in SCOPES:
+            self.refresh(system)
+        self.root.after(POLL_INTERVAL, self.poll)
+
+    def run(self) -> None:
+        self.root.mainloop()
+
+    # rows
+
+    def _values(self, raw: str) -> tuple[str, str, str]:
+        report = self.reports.get(raw)
+        if report is None:
+            return ("checking...", "", "")
+        listed = report.status in ("VALID", "NO EXECUTABLES")
+        return (report.status, str(report.executables) if listed else "", f"{report.elapsed * 1000:.1f} ms")
+
+    def refresh(self, system: bool, select: int = None) -> None:
+        """Redraws the rows of a scope from the session, keeping known results."""
+        scope = SCOPES[system]
+        self.tree.delete(*self.tree.get_children(scope))
+        for rows in self.rows.values():
+            rows[:] = [iid for iid in rows if not iid.startswith(scope + ":")]
+        entries = self.session.paths(system).raw()
+        for position, raw in enumerate(entries):
+            iid = f"{scope}:{position}"
+            report = self.reports.get(raw)
+            self.tree.insert(scope, "end", iid=iid, text=raw, values=self._values(raw), tags=(report.status,) if report else ())
+            self.rows.setdefault(raw, []).append(iid)
+        self.auditor.submit(entries)
+        if select is not None:
+            iid = f"{scope}:{select}"
+            self.tree.selection_set(iid)
+            self.tree.see(iid)
+        self._show_status()
+
+    def poll(self) -> None:
+        """Applies the results the auditor has produced since the last poll."""
+        reports = []
+        while len(reports) < POLL_BATCH:
+            try:
+                reports.append(self.auditor.results.get_nowait())
+            except queue.Empty:
+                break
+        for report in reports:
+            self.reports[report.path] = report
+            for iid in self.rows.get(report.path, ()):
+                self.tree.item(iid, values=self._values(report.path), tags=(report.status,))
+        if reports:
+            self._show_status()
+        self.root.after(POLL_INTERVAL, self.poll)
+
+    def _show_status(self) -> None:
+        entries = [raw for system in SCOPES for raw in self.session.paths(system).raw()]
+        checked = sum(raw in self.reports for raw in entries)
+        text = f"{checked} of {len(entries)} entries checked"
+        changed = [SCOPES[system] for system in SCOPES if self.session.changed(system)]
+        if changed:
+            text += f"; unsaved changes to the {' and '.join(changed)} PATH"
+        self.status.set(text)
+
+    def _selected(self) -> dict[bool, list[int]]:
+        """Returns the selected positions of each scope."""
+        selected = {system: [] for system in SCOPES}
+        for iid in self.tree.selection():
+            scope, _, position = iid.partition(":")
+            if position:
+                selected[scope == SCOPES[True]].append(int(position))
+        return selected
+
+    # staged edits
+
+    def add(self) -> None:
+        from tkinter import filedialog
+
+        directory = filedialog.askdirectory(parent=self.root, initialdir=self.initialdir, title="Add a directory to PATH")
+        if not directory:
+            return
+        # the scope of the selection, the user PATH by default
+        selection = self.tree.selection()
+        system = bool(selection) and selection[0].partition(":")[0] == SCOPES[True]
+        if self.session.add(os.path.normpath(directory), system=system):
+            self.refresh(system, select=len(self.session.paths(system)) - 1)
+
+    def remove(self) -> None:
+        for system, positions in self._selected().items():
+            if positions:
+                entries = self.session.paths(system)
+                for position in sorted(positions, reverse=True):
+                    del entries[position]
+                self.refresh(system)
+
+    def move(self, offset: int) -> None:
+        selected = [(system, positions) for system, positions in self._selected().items() if positions]
+        if len(selected) != 1 or len(selected[0][1]) != 1:
+            self.status.set("select one entry to move")
+            return
+        system, (position,) = selected[0]
+        entries = self.session.paths(system)
+        target = position + offset
+        if 0 <= target < len(entries):
+            entries.insert(target, entries.pop(position))
+            self.refresh(system, select=target)
+
+    def move_up(self) -> None:
+        self.move(-1)
+
+    def move_down(self) -> None:
+        self.move(1)
+
+    def apply(self) -> bool:
+        """Writes the staged edits. Returns False if they could not be written."""
+        from tkinter import messagebox
+
+        try:
+            written = self.session.commit()
+        except OSError as e:
+            messagebox.showerror("pathcleaner", f"Could not write PATH: {e}", parent=self.root)
+            return False
+        for system in SCOPES:
+            self.refresh(system)
+        if written:
+            self.status.set(f"wrote the {' and '.join(SCOPES[system] for system in written)} PATH")
+        return True
+
+    def revert(self) -> None:
+        self.session.rollback()
+        for system in SCOPES:
+            self.refresh(system)
+
+    def close(self) -> None:
+        from tkinter import messagebox
+
+        if any(self.session.changed(system) for system in SCOPES):
+            answer = messagebox.askyesnocancel("pathcleaner", "Apply the staged changes before closing?", parent=self.root)
+            if answer is None or (answer and not self.apply()):
+                return
+        self.auditor.close()
+        self.root.destroy()
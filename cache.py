@@ -0,0 +1,274 @@
+"""Persistent cache of PATH entry probe results.
+
+Each cached entry records whether a path exists, whether it is a directory,
+the modification time of its parent directory and when it was probed. An
+entry is reused while it is younger than the TTL and its parent's mtime is
+unchanged, since creating or deleting a directory updates its parent. The
+cache is bounded in size and evicts the least recently used entries.
+"""
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+import tracing
+from datadir import data_dir
+
+
+DEFAULT_TTL = 3600.0
+DEFAULT_MAX_ENTRIES = 4096
+CACHE_FILE = "statcache.json"
+AUDIT_FILE = "audit.json"
+
+
+class CacheEntry(NamedTuple):
+    exists: bool
+    is_dir: bool
+    parent_mtime: float | None
+    checked: float
+
+
+def _mtime(path: str) -> float | None:
+    try:
+        with tracing.span("stat", tracing.FILESYSTEM, path=path):
+            return os.stat(path).st_mtime
+    except (OSError, ValueError):
+        return None
+
+
+class StatCache:
+    """A TTL- and size-bounded LRU cache of path probes, stored as JSON.
+
+    Parameters
+    ----------
+    filename : str, optional
+        Where the cache is persisted. Defaults to ``statcache.json`` in
+        ``data_dir()``.
+    ttl : float, optional
+        Seconds a probe result stays fresh.
+    max_entries : int, optional
+        Number of entries kept before the least recently used are evicted.
+
+    The cache is safe to share between the threads of a ``PathChecker``.
+    """
+
+    def __init__(
+        self,
+        filename: str = None,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        self.filename = filename if filename is not None else os.path.join(data_dir(), CACHE_FILE)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._parents: dict[str, float | None] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    @classmethod
+    def load(cls, filename: str = None, **kwargs) -> "StatCache":
+        """Returns a cache populated from disk. A missing or corrupt file gives an empty cache."""
+        import json
+
+        cache = cls(filename, **kwargs)
+        try:
+            with open(cache.filename, "r", encoding="utf-8") as f:
+                records = json.load(f)
+            for path, *fields in records:
+                cache.entries[path] = CacheEntry(*fields)
+        except (OSError, ValueError, TypeError):
+            cache.entries.clear()
+        cache._evict()
+        return cache
+
+    def save(self) -> bool:
+        """Writes the cache to disk if it changed since it was loaded.
+
+        Persisting is best effort: returns False instead of raising if the
+        file cannot be written.
+        """
+        import json
+
+        if not self._dirty:
+            return True
+        with self._lock:
+            records = [[path, *entry] for path, entry in self.entries.items()]
+        try:
+            os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+            # several processes may save at once; each writes its own temp file
+            temp = f"{self.filename}.{os.getpid()}.tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(records, f, separators=(",", ":"))
+            os.replace(temp, self.filename)
+        except OSError:
+            return False
+        self._dirty = False
+        return True
+
+    def _parent_mtime(self, path: str) -> float | None:
+        # Parents are shared by many entries, so stat each once per run.
+        parent = os.path.dirname(os.path.normpath(path))
+        if parent not in self._parents:
+            self._parents[parent] = _mtime(parent)
+        return self._parents[parent]
+
+    def _evict(self) -> None:
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def fresh(self, path: str, entry: CacheEntry) -> bool:
+        """Returns True if a cached entry can still be trusted."""
+        if time.time() - entry.checked > self.ttl:
+            return False
+        return self._parent_mtime(path) == entry.parent_mtime
+
+    def stat(self, path: str) -> CacheEntry:
+        """Returns the probe result for a path, probing only if the cached one is stale."""
+        with self._lock:
+            entry = self.entries.get(path)
+            if entry is not None:
+                self.entries.move_to_end(path)
+        if entry is not None and self.fresh(path, entry):
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        parent_mtime = self._parent_mtime(path)
+        try:
+            with tracing.span("stat", tracing.FILESYSTEM, path=path):
+                mode = os.stat(path).st_mode
+            entry = CacheEntry(True, stat.S_ISDIR(mode), parent_mtime, time.time())
+        except (OSError, ValueError):
+            entry = CacheEntry(False, False, parent_mtime, time.time())
+        with self._lock:
+            self.entries[path] = entry
+            self.entries.move_to_end(path)
+            self._evict()
+            self._dirty = True
+        return entry
+
+    def exists(self, path: str) -> bool:
+        """Cached equivalent of ``os.path.exists``."""
+        return self.stat(path).exists
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+            self._parents.clear()
+            self._dirty = True
+
+
+class AuditRecord(NamedTuple):
+    status: str
+    expanded: str
+    checked: float
+
+
+class AuditState:
+    """The results of the last audit, per scope, stored as JSON.
+
+    Each scope keeps a fingerprint of the PATH value it was audited at and
+    the result of each entry, keyed by the entry's raw text. Variables other
+    than PATH (see ``PathManager.with_variable``) are kept apart from it. A result is
+    reused while it is younger than the TTL, so only entries that are new
+    or expired have to be probed again. A result for an entry with ``%VAR%``
+    references is only reused while the entry still expands to the same path.
+
+    Parameters
+    ----------
+    filename : str, optional
+        Where the state is persisted. Defaults to ``audit.json`` in
+        ``data_dir()``.
+    ttl : float, optional
+        Seconds a result stays fresh.
+    """
+
+    def __init__(self, filename: str = None, ttl: float = DEFAULT_TTL) -> None:
+        self.filename = filename if filename is not None else os.path.join(data_dir(), AUDIT_FILE)
+        self.ttl = ttl
+        self.fingerprints: dict[str, str] = {}
+        self.results: dict[str, dict[str, AuditRecord]] = {}
+        self._dirty = False
+
+    @staticmethod
+    def fingerprint(value: str) -> str:
+        """Returns the fingerprint of a raw PATH value."""
+        import hashlib
+
+        return hashlib.sha256(value.encode("utf-8", "surrogatepass")).hexdigest()
+
+    @classmethod
+    def load(cls, filename: str = None, **kwargs) -> "AuditState":
+        """Returns the state saved on disk. A missing or corrupt file gives an empty state."""
+        import json
+
+        state = cls(filename, **kwargs)
+        try:
+            with open(state.filename, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for scope, (fingerprint, results) in data.items():
+                state.fingerprints[scope] = fingerprint
+                state.results[scope] = {raw: AuditRecord(*fields) for raw, fields in results.items()}
+        except (OSError, ValueError, TypeError):
+            state.fingerprints.clear()
+            state.results.clear()
+        return state
+
+    @staticmethod
+    def _scope(system: bool, variable: str) -> str:
+        scope = "system" if system else "user"
+        return scope if variable.upper() == "PATH" else f"{scope}:{variable.upper()}"
+
+    def unchanged(self, system: bool, value: str, variable="Path") -> bool:
+        """Returns True if a scope was last audited at this PATH value."""
+        return self.fingerprints.get(self._scope(system, variable)) == self.fingerprint(value)
+
+    def get(self, system: bool, raw: str, variable="Path", expand=None) -> AuditRecord | None:
+        """Returns the last result of an entry, or None if there is none, it
+        expired or the entry's variables now expand differently.
+
+        ``expand`` expands the entry's references; without it an entry that
+        has any is never reused.
+        """
+        record = self.results.get(self._scope(system, variable), {}).get(raw)
+        if record is None or time.time() - record.checked > self.ttl:
+            return None
+        if "%" in raw and (expand is None or expand(raw) != record.expanded):
+            return None
+        return record
+
+    def update(self, system: bool, value: str, results: dict[str, AuditRecord], variable="Path") -> None:
+        """Replaces a scope's results with those of an audit of ``value``."""
+        scope = self._scope(system, variable)
+        fingerprint = self.fingerprint(value)
+        if self.fingerprints.get(scope) == fingerprint and self.results.get(scope) == results:
+            return
+        self.fingerprints[scope] = fingerprint
+        self.results[scope] = results
+        self._dirty = True
+
+    def save(self) -> bool:
+        """Writes the state to disk if it changed. Returns False if it could not be written."""
+        import json
+
+        if not self._dirty:
+            return True
+        data = {
+            scope: [self.fingerprints[scope], {raw: list(record) for raw, record in self.results[scope].items()}]
+            for scope in self.results
+        }
+        try:
+            os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+            temp = f"{self.filename}.{os.getpid()}.tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(temp, self.filename)
+        except OSError:
+            return False
+        self._dirty = False
+        return True
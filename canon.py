@@ -0,0 +1,124 @@
+"""Canonical keys for PATH entries.
+
+Windows treats ``C:\\Tools``, ``c:\\tools\\``, ``C:/Tools`` and
+``%SystemDrive%\\Tools`` as the same directory, so comparing raw strings
+lets equivalent entries pile up. :func:`canonical_key` reduces an entry to a
+single comparable form; ``pathlist.PathList`` indexes entries by it for
+constant-time membership checks.
+"""
+import ntpath
+import sys
+from typing import Callable, NamedTuple
+
+from expand import environment
+
+
+def long_name(path: str) -> str:
+    """Returns the long form of an 8.3 short path (``PROGRA~1`` -> ``Program Files``).
+
+    Only resolves on Windows and only for paths that exist; anything else is
+    returned unchanged.
+    """
+    if sys.platform != "win32" or "~" not in path:
+        return path
+    import ctypes
+
+    size = ctypes.windll.kernel32.GetLongPathNameW(path, None, 0)
+    if size == 0:
+        return path
+    buffer = ctypes.create_unicode_buffer(size)
+    if ctypes.windll.kernel32.GetLongPathNameW(path, buffer, size) == 0:
+        return path
+    return buffer.value
+
+
+def short_name(path: str) -> str:
+    """Returns the 8.3 short form of a path (``Program Files`` -> ``PROGRA~1``).
+
+    Only resolves on Windows and only for paths that exist on a volume with
+    short names enabled; anything else is returned unchanged.
+    """
+    if sys.platform != "win32":
+        return path
+    import ctypes
+
+    size = ctypes.windll.kernel32.GetShortPathNameW(path, None, 0)
+    if size == 0:
+        return path
+    buffer = ctypes.create_unicode_buffer(size)
+    if ctypes.windll.kernel32.GetShortPathNameW(path, buffer, size) == 0:
+        return path
+    return buffer.value
+
+
+def canonical_key(path: str, expand: Callable[[str], str] = None, long_names=False) -> str:
+    """Returns the comparison key for a PATH entry.
+
+    The entry is unquoted, has its ``%VAR%`` references expanded, uses
+    backslashes, has ``.``/``..`` and repeated separators collapsed, loses any
+    trailing separator (except on a drive root) and is case-folded.
+
+    Parameters
+    ----------
+    path : str
+        The PATH entry.
+    expand : Callable[[str], str], optional
+        Expands variable references. Defaults to the process environment's
+        ``expand.Expander``.
+    long_names : bool, optional
+        Whether to resolve 8.3 short names to long names (Windows only).
+
+    Returns
+    -------
+    str
+        The canonical key; "" for an empty entry.
+    """
+    path = path.strip().strip('"')
+    if not path:
+        return ""
+    if expand is None:
+        expand = environment()
+    path = expand(path).replace("/", "\\")
+    path = ntpath.normpath(path)
+    if long_names:
+        path = long_name(path)
+    if path.endswith("\\") and not path.endswith(":\\") and path != "\\":
+        path = path.rstrip("\\")
+    return path.casefold()
+
+
+class Duplicate(NamedTuple):
+    """An entry made redundant by an equivalent entry earlier in the effective PATH."""
+
+    system: bool
+    index: int
+    path: str
+    kept_system: bool
+    kept_path: str
+
+
+def find_duplicates(
+    scopes: list[tuple[bool, list[str]]], long_names=False, expand: Callable[[str], str] = None
+) -> list[Duplicate]:
+    """Finds redundant entries within and across scopes in one pass.
+
+    ``scopes`` is given in effective PATH order (system before user). For
+    each canonical key the first entry is kept and every later equivalent
+    entry, in the same or a later scope, is reported. Empty entries are
+    ignored. ``expand`` is passed through to :func:`canonical_key`.
+    """
+    if expand is None:
+        expand = environment()
+    first: dict[str, tuple[bool, str]] = {}
+    duplicates = []
+    for system, paths in scopes:
+        for index, path in enumerate(paths):
+            key = canonical_key(path, expand, long_names)
+            if not key:
+                continue
+            if key in first:
+                kept_system, kept_path = first[key]
+                duplicates.append(Duplicate(system, index, path, kept_system, kept_path))
+            else:
+                first[key] = (system, path)
+    return duplicates
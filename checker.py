@@ -0,0 +1,164 @@
+"""Concurrent existence checks for PATH entries.
+
+A single unreachable network share can block ``os.path.exists`` for tens of
+seconds, so probes run on a bounded set of daemon threads and each one gets
+its own deadline. A probe that misses its deadline is reported as
+``TIMEOUT`` and its thread is abandoned rather than joined, so neither the
+check nor interpreter exit waits for it.
+"""
+import ntpath
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+
+VALID = "VALID"
+BROKEN = "BROKEN"
+TIMEOUT = "TIMEOUT"
+
+DEFAULT_WORKERS = 8
+DEFAULT_TIMEOUT = 2.0
+
+
+class ProbeResult(NamedTuple):
+    path: str
+    status: str
+    elapsed: float
+
+
+def share_root(path: str) -> str:
+    """Returns the ``\\\\server\\share`` part of a UNC path, or "" for local paths."""
+    drive = ntpath.splitdrive(path)[0]
+    return drive.lower() if drive.startswith(("\\\\", "//")) else ""
+
+
+class PathChecker:
+    """Runs an existence probe over PATH entries in a bounded thread pool.
+
+    Parameters
+    ----------
+    probe : Callable[[str], bool], optional
+        Returns True if an entry exists. Defaults to ``os.path.exists``.
+    workers : int, optional
+        Maximum number of probes in flight at once.
+    timeout : float, optional
+        Seconds each probe may run before it is reported as ``TIMEOUT``.
+
+    Once a probe on a UNC share times out, the remaining entries on the same
+    share are reported as ``TIMEOUT`` without being probed.
+    """
+
+    def __init__(
+        self,
+        probe: Callable[[str], bool] = None,
+        workers: int = DEFAULT_WORKERS,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> None:
+        self.probe = probe if probe is not None else os.path.exists
+        self.workers = max(1, workers)
+        self.timeout = timeout
+
+    def check(self, paths: Iterable[str]) -> list[ProbeResult]:
+        """Probes every entry and returns the results in input order."""
+        return list(self.iter_check(paths))
+
+    def iter_check(self, paths: Iterable[str]) -> Iterator[ProbeResult]:
+        """Probes every entry, yielding results in input order as they resolve.
+
+        Each result is yielded as soon as it and every result before it are
+        known, so a slow entry only holds back the entries after it.
+        """
+        completed = self.iter_completed(paths)
+        buffered: dict[int, ProbeResult] = {}
+        next_index = 0
+        try:
+            for index, result in completed:
+                buffered[index] = result
+                while next_index in buffered:
+                    yield buffered.pop(next_index)
+                    next_index += 1
+        finally:
+            completed.close()
+
+    def iter_completed(self, paths: Iterable[str]) -> Iterator[tuple[int, ProbeResult]]:
+        """Probes every entry, yielding ``(index, result)`` pairs in the order the probes finish.
+
+        Closing the iterator early stops the workers from starting new probes.
+        """
+        paths = list(paths)
+        if not paths:
+            return
+
+        lock = threading.Condition()
+        pending = list(range(len(paths)))
+        pending.reverse()
+        running: dict[int, float] = {}
+        results: dict[int, ProbeResult] = {}
+        finished: deque[int] = deque()
+        dead_shares: set[str] = set()
+
+        def finish(index: int, result: ProbeResult) -> None:
+            # called with the lock held
+            if index in results:
+                return
+            results[index] = result
+            running.pop(index, None)
+            finished.append(index)
+            lock.notify_all()
+
+        def worker() -> None:
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    index = pending.pop()
+                    path = paths[index]
+                    root = share_root(path)
+                    if root and root in dead_shares:
+                        finish(index, ProbeResult(path, TIMEOUT, 0.0))
+                        continue
+                    begin = running[index] = time.monotonic()
+                    lock.notify_all()
+                try:
+                    status = VALID if self.probe(path) else BROKEN
+                except Exception:
+                    status = BROKEN
+                with lock:
+                    finish(index, ProbeResult(path, status, time.monotonic() - begin))
+
+        def spawn() -> None:
+            threading.Thread(target=worker, name="pathcleaner-probe", daemon=True).start()
+
+        for _ in range(min(self.workers, len(paths))):
+            spawn()
+
+        try:
+            for _ in range(len(paths)):
+                with lock:
+                    while not finished:
+                        if not running:
+                            lock.wait()
+                            continue
+                        index = min(running, key=running.get)
+                        remaining = running[index] + self.timeout - time.monotonic()
+                        if remaining > 0:
+                            lock.wait(remaining)
+                            continue
+                        # The probe's thread is stuck; give up on it and
+                        # replace it so the pool keeps its capacity.
+                        path = paths[index]
+                        finish(index, ProbeResult(path, TIMEOUT, self.timeout))
+                        root = share_root(path)
+                        if root:
+                            dead_shares.add(root)
+                        if pending:
+                            spawn()
+                    index = finished.popleft()
+                    result = results[index]
+                yield index, result
+        finally:
+            # Stop the workers early if the caller stops iterating.
+            with lock:
+                pending.clear()
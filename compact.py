@@ -0,0 +1,174 @@
+"""Shortening a PATH value without changing what it resolves to.
+
+Installers and the Environment Variables dialog truncate PATH values past
+:data:`DEFAULT_LIMIT` characters, silently dropping the entries at the end.
+:func:`compact` rewrites each entry to its shortest equivalent spelling:
+
+* a prefix that matches a variable is replaced by a reference to it
+  (``C:\\Program Files\\Git\\cmd`` -> ``%ProgramFiles%\\Git\\cmd``),
+* trailing separators are dropped,
+* optionally, directories are replaced by their 8.3 short names,
+
+and drops empty entries, repeated entries and, in the user scope, entries
+the system scope already holds. Every rewrite is checked by expanding it
+again and comparing canonical keys with the original, so the directories
+searched, and their order, stay the same. PATH values are always written as
+``REG_EXPAND_SZ``, so the references are expanded by Windows.
+"""
+import ntpath
+from typing import Callable, Iterable, NamedTuple
+
+from canon import canonical_key, short_name
+
+
+# The longest value the Environment Variables dialog, setx-based installers
+# and many other tools handle without truncating it.
+DEFAULT_LIMIT = 2047
+
+# Variables Windows defines for every process, available to the system PATH.
+MACHINE_VARIABLES = (
+    "SystemRoot", "windir", "SystemDrive", "ProgramFiles", "ProgramFiles(x86)", "ProgramW6432",
+    "CommonProgramFiles", "CommonProgramFiles(x86)", "CommonProgramW6432", "ProgramData", "ALLUSERSPROFILE",
+)
+# Variables that differ per user, only usable in the user PATH.
+PROFILE_VARIABLES = ("USERPROFILE", "APPDATA", "LOCALAPPDATA")
+
+
+class Compaction(NamedTuple):
+    """The compacted entries of a scope and what changed."""
+
+    entries: list[str]
+    rewritten: list[tuple[str, str]]
+    dropped: list[tuple[str, str]]
+    before: int
+    after: int
+
+    @property
+    def saved(self) -> int:
+        return self.before - self.after
+
+
+def variable_names(manager, system=True) -> list[str]:
+    """Returns the variables a scope's entries may refer to.
+
+    The system PATH may only use machine-wide variables; the user PATH may
+    also use the user's own, as Windows expands it per user.
+    """
+    names = list(MACHINE_VARIABLES)
+    for scope in (True,) if system else (True, False):
+        try:
+            names += manager.snapshot(scope)
+        except OSError:
+            pass
+    if not system:
+        names += PROFILE_VARIABLES
+    unique = {}
+    for name in names:
+        if name.upper() != "PATH":
+            unique.setdefault(name.upper(), name)
+    return list(unique.values())
+
+
+def _prefixes(expander, names: Iterable[str], shorten: Callable[[str], str] = None) -> list[tuple[str, str]]:
+    """Returns (value, reference) pairs of the variables that hold a directory, longest value first."""
+    prefixes = []
+    for name in names:
+        value = expander.value(name)
+        if not value or "%" in value or not ntpath.isabs(value):
+            continue
+        value = value.rstrip("\\/")
+        if shorten is not None:
+            value = shorten(value)
+        # a reference only pays off if it is shorter than what it replaces
+        if len(value) > len(name) + 2:
+            prefixes.append((value.lower(), f"%{name}%"))
+    prefixes.sort(key=lambda prefix: -len(prefix[0]))
+    return prefixes
+
+
+def _trim(path: str) -> str:
+    """Drops trailing separators, except the one of a drive root."""
+    trimmed = path.rstrip("\\/")
+    return path if not trimmed or trimmed.endswith(":") else trimmed
+
+
+def _factor(path: str, prefixes: list[tuple[str, str]]) -> str:
+    lowered = path.lower()
+    for value, reference in prefixes:
+        if lowered.startswith(value) and (len(path) == len(value) or path[len(value)] in "\\/"):
+            return reference + path[len(value):]
+    return path
+
+
+def compact(
+    entries: list[str],
+    expander,
+    names: Iterable[str] = (),
+    shadowed: Iterable[str] = (),
+    short_names=False,
+    shorten: Callable[[str], str] = short_name,
+) -> Compaction:
+    """Returns the shortest equivalent spelling of a scope's entries.
+
+    Parameters
+    ----------
+    entries : list[str]
+        The entries of the scope.
+    expander : expand.Expander
+        Expands references, as Windows will for the scope.
+    names : Iterable[str], optional
+        Variables the entries may refer to (see :func:`variable_names`).
+    shadowed : Iterable[str], optional
+        Canonical keys searched before this scope, e.g. the system entries
+        when compacting the user scope. Entries with these keys are dropped.
+    short_names : bool, optional
+        Whether to also try 8.3 short names (Windows only).
+    shorten : Callable[[str], str], optional
+        Returns the short name of a path.
+
+    Returns
+    -------
+    Compaction
+        The new entries, the (old, new) rewrites, the (entry, reason)
+        drops, and the value length before and after, in characters.
+    """
+    names = list(names)
+    prefixes = _prefixes(expander, names)
+    short_prefixes = _prefixes(expander, names, shorten) if short_names else []
+    shadowed = set(shadowed)
+    seen = set()
+    result, rewritten, dropped = [], [], []
+    for entry in entries:
+        key = canonical_key(entry, expander)
+        if not key:
+            dropped.append((entry, "empty"))
+            continue
+        if key in seen:
+            dropped.append((entry, "duplicate"))
+            continue
+        if key in shadowed:
+            dropped.append((entry, "also in the system PATH"))
+            continue
+        seen.add(key)
+        expanded = expander(entry.strip().strip('"'))
+        if ";" in expanded:
+            # only valid quoted; leave it alone
+            result.append(entry)
+            continue
+        expanded = _trim(expanded)
+        candidates = {_trim(entry.strip().strip('"')), expanded, _factor(expanded, prefixes)}
+        if short_names:
+            short = shorten(expanded)
+            candidates.update((short, _factor(short, short_prefixes)))
+        original = canonical_key(entry, expander, long_names=True) if short_names else key
+        best = entry
+        for candidate in sorted(candidates, key=len):
+            if len(candidate) >= len(best):
+                break
+            if canonical_key(candidate, expander, short_names) == original:
+                best = candidate
+                break
+        if best != entry:
+            rewritten.append((entry, best))
+        result.append(best)
+    return Compaction(result, rewritten, dropped, len(";".join(entries)), len(";".join(result)))
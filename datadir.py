@@ -0,0 +1,33 @@
+"""Where pathcleaner keeps its state.
+
+Kept apart from :mod:`cache` so the startup path (``server.forward``) can
+find the server's state file without importing anything else.
+"""
+import os
+
+
+# written by a running ``path serve`` (see server.py)
+SERVER_STATE_FILE = "server.json"
+
+
+def data_dir() -> str:
+    """Returns the directory pathcleaner keeps its state in.
+
+    ``PATHCLEANER_HOME`` overrides the default of ``%LOCALAPPDATA%\\pathcleaner``
+    (or ``~/.cache/pathcleaner`` where ``LOCALAPPDATA`` is not set).
+    """
+    home = os.environ.get("PATHCLEANER_HOME")
+    if home:
+        return home
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pathcleaner")
+
+
+def server_running() -> bool:
+    """Returns True if a ``path serve`` has left its state file behind.
+
+    ``PATHCLEANER_NO_SERVER`` makes every command run locally.
+    """
+    if os.environ.get("PATHCLEANER_NO_SERVER"):
+        return False
+    return os.path.exists(os.path.join(data_dir(), SERVER_STATE_FILE))
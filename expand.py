@@ -0,0 +1,136 @@
+"""Expansion of ``%NAME%`` references, the way Windows expands PATH.
+
+Any number of references may appear anywhere in a string. A reference to a
+variable that is not defined is left as written, and so is ``%PATH%``,
+which the system PATH uses to refer to itself. Variables that come from
+``REG_EXPAND_SZ`` registry values may themselves contain references; those
+are expanded recursively, and references that form a cycle are left as
+written.
+
+An :class:`Expander` memoizes every string and variable it expands, and
+:func:`snapshot` hands out one shared expander per set of variables, so
+repeated expansion of the same PATH against an unchanged environment is a
+dictionary lookup.
+"""
+import os
+from typing import Iterable, Mapping
+
+
+MAX_SNAPSHOTS = 8
+
+# variables that are never expanded
+LITERAL = {"PATH"}
+
+_snapshots: dict[tuple, "Expander"] = {}
+
+
+class Expander:
+    """Expands ``%NAME%`` references against a fixed set of variables.
+
+    Parameters
+    ----------
+    variables : Mapping[str, str]
+        Variable values. Names are case-insensitive.
+    expandable : Iterable[str], optional
+        Names whose values contain references of their own
+        (``REG_EXPAND_SZ`` values), expanded before use.
+    """
+
+    def __init__(self, variables: Mapping[str, str], expandable: Iterable[str] = ()) -> None:
+        self.variables = {name.upper(): value for name, value in variables.items()}
+        self.expandable = {name.upper() for name in expandable}
+        self._values: dict[str, str | None] = {}
+        self._memo: dict[str, str] = {}
+
+    def value(self, name: str, _resolving: set = None) -> "str | None":
+        """Returns the expanded value of a variable, or None if it is not defined."""
+        key = name.upper()
+        if key in self._values:
+            return self._values[key]
+        if key in LITERAL or key not in self.variables:
+            return None
+        value = self.variables[key]
+        if key in self.expandable:
+            resolving = set() if _resolving is None else _resolving
+            if key in resolving:
+                return None
+            resolving.add(key)
+            value = self._expand(value, resolving)
+            resolving.discard(key)
+        self._values[key] = value
+        return value
+
+    def _expand(self, string: str, resolving: set = None) -> str:
+        parts = []
+        i = 0
+        while True:
+            start = string.find("%", i)
+            end = string.find("%", start + 1) if start >= 0 else -1
+            if end < 0:
+                parts.append(string[i:])
+                return "".join(parts)
+            parts.append(string[i:start])
+            value = self.value(string[start + 1 : end], resolving)
+            if value is None:
+                # keep "%NAME" and let the closing % open the next reference
+                parts.append(string[start:end])
+                i = end
+            else:
+                parts.append(value)
+                i = end + 1
+
+    def expand(self, string: str) -> str:
+        """Returns ``string`` with every reference expanded."""
+        try:
+            return self._memo[string]
+        except KeyError:
+            pass
+        expanded = self._memo[string] = self._expand(string) if "%" in string else string
+        return expanded
+
+    __call__ = expand
+
+    def unresolved(self, string: str) -> list[str]:
+        """Returns the names of the variables referenced in ``string`` that are not defined.
+
+        ``%PATH%`` and the other :data:`LITERAL` names are not counted.
+        """
+        names = []
+        i = 0
+        while True:
+            start = string.find("%", i)
+            end = string.find("%", start + 1) if start >= 0 else -1
+            if end < 0:
+                return names
+            name = string[start + 1 : end]
+            if self.value(name) is None:
+                if name and name.upper() not in LITERAL:
+                    names.append(name)
+                i = end
+            else:
+                i = end + 1
+
+    def expand_all(self, strings: Iterable[str]) -> list[str]:
+        """Expands every string of a PATH list in one call."""
+        memo = self._memo
+        return [memo[s] if s in memo else self.expand(s) for s in strings]
+
+
+def snapshot(variables: Mapping[str, str], expandable: Iterable[str] = ()) -> Expander:
+    """Returns the shared expander for a set of variables.
+
+    Expanders, and everything they have memoized, are reused for as long as
+    the same variables are passed in. The last ``MAX_SNAPSHOTS`` are kept.
+    """
+    key = (frozenset(variables.items()), frozenset(expandable))
+    expander = _snapshots.get(key)
+    if expander is None:
+        if len(_snapshots) >= MAX_SNAPSHOTS:
+            del _snapshots[next(iter(_snapshots))]
+        expander = _snapshots[key] = Expander(variables, expandable)
+    return expander
+
+
+def environment() -> Expander:
+    """Returns the shared expander for the current process environment."""
+    return snapshot(os.environ)
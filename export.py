@@ -0,0 +1,166 @@
+"""Machine-readable output of PATH entries.
+
+Every entry becomes one record with the fields in :data:`FIELDS`. Writers
+emit each record as soon as it is written, so a collector can consume the
+output of ``list``, ``get`` or ``audit`` while it is produced:
+
+``ndjson``
+    One JSON object per line.
+``json``
+    A single JSON array, written incrementally.
+``csv``
+    A header row, then one row per record.
+``msgpack``
+    One MessagePack map per record, back to back.
+"""
+import json
+import struct
+from typing import TextIO
+
+
+FIELDS = ("scope", "index", "raw", "expanded", "status", "variable")
+
+
+def record(system: bool, index: int, raw: str, expanded: str, status: str = None, variable="Path") -> dict:
+    """Returns the export record of one entry of PATH or another ;-separated variable."""
+    return {
+        "scope": "system" if system else "user", "index": index, "raw": raw, "expanded": expanded,
+        "status": status, "variable": variable,
+    }
+
+
+class Writer:
+    """Base class of the record writers.
+
+    With ``flush``, the stream is flushed after every record, so a reader
+    on the other end of a pipe sees each one immediately. With ``owned``,
+    :meth:`close` also closes the stream.
+    """
+
+    binary = False
+
+    def __init__(self, stream, flush=False, owned=False) -> None:
+        self.stream = stream
+        self.flush = flush
+        self.owned = owned
+
+    def _emit(self, data) -> None:
+        self.stream.write(data)
+        if self.flush:
+            self.stream.flush()
+
+    def write(self, record: dict) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        if self.owned:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+
+class NdjsonWriter(Writer):
+    def write(self, record: dict) -> None:
+        self._emit(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class JsonWriter(Writer):
+    def __init__(self, stream: TextIO, flush=False, owned=False) -> None:
+        super().__init__(stream, flush, owned)
+        self.count = 0
+
+    def write(self, record: dict) -> None:
+        self._emit(("[\n" if not self.count else ",\n") + json.dumps(record, ensure_ascii=False))
+        self.count += 1
+
+    def close(self) -> None:
+        self._emit("\n]\n" if self.count else "[]\n")
+        super().close()
+
+
+class CsvWriter(Writer):
+    def __init__(self, stream: TextIO, flush=False, owned=False) -> None:
+        import csv
+        import io
+
+        super().__init__(stream, flush, owned)
+        self.buffer = io.StringIO()
+        self.writer = csv.DictWriter(self.buffer, FIELDS, lineterminator="\n")
+        self.writer.writeheader()
+        self._drain()
+
+    def _drain(self) -> None:
+        self._emit(self.buffer.getvalue())
+        self.buffer.seek(0)
+        self.buffer.truncate()
+
+    def write(self, record: dict) -> None:
+        self.writer.writerow(record)
+        self._drain()
+
+
+def _header(size: int, fixed: int, fixed_limit: int, wide16: bytes, wide32: bytes) -> bytes:
+    if size < fixed_limit:
+        return struct.pack("B", fixed | size)
+    if size <= 0xFFFF:
+        return wide16 + struct.pack(">H", size)
+    return wide32 + struct.pack(">I", size)
+
+
+def packb(value) -> bytes:
+    """Encodes None, bools, ints, floats, strings, lists and dicts as MessagePack."""
+    if value is None:
+        return b"\xc0"
+    if value is True or value is False:
+        return b"\xc3" if value else b"\xc2"
+    if isinstance(value, int):
+        if 0 <= value < 0x80:
+            return struct.pack("B", value)
+        if -0x20 <= value < 0:
+            return struct.pack("b", value)
+        if 0 <= value <= 0xFFFFFFFF:
+            return b"\xce" + struct.pack(">I", value)
+        if 0 <= value <= 0xFFFFFFFFFFFFFFFF:
+            return b"\xcf" + struct.pack(">Q", value)
+        return b"\xd3" + struct.pack(">q", value)
+    if isinstance(value, float):
+        return b"\xcb" + struct.pack(">d", value)
+    if isinstance(value, str):
+        data = value.encode("utf-8")
+        if len(data) < 32:
+            return struct.pack("B", 0xA0 | len(data)) + data
+        if len(data) <= 0xFF:
+            return b"\xd9" + struct.pack("B", len(data)) + data
+        return _header(len(data), 0, 0, b"\xda", b"\xdb") + data
+    if isinstance(value, (list, tuple)):
+        return _header(len(value), 0x90, 16, b"\xdc", b"\xdd") + b"".join(packb(item) for item in value)
+    if isinstance(value, dict):
+        return _header(len(value), 0x80, 16, b"\xde", b"\xdf") + b"".join(packb(k) + packb(v) for k, v in value.items())
+    raise TypeError(f"cannot encode {type(value).__name__} as MessagePack")
+
+
+class MsgpackWriter(Writer):
+    binary = True
+
+    def write(self, record: dict) -> None:
+        self._emit(packb(record))
+
+
+FORMATS = {"ndjson": NdjsonWriter, "json": JsonWriter, "csv": CsvWriter, "msgpack": MsgpackWriter}
+
+
+def open_writer(format: str, filename: str = None, stdout=None) -> Writer:
+    """Returns a writer for ``format`` on ``filename``, or on ``stdout`` when it is None.
+
+    Output to stdout is flushed after every record. A file is closed with
+    the writer.
+    """
+    import sys
+
+    cls = FORMATS[format]
+    if filename is None:
+        stdout = stdout if stdout is not None else sys.stdout
+        return cls(stdout.buffer if cls.binary else stdout, flush=True)
+    if cls.binary:
+        return cls(open(filename, "wb"), owned=True)
+    return cls(open(filename, "w", encoding="utf-8", newline=""), owned=True)
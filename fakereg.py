@@ -0,0 +1,205 @@
+"""In-memory stand-in for the ``winreg`` module.
+
+Implements the subset of ``winreg`` that pathcleaner uses so the registry
+code can be imported and exercised on machines without a Windows registry.
+``registry.py`` falls back to this module when ``winreg`` is unavailable,
+and a fresh :class:`FakeWinreg` can be passed to ``PathManager`` directly.
+"""
+import os
+
+
+HKEY_CLASSES_ROOT = 0x80000000
+HKEY_CURRENT_USER = 0x80000001
+HKEY_LOCAL_MACHINE = 0x80000002
+HKEY_USERS = 0x80000003
+
+KEY_QUERY_VALUE = 0x0001
+KEY_SET_VALUE = 0x0002
+KEY_READ = 0x20019
+KEY_WRITE = 0x20006
+KEY_ALL_ACCESS = 0xF003F
+
+REG_NONE = 0
+REG_SZ = 1
+REG_EXPAND_SZ = 2
+REG_BINARY = 3
+REG_DWORD = 4
+REG_MULTI_SZ = 7
+
+USER_ENVIRONMENT = "Environment"
+SYSTEM_ENVIRONMENT = "SYSTEM\\CurrentControlSet\\Control\\Session Manager\\Environment"
+
+
+class FakeKey:
+    """Handle returned by :meth:`FakeWinreg.OpenKey`."""
+
+    def __init__(self, registry: "FakeWinreg", hkey: int, sub_key: str) -> None:
+        self.registry = registry
+        self.hkey = hkey
+        self.sub_key = sub_key
+        self.closed = False
+
+    def Close(self) -> None:
+        self.closed = True
+
+    def __enter__(self) -> "FakeKey":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.Close()
+
+
+class FakeWinreg:
+    """A registry held entirely in memory.
+
+    Keys are addressed by ``(hkey, sub_key)`` and compared case-insensitively,
+    as on Windows. Values are stored as ``(name, data, type)`` tuples.
+    """
+
+    HKEY_CLASSES_ROOT = HKEY_CLASSES_ROOT
+    HKEY_CURRENT_USER = HKEY_CURRENT_USER
+    HKEY_LOCAL_MACHINE = HKEY_LOCAL_MACHINE
+    HKEY_USERS = HKEY_USERS
+    KEY_QUERY_VALUE = KEY_QUERY_VALUE
+    KEY_SET_VALUE = KEY_SET_VALUE
+    KEY_READ = KEY_READ
+    KEY_WRITE = KEY_WRITE
+    KEY_ALL_ACCESS = KEY_ALL_ACCESS
+    REG_NONE = REG_NONE
+    REG_SZ = REG_SZ
+    REG_EXPAND_SZ = REG_EXPAND_SZ
+    REG_BINARY = REG_BINARY
+    REG_DWORD = REG_DWORD
+    REG_MULTI_SZ = REG_MULTI_SZ
+
+    def __init__(self) -> None:
+        self.keys: dict[tuple[int, str], dict[str, tuple[str, object, int]]] = {}
+        self.names: dict[tuple[int, str], str] = {}
+
+    # -- helpers ---------------------------------------------------------
+
+    def _resolve(self, key, sub_key: str) -> tuple[int, str]:
+        if isinstance(key, FakeKey):
+            if key.closed:
+                raise OSError("handle is closed")
+            hkey = key.hkey
+            sub_key = key.sub_key + "\\" + sub_key if sub_key else key.sub_key
+        else:
+            hkey = key
+        return hkey, sub_key.strip("\\")
+
+    def _values(self, key: FakeKey) -> dict[str, tuple[str, object, int]]:
+        if key.closed:
+            raise OSError("handle is closed")
+        try:
+            return self.keys[(key.hkey, key.sub_key.lower())]
+        except KeyError:
+            raise FileNotFoundError(2, "The system cannot find the file specified") from None
+
+    def set_value(self, hkey: int, sub_key: str, name: str, value, type: int = REG_EXPAND_SZ) -> None:
+        """Creates ``sub_key`` if needed and stores ``value`` under ``name``."""
+        with self.CreateKey(hkey, sub_key) as key:
+            self.SetValueEx(key, name, 0, type, value)
+
+    def get_value(self, hkey: int, sub_key: str, name: str):
+        """Returns the data stored under ``name``, without opening a handle."""
+        with self.OpenKey(hkey, sub_key) as key:
+            return self.QueryValueEx(key, name)[0]
+
+    # -- winreg API ------------------------------------------------------
+
+    def OpenKey(self, key, sub_key: str, reserved: int = 0, access: int = KEY_READ) -> FakeKey:
+        hkey, sub_key = self._resolve(key, sub_key)
+        if (hkey, sub_key.lower()) not in self.keys:
+            raise FileNotFoundError(2, "The system cannot find the file specified")
+        return FakeKey(self, hkey, self.names[(hkey, sub_key.lower())])
+
+    OpenKeyEx = OpenKey
+
+    def CreateKey(self, key, sub_key: str) -> FakeKey:
+        hkey, sub_key = self._resolve(key, sub_key)
+        ident = (hkey, sub_key.lower())
+        if ident not in self.keys:
+            self.keys[ident] = {}
+            self.names[ident] = sub_key
+        return FakeKey(self, hkey, self.names[ident])
+
+    def CloseKey(self, key: FakeKey) -> None:
+        key.Close()
+
+    def QueryValueEx(self, key: FakeKey, name: str) -> tuple[object, int]:
+        values = self._values(key)
+        try:
+            _, value, type = values[name.lower()]
+        except KeyError:
+            raise FileNotFoundError(2, "The system cannot find the file specified") from None
+        return value, type
+
+    def SetValueEx(self, key: FakeKey, name: str, reserved: int, type: int, value) -> None:
+        self._values(key)[name.lower()] = (name, value, type)
+
+    def DeleteValue(self, key: FakeKey, name: str) -> None:
+        values = self._values(key)
+        try:
+            del values[name.lower()]
+        except KeyError:
+            raise FileNotFoundError(2, "The system cannot find the file specified") from None
+
+    def EnumValue(self, key: FakeKey, index: int) -> tuple[str, object, int]:
+        values = list(self._values(key).values())
+        if index >= len(values):
+            raise OSError(259, "No more data is available")
+        return values[index]
+
+    def EnumKey(self, key, index: int) -> str:
+        hkey, sub_key = self._resolve(key, "")
+        prefix = sub_key.lower() + "\\" if sub_key else ""
+        children = []
+        for (h, name), original in self.names.items():
+            if h != hkey or not name.startswith(prefix):
+                continue
+            child = original[len(prefix):].split("\\")[0]
+            if child and child not in children:
+                children.append(child)
+        if index >= len(children):
+            raise OSError(259, "No more data is available")
+        return children[index]
+
+    def QueryInfoKey(self, key: FakeKey) -> tuple[int, int, int]:
+        values = self._values(key)
+        subkeys = 0
+        try:
+            while True:
+                self.EnumKey(key, subkeys)
+                subkeys += 1
+        except OSError:
+            pass
+        return subkeys, len(values), 0
+
+    def FlushKey(self, key: FakeKey) -> None:
+        self._values(key)
+
+
+def seeded(system_path: str = "", user_path: str = "") -> FakeWinreg:
+    """Returns a :class:`FakeWinreg` holding both Environment keys."""
+    registry = FakeWinreg()
+    registry.set_value(HKEY_LOCAL_MACHINE, SYSTEM_ENVIRONMENT, "Path", system_path)
+    registry.set_value(HKEY_CURRENT_USER, USER_ENVIRONMENT, "Path", user_path)
+    return registry
+
+
+# Module-level registry so ``import fakereg as winreg`` works as a drop-in.
+# It is seeded from the process PATH so the CLI has something to show.
+_default = seeded(system_path=";".join(os.environ.get("PATH", "").split(os.pathsep)))
+
+OpenKey = _default.OpenKey
+OpenKeyEx = _default.OpenKeyEx
+CreateKey = _default.CreateKey
+CloseKey = _default.CloseKey
+QueryValueEx = _default.QueryValueEx
+SetValueEx = _default.SetValueEx
+DeleteValue = _default.DeleteValue
+EnumValue = _default.EnumValue
+EnumKey = _default.EnumKey
+QueryInfoKey = _default.QueryInfoKey
+FlushKey = _default.FlushKey
@@ -0,0 +1,345 @@
+"""Append-only journal of committed PATH changes.
+
+Every change to a scope's value is appended as one JSON line holding the
+time, the scope and an entry-level diff against the previous value. Full
+copies ("checkpoints") are written only when a scope first appears in a
+segment and then every ``checkpoint_interval`` changes, so rebuilding any
+recorded value replays a bounded number of diffs.
+
+The journal is split into numbered segment files. Each segment begins with
+checkpoints of the scopes it carries, so it can be replayed on its own.
+Once there are more than ``keep_segments`` segments, the oldest ones are
+compacted into a single segment that keeps only the last value of each
+scope per day.
+
+Record layout::
+
+    {"t": 1700000000.0, "s": "user", "c": ["C:\\a", "C:\\b"]}         checkpoint
+    {"t": 1700000001.0, "s": "user", "d": [[1, 2, ["C:\\c"]]]}       diff
+
+A diff is a list of ``[start, stop, entries]`` edits, each replacing
+``old[start:stop]`` with ``entries``.
+
+A diff written by ``undo`` carries ``"u": n``, the number of earlier
+changes to its scope it reverted. Those changes and the undo itself are
+skipped by the next :meth:`Journal.undo`, so repeated undos keep walking
+back through history. A diff written by ``restore`` carries ``"r": 1``; it
+is an ordinary change that can itself be undone.
+
+A diff written by :meth:`Journal.compact` carries ``"k": 1``. It is the net
+change of a whole day, which may fold several changes, undos and restores
+together, so ``undo`` never steps into it.
+"""
+import json
+import os
+import time
+from datetime import datetime
+from typing import NamedTuple
+
+from datadir import data_dir
+
+
+DEFAULT_CHECKPOINT_INTERVAL = 32
+DEFAULT_SEGMENT_RECORDS = 512
+DEFAULT_KEEP_SEGMENTS = 4
+JOURNAL_DIR = "journal"
+SEGMENT_SUFFIX = ".jsonl"
+
+SCOPES = {True: "system", False: "user"}
+SYSTEMS = {"system": True, "user": False}
+
+
+class Change(NamedTuple):
+    """A committed change to one scope, as listed by ``Journal.history``."""
+
+    time: float
+    system: bool
+    added: list[str]
+    removed: list[str]
+    before: list[str]
+    after: list[str]
+    # number of changes this one undid, 0 unless it was written by undo
+    undone: int = 0
+    restored: bool = False
+    # the net change of a day, folded together by Journal.compact
+    compacted: bool = False
+
+
+def diff(old: list[str], new: list[str]) -> list[list]:
+    """Returns the edits turning ``old`` into ``new``."""
+    # only writing a change needs difflib; history and undo never do
+    from difflib import SequenceMatcher
+
+    matcher = SequenceMatcher(None, old, new, autojunk=False)
+    return [
+        [i1, i2, new[j1:j2]]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def patch(old: list[str], edits: list[list]) -> list[str]:
+    """Applies edits produced by :func:`diff` to ``old``."""
+    new = list(old)
+    # Edits are ordered by position, so apply them back to front to keep
+    # the earlier indices valid.
+    for start, stop, entries in reversed(edits):
+        new[start:stop] = entries
+    return new
+
+
+def format_time(t: float) -> str:
+    """Formats a journal timestamp the way ``history`` prints it and ``restore`` accepts it."""
+    return datetime.fromtimestamp(t).isoformat(timespec="seconds")
+
+
+def parse_time(text: str) -> float:
+    """Parses an ISO 8601 timestamp (local time) or seconds since the epoch."""
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text).timestamp()
+
+
+class Journal:
+    """The PATH change journal stored under ``data_dir()/journal``.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Where the segment files live.
+    checkpoint_interval : int, optional
+        Number of diffs per scope between full checkpoints.
+    segment_records : int, optional
+        Number of records after which a new segment is started.
+    keep_segments : int, optional
+        Number of newest segments kept verbatim; older ones are compacted.
+    """
+
+    def __init__(
+        self,
+        directory: str = None,
+        checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL,
+        segment_records: int = DEFAULT_SEGMENT_RECORDS,
+        keep_segments: int = DEFAULT_KEEP_SEGMENTS,
+    ) -> None:
+        self.directory = directory if directory is not None else os.path.join(data_dir(), JOURNAL_DIR)
+        self.checkpoint_interval = checkpoint_interval
+        self.segment_records = segment_records
+        self.keep_segments = keep_segments
+
+    # -- segments --------------------------------------------------------
+
+    def segments(self) -> list[str]:
+        """Returns the segment file paths, oldest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        names = sorted(n for n in names if n.endswith(SEGMENT_SUFFIX) and n[: -len(SEGMENT_SUFFIX)].isdigit())
+        return [os.path.join(self.directory, n) for n in names]
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{number:08d}{SEGMENT_SUFFIX}")
+
+    @staticmethod
+    def _number(segment: str) -> int:
+        return int(os.path.basename(segment)[: -len(SEGMENT_SUFFIX)])
+
+    @staticmethod
+    def _read(segment: str) -> list[dict]:
+        records = []
+        with open(segment, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A torn final line from an interrupted write.
+                    continue
+        return records
+
+    @staticmethod
+    def _apply(record: dict, states: dict[bool, list[str]]) -> None:
+        """Updates ``states`` in place with one record."""
+        system = SYSTEMS[record["s"]]
+        if "c" in record:
+            states[system] = record["c"]
+        elif system in states:
+            states[system] = patch(states[system], record["d"])
+
+    # -- writing ---------------------------------------------------------
+
+    def _append(self, segment: str, records: list[dict]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(segment, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def record(
+        self, system: bool, old: list[str], new: list[str], t: float = None, undone: int = 0, restored=False
+    ) -> None:
+        """Appends a change of ``system``'s value from ``old`` to ``new``.
+
+        ``undone`` is the number of earlier changes to the scope the change
+        reverts, when it is written by an undo; ``restored`` marks a restore.
+        """
+        if old == new:
+            return
+        t = time.time() if t is None else t
+        scope = SCOPES[system]
+
+        segments = self.segments()
+        records = self._read(segments[-1]) if segments else []
+        states: dict[bool, list[str]] = {}
+        since_checkpoint = 0
+        for record in records:
+            self._apply(record, states)
+            if record["s"] == scope:
+                since_checkpoint = 0 if "c" in record else since_checkpoint + 1
+
+        pending = []
+        if not segments or len(records) >= self.segment_records:
+            # Start a new segment that carries the current state of every scope.
+            number = self._number(segments[-1]) + 1 if segments else 0
+            segment = self._segment_path(number)
+            pending.extend({"t": t, "s": SCOPES[s], "c": v} for s, v in states.items() if s != system)
+            since_checkpoint = self.checkpoint_interval
+        else:
+            segment = segments[-1]
+
+        if states.get(system) != old or since_checkpoint >= self.checkpoint_interval:
+            # First sighting in this segment, a periodic checkpoint, or the
+            # value was changed outside pathcleaner since the last record.
+            pending.append({"t": t, "s": scope, "c": old})
+        change = {"t": t, "s": scope, "d": diff(old, new)}
+        if undone:
+            change["u"] = undone
+        if restored:
+            change["r"] = 1
+        pending.append(change)
+        self._append(segment, pending)
+
+        if segment not in segments and len(segments) + 1 > self.keep_segments:
+            self.compact()
+
+    def compact(self) -> None:
+        """Folds all but the newest ``keep_segments`` segments into one.
+
+        The compacted segment keeps the last recorded value of each scope for
+        every calendar day, stored as a checkpoint followed by diffs marked
+        ``"k"``, which :meth:`undo` does not step into.
+        """
+        segments = self.segments()
+        old = segments[: max(0, len(segments) - self.keep_segments)]
+        if len(old) < 2:
+            return
+
+        daily: dict[tuple[str, bool], tuple[float, list[str]]] = {}
+        states: dict[bool, list[str]] = {}
+        for segment in old:
+            for record in self._read(segment):
+                self._apply(record, states)
+                system = SYSTEMS[record["s"]]
+                if system in states:
+                    day = datetime.fromtimestamp(record["t"]).date().isoformat()
+                    daily[(day, system)] = (record["t"], states[system])
+
+        compacted = []
+        last: dict[bool, list[str]] = {}
+        since_checkpoint: dict[bool, int] = {}
+        for (_, system), (t, value) in sorted(daily.items(), key=lambda item: item[1][0]):
+            scope = SCOPES[system]
+            if system not in last or since_checkpoint[system] >= self.checkpoint_interval:
+                compacted.append({"t": t, "s": scope, "c": value})
+                since_checkpoint[system] = 0
+            elif value != last[system]:
+                compacted.append({"t": t, "s": scope, "d": diff(last[system], value), "k": 1})
+                since_checkpoint[system] += 1
+            last[system] = value
+
+        temp = old[0] + ".tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            for record in compacted:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        os.replace(temp, old[0])
+        for segment in old[1:]:
+            os.remove(segment)
+
+    # -- reading ---------------------------------------------------------
+
+    def history(self) -> list[Change]:
+        """Returns every recorded change, oldest first."""
+        changes = []
+        states: dict[bool, list[str]] = {}
+        for segment in self.segments():
+            for record in self._read(segment):
+                system = SYSTEMS[record["s"]]
+                before = states.get(system)
+                self._apply(record, states)
+                if "d" not in record or before is None:
+                    continue
+                after = states[system]
+                added = [e for e in after if e not in before]
+                removed = [e for e in before if e not in after]
+                changes.append(
+                    Change(record["t"], system, added, removed, before, after, record.get("u", 0), "r" in record, "k" in record)
+                )
+        return changes
+
+    def state_at(self, t: float) -> dict[bool, list[str]]:
+        """Returns the last recorded value of each scope at or before ``t``.
+
+        Scopes with no record before ``t`` are missing from the result.
+        """
+        segments = self.segments()
+        # Segments are self-contained, so start from the newest one that
+        # begins at or before ``t``.
+        start = 0
+        for index, segment in enumerate(segments):
+            records = self._read(segment)
+            if records and records[0]["t"] <= t:
+                start = index
+        states: dict[bool, list[str]] = {}
+        for segment in segments[start:]:
+            for record in self._read(segment):
+                if record["t"] > t:
+                    return states
+                self._apply(record, states)
+        return states
+
+    def undo(self, count: int = 1, scopes=(True, False)) -> dict[bool, tuple[list[str], int]]:
+        """Finds the values that undo the last ``count`` changes to ``scopes``.
+
+        Changes already reverted by an earlier undo, and those undos
+        themselves, are skipped, and compacted changes are never undone.
+
+        Returns
+        -------
+        dict[bool, tuple[list[str], int]]
+            For each scope among the undone changes, its value before them
+            and how many of them it had.
+        """
+        # (scope, value before) of every change not reverted yet, oldest first
+        live: list[tuple[bool, list[str]]] = []
+        states: dict[bool, list[str]] = {}
+        for segment in self.segments():
+            for record in self._read(segment):
+                system = SYSTEMS[record["s"]]
+                before = states.get(system)
+                self._apply(record, states)
+                if "d" not in record or before is None:
+                    continue
+                for _ in range(record.get("u", 0)):
+                    reverted = next((i for i in range(len(live) - 1, -1, -1) if live[i][0] == system), None)
+                    if reverted is None:
+                        break
+                    del live[reverted]
+                if "u" not in record and "k" not in record:
+                    live.append((system, list(before)))
+
+        selected = [change for change in live if change[0] in scopes]
+        targets: dict[bool, tuple[list[str], int]] = {}
+        for system, before in selected[-count:] if count > 0 else []:
+            value, undone = targets.get(system, (before, 0))
+            targets[system] = (value, undone + 1)
+        return targets
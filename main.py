@@ -1,12 +1,11 @@
-from parser import parse_args, help_option
+from parser import FORWARDED, parse_args, help_option, flag_value, flag_values
 import sys
-from registry import PathManager
-import re
+import time
 import os
-from registry import remove_non_existing_user_paths, remove_non_existing_system_paths, get_non_existing_user_paths, get_non_existing_system_paths
-import tkinter as tk
-from tkinter import filedialog
-from tkinter import ttk
+
+# everything else, the registry included, is imported by the command that
+# needs it, so `path help` does not pay for it and a plain `path list` does
+# not pay for tkinter, json, difflib or the probe engine
 
 
 
@@ -19,6 +18,8 @@ def fix_flags(flags:list[str]) -> list[str]:
             retv.append("-s")
         elif flag == "--user":
             retv.append("-u")
+        else:
+            retv.append(flag)
     return retv
 
 
@@ -61,188 +62,772 @@ def _clean_path(path:str) -> str:
 def _add_helper(args:list[str], flags):
     return [_clean_path(arg) for arg in args]
 
+def _scopes(flags:list[str]) -> list[bool]:
+    """returns the scopes selected by -s / -u, system first. True is system, False is user."""
+    if "-s" not in flags and "-u" not in flags:
+        return [True, False]
+    return [system for system, flag in ((True, "-s"), (False, "-u")) if flag in flags]
+
+def _managers(flags:list[str], probing=False) -> "list[PathManager]":
+    """returns a manager per --var NAME, PATH by default
+
+    they share one snapshot of each Environment key, so any number of
+    variables costs one registry read per scope. with probing, variables
+    whose entries are not paths (PATHEXT) are refused.
+    """
+    from registry import NOT_PATHS, PathManager
+    
+    pathman = PathManager()
+    names = flag_values(flags, "--var")
+    for name in names if probing else ():
+        if name.upper() in NOT_PATHS:
+            print(f"[NOT PATHS] {name} does not hold paths", file=sys.stderr)
+            sys.exit(2)
+    return [pathman.with_variable(name) for name in names] if names else [pathman]
+
+def _label(pathman:"PathManager", system:bool) -> str:
+    """returns the scope tag of an entry, naming the variable unless it is PATH"""
+    scope = "SYSTEM" if system else "USER"
+    return scope if pathman.variable.upper() == "PATH" else f"{scope} {pathman.variable}"
+
+
+# characters that cannot appear in a directory name
+_INVALID = set('<>"|?*')
+
+def _read_paths(stream):
+    """yields the paths of a newline- or NUL-separated text stream, without blank ones"""
+    pending = stream.read(1 << 16)
+    # find -print0 and similar output; decided on the first chunk
+    separator = "\0" if "\0" in pending else "\n"
+    while pending:
+        chunk = stream.read(1 << 16)
+        parts = (pending + chunk).split(separator)
+        pending = parts.pop() if chunk else ""
+        for part in parts:
+            if part.strip():
+                yield part.strip()
+
+def _open_paths(filename:str):
+    """opens a file of paths, honouring a UTF-16 byte order mark (PowerShell's `>`)"""
+    with open(filename, "rb") as f:
+        bom = f.read(2)
+    encoding = "utf-16" if bom in (b"\xff\xfe", b"\xfe\xff") else "utf-8-sig"
+    return open(filename, "r", encoding=encoding, newline="")
+
+def _bulk_paths(args:list[str], flags:list[str]):
+    """yields the paths in args, then those read from stdin (-) and --from-file, one at a time"""
+    for arg in args:
+        if arg != "-":
+            yield arg
+    if "-" in args:
+        yield from _read_paths(sys.stdin)
+    filename = flag_value(flags, "--from-file")
+    if filename is not None:
+        try:
+            with _open_paths(filename) as f:
+                yield from _read_paths(f)
+        except OSError as e:
+            print(f"[CANNOT READ] {filename}: {e.strerror}", file=sys.stderr)
+            sys.exit(2)
+
+def _rejected(path:str) -> str | None:
+    """returns why a path cannot be a PATH entry, or None if it can"""
+    if any(ord(c) < 32 for c in path):
+        return "contains a control character"
+    quoted = len(path) > 1 and path[0] == path[-1] == '"'
+    inner = path[1:-1] if quoted else path
+    invalid = _INVALID.intersection(inner)
+    if invalid:
+        return "contains " + " ".join(sorted(invalid))
+    if ";" in inner and not quoted:
+        return "contains ; and would split into several entries"
+    return None
+
+def _bulk(args:list[str], flags:list[str]) -> bool:
+    """returns True if paths are read from stdin or a file, which gets counts reported"""
+    return "-" in args or flag_value(flags, "--from-file") is not None
+
 def add_option(args:list[str]=[], flags:list[str]=[]) -> None:
-    """add a path to the PATH environment variable
+    """add paths to the PATH environment variable
 
     Args:
-        args (list[str], optional): _description_. Defaults to None.
-        flags (list[str], optional): _description_. Defaults to None.
+        args (list[str], optional): paths, - to also read them from stdin. Defaults to None.
+        flags (list[str], optional): -s, -u and --from-file FILE. Defaults to None.
     """
+    from compact import DEFAULT_LIMIT
+    
     flags = fix_flags(flags)
-    args = _add_helper(args, flags)
-    pathman = PathManager()
-    if "-s" in flags:
-        for arg in args:
-            pathman.add_system_path(arg)
-    if "-u" in flags:
-        for arg in args:
-            pathman.add_user_path(arg)
-    if "-s" not in flags and "-u" not in flags:
-        for arg in args:
-            pathman.add_system_path(arg)
-            pathman.add_user_path(arg)
+    scopes = _scopes(flags)
+    paths = []
+    rejected = 0
+    for path in _bulk_paths(args, flags):
+        reason = _rejected(path)
+        if reason is not None:
+            print(f"[REJECTED] {path} ({reason})", file=sys.stderr)
+            rejected += 1
+            continue
+        quoted = len(path) > 1 and path[0] == path[-1] == '"'
+        paths.append(f'"{_clean_path(path[1:-1])}"' if quoted else _clean_path(path))
+    for pathman in _managers(flags):
+        added = {system: 0 for system in scopes}
+        skipped = {system: 0 for system in scopes}
+        with pathman.session() as session:
+            for path in paths:
+                for system in scopes:
+                    if session.add(path, system=system):
+                        added[system] += 1
+                    else:
+                        skipped[system] += 1
+            for system in scopes if pathman.variable.upper() == "PATH" else ():
+                # installers truncate long values; shorten it before that happens,
+                # reporting every entry it rewrites or drops
+                if session.changed(system) and len(session.value(system)) > DEFAULT_LIMIT:
+                    _compact_scope(session, system)
+        if _bulk(args, flags):
+            for system in scopes:
+                print(f"[ADDED][\033[34m{_label(pathman, system)}\033[0m] {added[system]} added, "
+                      f"{skipped[system]} already present, {rejected} rejected")
+    
+def _compact_scope(session, system:bool, short_names=False, limit:int=None, dry_run=False):
+    """compacts a scope of the session in place and reports it. returns the Compaction."""
+    from canon import canonical_key
+    from compact import DEFAULT_LIMIT, compact, variable_names
+    
+    limit = DEFAULT_LIMIT if limit is None else limit
+    expander = session.manager.expander()
+    shadowed = () if system else [canonical_key(p, expander) for p in session.paths(True).raw()]
+    names = variable_names(session.manager, system)
+    result = compact(session.paths(system).raw(), expander, names, shadowed, short_names)
+    scope = "SYSTEM" if system else "USER"
+    for old, new in result.rewritten:
+        print(f"[REWRITTEN][\033[34m{scope}\033[0m] {old} -> {new}")
+    for path, reason in result.dropped:
+        print(f"[DROPPED][\033[34m{scope}\033[0m] {path} ({reason})")
+    headroom = limit - result.after
+    color = "\033[32m" if headroom >= 0 else "\033[31m"
+    print(f"[COMPACTED][\033[34m{scope}\033[0m] {result.before} -> {result.after} characters, "
+          f"saved {result.saved}, {color}{headroom}\033[0m left under {limit}")
+    if not dry_run:
+        session.replace(result.entries, system=system)
+    return result
+
+
+def _writer(flags:list[str]):
+    """returns the record writer asked for with --format, or None for text output"""
+    format = flag_value(flags, "--format")
+    if format is None:
+        return None
+    from export import open_writer
+    
+    return open_writer(format, flag_value(flags, "--output"))
+
+def _export_paths(flags:list[str]) -> bool:
+    """writes the selected scopes as --format records. returns False if no format was asked for."""
+    writer = _writer(flags)
+    if writer is None:
+        return False
+    from export import record
     
+    try:
+        for pathman in _managers(flags):
+            expander = pathman.expander()
+            for system in _scopes(flags):
+                paths = (pathman.get_system_paths() if system else pathman.get_user_paths()).raw()
+                for index, (raw, expanded) in enumerate(zip(paths, expander.expand_all(paths))):
+                    writer.write(record(system, index, raw, expanded, variable=pathman.variable))
+    finally:
+        writer.close()
+    return True
+
+def _list_effective(flags:list[str]) -> None:
+    """prints the PATH a new process gets, marking user entries a system entry shadows"""
+    managers = _managers(flags)
+    writer = _writer(flags)
+    if writer is not None:
+        from export import record
+        
+        try:
+            for pathman in managers:
+                for e in pathman.effective_paths():
+                    redundant = "REDUNDANT" if e.shadowed_by else None
+                    writer.write(record(e.entry.system, e.index, e.entry.raw, e.entry.expanded, redundant, pathman.variable))
+        finally:
+            writer.close()
+        return
+    for pathman in managers:
+        entries = pathman.effective_paths()
+        path = pathman.variable.upper() == "PATH"
+        print(f"effective {'PATH' if path else pathman.variable}:")
+        for position, e in enumerate(entries, 1):
+            scope = "SYSTEM" if e.entry.system else "USER"
+            line = f"{position:>5} [\033[34m{scope}\033[0m] {e.entry.expanded}"
+            if e.shadowed_by is not None:
+                line += f"  [\033[33mREDUNDANT\033[0m] same as [SYSTEM] {e.shadowed_by.raw}"
+            print(line)
+        redundant = sum(e.shadowed_by is not None for e in entries)
+        if redundant and path:
+            print(f"{redundant} user entries repeat a system entry; 'path prune-redundant' removes them")
 
 def list_option(args:list[str]=[], flags:list[str]=[]) -> None:
-    pathman = PathManager()
     flags = fix_flags(flags)
-    if "-s" in flags:
-        print("system paths:")
-        for p in pathman.get_system_paths():
-            print("  ", p)
-            
-    if "-u" in flags:
-        print("user paths:")
-        for p in pathman.get_user_paths():
-            print("  ", p)
-    
-    if "-s" not in flags and "-u" not in flags:
-        print("system paths:")
-        for p in pathman.get_system_paths():
-            print("  ", p)
-        print("user paths:")
-        for p in pathman.get_user_paths():
-            print("  ", p)
+    if _export_paths(flags):
+        return
+    if "--effective" in flags:
+        _list_effective(flags)
+        return
+    for pathman in _managers(flags):
+        name = "paths" if pathman.variable.upper() == "PATH" else pathman.variable
+        for system in _scopes(flags):
+            print(f"{'system' if system else 'user'} {name}:")
+            for p in pathman.get_system_paths() if system else pathman.get_user_paths():
+                print("  ", p)
          
 def remove_option(args:list[str]=[], flags:list[str]=[]) -> None:
     flags = fix_flags(flags)
-    if "-s" in flags:
-        pathman = PathManager()
-        for arg in args:
-            pathman.remove_system_path(arg)
-    if "-u" in flags:
-        pathman = PathManager()
-        for arg in args:
-            pathman.remove_user_path(arg)
-    if "-s" not in flags and "-u" not in flags:
-        pathman = PathManager()
-        for arg in args:
-            pathman.remove_system_path(arg)
-            pathman.remove_user_path(arg)
+    paths = []
+    rejected = 0
+    for path in _bulk_paths(args, flags):
+        reason = _rejected(path)
+        if reason is not None:
+            print(f"[REJECTED] {path} ({reason})", file=sys.stderr)
+            rejected += 1
+        else:
+            paths.append(path)
+    for pathman in _managers(flags):
+        with pathman.session() as session:
+            for system in _scopes(flags):
+                entries = session.paths(system)
+                keys = {entries.key(path) for path in paths}
+                missing = len(keys - {entry.key for entry in entries})
+                removed = session.remove_all(paths, system=system)
+                if _bulk(args, flags):
+                    print(f"[REMOVED][\033[34m{_label(pathman, system)}\033[0m] {removed} removed, "
+                          f"{missing} not present, {rejected} rejected")
 
 def clean_option(args:list[str]=[], flags:list[str]=[]) -> None:
+    from registry import find_non_existing
+    
     flags = fix_flags(flags)
     # doesnt accept any arguments
-    if "-u" in flags:
-        pathman = PathManager()
-        nonexists = get_non_existing_user_paths()
-        for item in nonexists:
-            print(f"[DOES NOT EXIST] {item}")
-            pathman.remove_user_path(item)
-            print(f"[REMOVED] {item}")
-        remove_non_existing_user_paths()
-    
-    if "-s" in flags:
-        pathman = PathManager()
-        nonexists = get_non_existing_system_paths()
-        for item in nonexists:
-            print(f"[DOES NOT EXIST] {item}")
-            pathman.remove_system_path(item)
-            print(f"[REMOVED] {item}")
-        
-    if "-s" not in flags and "-u" not in flags:
-        pathman = PathManager()
-        nonexists = get_non_existing_system_paths()
-        for item in nonexists:
-            print(f"[DOES NOT EXIST] {item}")
-            pathman.remove_system_path(item)
-            print(f"[REMOVED] {item}")
-        nonexists = get_non_existing_user_paths()
-        for item in nonexists:
-            print(f"[DOES NOT EXIST] {item}")
-            pathman.remove_user_path(item)
-            print(f"[REMOVED] {item}")
+    for pathman in _managers(flags, probing=True):
+        with pathman.session() as session:
+            expander = session.manager.expander()
+            for system in _scopes(flags):
+                if "--deep" in flags:
+                    from resolve import pathext
+                    from survey import PRUNABLE, survey
+                    
+                    reports = [r for r in survey(session.paths(system).raw(), expander.expand, pathext()) if r.status in PRUNABLE]
+                    broken = [r.path for r in reports]
+                    for report in reports:
+                        print(f"[{report.status}] {report.path}")
+                else:
+                    broken = find_non_existing(session.paths(system), "--no-cache" not in flags, expander)
+                    for item in broken:
+                        print(f"[DOES NOT EXIST] {item}")
+                session.remove_all(broken, system=system)
+                for item in broken:
+                    print(f"[REMOVED] {item}")
 
 def get_option(args:list[str]=[], flags:list[str]=[]) -> None:
     flags = fix_flags(flags)
-    if "-s" in flags:
-        pathman = PathManager()
-        print(pathman.get_system_paths())
-    if "-u" in flags:
-        pathman = PathManager()
-        print(pathman.get_user_paths())
-    if "-s" not in flags and "-u" not in flags:
-        pathman = PathManager()
-        print(pathman.get_system_paths())
-        print(pathman.get_user_paths())
+    if _export_paths(flags):
+        return
+    for pathman in _managers(flags):
+        for system in _scopes(flags):
+            print((pathman.get_system_paths() if system else pathman.get_user_paths()).raw())
+
+AUDIT_COLORS = {"VALID": "\033[32m", "BROKEN": "\033[31m", "TIMEOUT": "\033[33m"}
+
+DEEP_COLORS = {
+    "VALID": "\033[32m", "NO EXECUTABLES": "\033[33m", "EMPTY": "\033[33m", "ACCESS DENIED": "\033[33m",
+    "MISSING": "\033[31m", "NOT A DIRECTORY": "\033[31m", "BROKEN LINK": "\033[31m", "TIMEOUT": "\033[33m",
+}
+
+def _deep_audit(flags:list[str]) -> None:
+    """lists every entry and reports what it holds, see survey.py"""
+    from export import record
+    from resolve import pathext
+    from survey import NO_EXECUTABLES, PRUNABLE, VALID, survey
+    
+    started = time.perf_counter()
+    max_broken = 0 if "--fail-fast" in flags else flag_value(flags, "--max-broken")
+    managers = _managers(flags, probing=True)
+    expander = managers[0].expander()
+    entries = []
+    for pathman in managers:
+        for system in _scopes(flags):
+            paths = (pathman.get_system_paths() if system else pathman.get_user_paths()).raw()
+            entries.extend((pathman, system, i, p) for i, p in enumerate(paths))
+    writer = _writer(flags)
+    counts = dict.fromkeys(DEEP_COLORS, 0)
+    listing = 0.0
+    slowest = None
+    # every scope and variable is listed as one batch; reports come back in order
+    reports = survey([path for _, _, _, path in entries], expander.expand, pathext())
+    for (pathman, system, position, path), report in zip(entries, reports):
+        counts[report.status] += 1
+        listing += report.elapsed
+        if slowest is None or report.elapsed > slowest.elapsed:
+            slowest = report
+        if writer is not None:
+            writer.write(record(system, position, path, expander.expand(path), report.status, pathman.variable))
+            continue
+        scope = _label(pathman, system)
+        detail = f"{report.elapsed * 1000:.1f} ms"
+        if report.status in (VALID, NO_EXECUTABLES):
+            detail = f"{report.executables} of {report.files} files executable, {detail}"
+        print(f"[\033[34m{scope}\033[0m][{DEEP_COLORS[report.status]}{report.status}\033[0m] {path} ({detail})", flush=True)
+    if writer is not None:
+        writer.close()
+    
+    summary = ", ".join(f"{status.lower()}: {count}" for status, count in counts.items() if count or status == "VALID")
+    summary += f"; {listing * 1000:.0f} ms listing in {time.perf_counter() - started:.3f}s"
+    if slowest is not None:
+        summary += f", slowest {slowest.path} ({slowest.elapsed * 1000:.1f} ms)"
+    prunable = sum(counts[status] for status in PRUNABLE)
+    if prunable:
+        summary += f"\n{prunable} entries can be removed with 'path clean --deep'"
+    print(summary, file=sys.stderr if writer is not None else sys.stdout)
+    if max_broken is not None and prunable > int(max_broken):
+        sys.exit(1)
 
 def audit_option(args:list[str]=[], flags:list[str]=[]) -> None:
+    from cache import AuditRecord, AuditState, StatCache
+    from checker import BROKEN, TIMEOUT, ProbeResult
+    from export import record
+    from registry import default_checker
+    
     flags = fix_flags(flags)
+    if "--deep" in flags:
+        _deep_audit(flags)
+        return
+    started = time.perf_counter()
+    max_broken = 0 if "--fail-fast" in flags else flag_value(flags, "--max-broken")
+    max_broken = int(max_broken) if max_broken is not None else None
+    full = "--full" in flags or "--no-cache" in flags
+    managers = _managers(flags, probing=True)
+    state = AuditState.load()
+    entries = []
+    values = {}
+    # every variable comes from the same snapshot of each scope
+    for pathman in managers:
+        for system in _scopes(flags):
+            paths = (pathman.get_system_paths() if system else pathman.get_user_paths()).raw()
+            values[(pathman, system)] = ";".join(paths)
+            entries.extend((pathman, system, i, p) for i, p in enumerate(paths))
+    
+    # an unchanged PATH without %VAR% references never needs the expander
+    expander = managers[0].expander() if any("%" in entry[3] for entry in entries) else None
+    # results of the last audit that are still fresh are reused; only new,
+    # expired, re-expanded and timed-out entries are probed
+    known = {}
+    for index, (pathman, system, _, path) in enumerate(entries):
+        last = None if full else state.get(system, path, pathman.variable, expander)
+        if last is not None and last.status != TIMEOUT:
+            known[index] = last
+    pending = [index for index in range(len(entries)) if index not in known]
+    if pending and expander is None:
+        expander = managers[0].expander()
+    cache = None if "--no-cache" in flags or not pending else StatCache.load()
+    writer = _writer(flags)
+    
+    def expanded(index):
+        return known[index].expanded if index in known else expander.expand(entries[index][3])
+    
+    def show(index, result):
+        pathman, system, position, path = entries[index]
+        if writer is not None:
+            writer.write(record(system, position, path, expanded(index), result.status, pathman.variable))
+            return
+        scope = _label(pathman, system)
+        print(f"[\033[34m{scope}\033[0m][{AUDIT_COLORS[result.status]}{result.status}\033[0m] {result.path}", flush=True)
+    
+    buffered = {}
+    checked = dict(known)
+    shown = 0
+    counts = dict.fromkeys(AUDIT_COLORS, 0)
+    failed = False
+    
+    def take(index, result):
+        nonlocal shown, failed
+        buffered[index] = result
+        counts[result.status] += 1
+        while shown in buffered:
+            show(shown, buffered.pop(shown))
+            shown += 1
+        if max_broken is not None and counts[BROKEN] > max_broken:
+            failed = True
+    
+    for index in sorted(known):
+        take(index, ProbeResult(entries[index][3], known[index].status, 0.0))
+        if failed:
+            break
+    if not failed and pending:
+        # both scopes are probed as one batch so slow entries overlap; results
+        # are printed in PATH order as soon as every entry before them is known
+        expander.expand_all(entries[index][3] for index in pending)
+        completed = default_checker(cache, expander.expand).iter_completed(entries[index][3] for index in pending)
+        try:
+            for probed, result in completed:
+                index = pending[probed]
+                checked[index] = AuditRecord(result.status, expander.expand(entries[index][3]), time.time())
+                take(index, result)
+                if failed:
+                    break
+        finally:
+            completed.close()
+            if cache is not None:
+                cache.save()
+    # entries that finished before an earlier entry when the audit stopped
+    for index in sorted(buffered):
+        show(index, buffered[index])
+    if writer is not None:
+        writer.close()
+    
+    unchanged = len(pending) == 0 and all(
+        state.unchanged(system, value, pathman.variable) for (pathman, system), value in values.items()
+    )
+    for (pathman, system), value in values.items():
+        results = {entries[i][3]: r for i, r in checked.items() if entries[i][:2] == (pathman, system) and r.status != TIMEOUT}
+        state.update(system, value, results, pathman.variable)
+    state.save()
+    
+    total = sum(counts.values())
+    summary = f"valid: {counts['VALID']}, broken: {counts['BROKEN']}, timed out: {counts['TIMEOUT']} in {time.perf_counter() - started:.3f}s"
+    if total < len(entries):
+        summary += f" (stopped after {total} of {len(entries)} entries)"
+    elif unchanged:
+        summary += " (unchanged since the last audit)"
+    elif known:
+        summary += f" ({len(pending)} probed, {len(known)} from the last audit)"
+    # keep machine-readable output clean
+    print(summary, file=sys.stderr if writer is not None else sys.stdout)
+    if failed:
+        sys.exit(1)
+
+def dedup_option(args:list[str]=[], flags:list[str]=[]) -> None:
+    from canon import find_duplicates
+    
+    flags = fix_flags(flags)
+    dry_run = "--dry-run" in flags
+    for pathman in _managers(flags):
+        with pathman.session() as session:
+            scopes = [(system, session.paths(system).raw()) for system in _scopes(flags)]
+            duplicates = find_duplicates(scopes, "--long-names" in flags, session.manager.expander())
+            for d in duplicates:
+                scope = _label(pathman, d.system)
+                kept = _label(pathman, d.kept_system)
+                print(f"[DUPLICATE][\033[34m{scope}\033[0m] {d.path}  (same as [{kept}] {d.kept_path})")
+            if dry_run:
+                continue
+            name = "PATH" if pathman.variable.upper() == "PATH" else pathman.variable
+            for system, paths in scopes:
+                drop = {d.index for d in duplicates if d.system == system}
+                if drop:
+                    session.replace([p for i, p in enumerate(paths) if i not in drop], system=system)
+                    print(f"[REMOVED] {len(drop)} duplicate(s) from the {'system' if system else 'user'} {name}")
+
+def prune_redundant_option(args:list[str]=[], flags:list[str]=[]) -> None:
+    from registry import PathManager
+    
+    flags = fix_flags(flags)
+    with PathManager().session() as session:
+        entries = session.manager.effective_paths(session.paths(True).raw(), session.paths(False).raw())
+        redundant = [e for e in entries if e.shadowed_by is not None]
+        for e in redundant:
+            print(f"[REDUNDANT][\033[34mUSER\033[0m] {e.entry.raw}  (same as [SYSTEM] {e.shadowed_by.raw})")
+        if "--dry-run" in flags or not redundant:
+            return
+        user = session.paths(False)
+        for e in reversed(redundant):
+            del user[e.index]
+        print(f"[REMOVED] {len(redundant)} redundant entries from the user PATH")
+
+def history_option(args:list[str]=[], flags:list[str]=[]) -> None:
+    from journal import Journal, format_time
+    
+    flags = fix_flags(flags)
+    count = int(args[0]) if args else 20
+    scopes = _scopes(flags)
+    changes = [c for c in Journal().history() if c.system in scopes]
+    for change in changes[-count:] if count > 0 else []:
+        scope = "SYSTEM" if change.system else "USER"
+        kind = f" undo of {change.undone}" if change.undone else (" restore" if change.restored else "")
+        kind = " day's net change" if change.compacted else kind
+        print(f"{format_time(change.time)} [\033[34m{scope}\033[0m]{kind}")
+        for p in change.added:
+            print(f"    \033[32m+\033[0m {p}")
+        for p in change.removed:
+            print(f"    \033[31m-\033[0m {p}")
+        if not change.added and not change.removed:
+            print("    (reordered)")
+
+def _restore(pathman:"PathManager", targets:dict[bool, list[str]], flags:list[str], undone:dict[bool, int]=None) -> None:
+    """writes the target values of the selected scopes. undone marks the writes as undos in the journal"""
+    scopes = _scopes(flags)
+    with pathman.session() as session:
+        for system, paths in targets.items():
+            if system not in scopes:
+                continue
+            session.replace(paths, system=system)
+            session.marks[system] = {"undone": undone[system]} if undone else {"restored": True}
+            if session.changed(system):
+                print(f"[RESTORED] {'system' if system else 'user'} PATH ({len(paths)} entries)")
+
+def undo_option(args:list[str]=[], flags:list[str]=[]) -> None:
+    from registry import PathManager
+    
+    flags = fix_flags(flags)
+    count = int(args[0]) if args else 1
     pathman = PathManager()
-    if "-s" in flags:
-        for p in pathman.get_system_paths():
-            if os.path.exists(p) == False:
-                print(f"[\033[34mSYSTEM\033[0m][\033[31mBROKEN\033[0m] {p}")
-            else:
-                print(f"[\033[34mSYSTEM\033[0m][\033[32mVALID\033[0m] {p}")
-    if "-u" in flags:
-        for p in pathman.get_user_paths():
-            if os.path.exists(p) == False:
-                print(f"[\033[34mUSER\033[0m][\033[31mBROKEN\033[0m] {p}")
-            else:
-                print(f"[\033[34mUSER\033[0m][\033[32mVALID\033[0m] {p}")
-    if "-s" not in flags and "-u" not in flags:
-        for p in pathman.get_system_paths():
-            if os.path.exists(p) == False:
-                print(f"[\033[34mSYSTEM\033[0m][\033[31mBROKEN\033[0m] {p}")
-            else:
-                print(f"[\033[34mSYSTEM\033[0m][\033[32mVALID\033[0m] {p}")
-        for p in pathman.get_user_paths():
-            if os.path.exists(p) == False:
-                print(f"[\033[34mUSER\033[0m][\033[31mBROKEN\033[0m] {p}")
-            else:
-                print(f"[\033[34mUSER\033[0m][\033[32mVALID\033[0m] {p}")
+    found = pathman.journal.undo(count, _scopes(flags))
+    if not found:
+        print("nothing to undo")
+        return
+    targets = {system: paths for system, (paths, _) in found.items()}
+    _restore(pathman, targets, flags, {system: undone for system, (_, undone) in found.items()})
 
-def browse():
+def restore_option(args:list[str]=[], flags:list[str]=[]) -> None:
+    from journal import parse_time
+    from registry import PathManager
     
-    def bcallback(c, d):
-        root.destroy()
-        if c == "exit":
-            exit()
-        elif c == "add all":
-            add_option(d, [])
-        elif c == "remove all":
-            remove_option(d, [])
-        elif c == "add system path":
-            add_option(d, ["-s"])
-        elif c == "add user path":
-            add_option(d, ["-u"])
-        elif c == "remove system path":
-            remove_option(d, ["-s"])
-        elif c == "remove user path":
-            remove_option(d, ["-u"])
-        
-        exit()
-        
+    flags = fix_flags(flags)
+    if not args:
+        help_option(["restore"], flags)
+        return
+    pathman = PathManager()
+    targets = pathman.journal.state_at(parse_time(args[0]))
+    if not targets:
+        print(f"no PATH history recorded at or before {args[0]}")
+        return
+    _restore(pathman, targets, flags)
+
+def which_option(args:list[str]=[], flags:list[str]=[]) -> None:
+    from registry import PathManager
+    from resolve import ExecutableIndex
     
-    root = tk.Tk()
-    dirname = filedialog.askdirectory(parent=root,initialdir=CALLING_DIRECTORY, title='Please select a directory')
-    label = ttk.Label(root, text=dirname)
-    label.pack(padx=20, pady=20)
-    label2 = ttk.Label(root, text="click a button below:")
-    label2.pack(padx=20, pady=20)
+    flags = fix_flags(flags)
+    names = args
+    if not names or names == ["-"]:
+        names = [line.strip() for line in sys.stdin if line.strip()]
+    pathman = PathManager()
+    scopes = _scopes(flags)
+    entries = []
+    if True in scopes:
+        entries += pathman.get_system_paths().raw()
+    if False in scopes:
+        entries += pathman.get_user_paths().raw()
+    index = ExecutableIndex(entries, pathman.expander())
+    missing = 0
+    for name in names:
+        matches = index.find_all(name) if "--all" in flags or "-a" in flags else [index.find(name)]
+        if not matches or matches[0] is None:
+            print(f"[NOT FOUND] {name}")
+            missing += 1
+            continue
+        print(matches[0].path)
+        for match in matches[1:]:
+            print(f"    [SHADOWED] {match.path}")
+    if missing:
+        sys.exit(1)
+
+def optimize_option(args:list[str]=[], flags:list[str]=[]) -> None:
+    from optimize import optimize, read_frequencies
+    from registry import PathManager
     
-    for cmd in ["add","remove"]:
-        button = ttk.Button(root, text=cmd + " system path", command=lambda: bcallback(cmd, dirname))
-        button.pack(padx=20, pady=20)
-        button = ttk.Button(root, text=cmd + " user path", command=lambda: bcallback(cmd, dirname))
-        button.pack(padx=20, pady=20)
-        button = ttk.Button(root, text=cmd + " all", command=lambda: bcallback(cmd, dirname))
-        button.pack(padx=20, pady=20)
+    flags = fix_flags(flags)
+    frequencies = None
+    log = flag_value(flags, "--log")
+    if log is not None:
+        with open(log, "r", encoding="utf-8", errors="replace") as f:
+            frequencies = read_frequencies(f)
+    with PathManager().session() as session:
+        current = {system: session.paths(system).raw() for system in (True, False)}
+        try:
+            plan = optimize(current[True], current[False], _scopes(flags), frequencies, expand=session.manager.expander())
+        except ValueError as e:
+            print(f"[\033[31mREFUSED\033[0m] {e}; PATH left unchanged", file=sys.stderr)
+            sys.exit(1)
+        for scope in _scopes(flags):
+            proposed = plan.system if scope else plan.user
+            if not plan.changed(scope, current[scope]):
+                continue
+            print(f"[\033[34m{'SYSTEM' if scope else 'USER'}\033[0m]")
+            for i, p in enumerate(proposed):
+                ms = plan.latency.get(p, 0.0) * 1000
+                print(f"    {i:>3}. {p}  ({ms:.3f} ms, {plan.hits.get(p, 0):g} hits, was {current[scope].index(p)})")
+            if "--dry-run" not in flags:
+                session.replace(proposed, system=scope)
+        for pin in plan.pins:
+            print(f"[KEPT] {pin.entry} after {pin.after}: moving it first would change what {pin.name} runs")
+        saved = plan.cost_before - plan.cost_after
+        percent = saved / plan.cost_before * 100 if plan.cost_before else 0.0
+        print(f"estimated lookup cost: {plan.cost_before * 1000:.3f} ms -> {plan.cost_after * 1000:.3f} ms per command ({percent:.0f}% less)")
 
-    button = ttk.Button(root, text="exit", command=lambda: bcallback("exit", dirname))
-    button.pack(padx=20, pady=20)
+def profiles_option(args:list[str]=[], flags:list[str]=[]) -> None:
+    import profiles
+    
+    if not args:
+        help_option(["profiles"], flags)
+        return
+    operation, paths = args[0], _add_helper(args[1:], flags)
+    workers = flag_value(flags, "--workers")
+    found = profiles.discover(flag_value(flags, "--hives"))
+    if not found:
+        print("no profiles found")
+        return
+    totals = {"broken": 0, "timed out": 0, "unknown": 0, "added": 0, "removed": 0, "failed": 0}
+    results = profiles.run(found, operation, paths, int(workers) if workers else None, "--no-cache" not in flags)
+    for result in results:
+        profile = result.profile
+        where = f"  ({profile.home or profile.hive})" if profile.home or profile.hive else ""
+        print(f"[\033[34mPROFILE\033[0m] {profile.name}{where}")
+        if result.error is not None:
+            print(f"    [\033[31mERROR\033[0m] {result.error}")
+            totals["failed"] += 1
+            continue
+        if operation == "list":
+            for p in result.paths:
+                print("    ", p)
+        for label, items in (("DOES NOT EXIST", result.broken), ("TIMEOUT", result.timed_out), ("UNKNOWN", result.unknown), ("ADDED", result.added), ("REMOVED", result.removed)):
+            for p in items:
+                print(f"    [{label}] {p}")
+        totals["broken"] += len(result.broken)
+        totals["timed out"] += len(result.timed_out)
+        totals["unknown"] += len(result.unknown)
+        totals["added"] += len(result.added)
+        totals["removed"] += len(result.removed)
+    print(f"profiles: {len(found)}, " + ", ".join(f"{name}: {count}" for name, count in totals.items()))
+    if totals["failed"]:
+        sys.exit(1)
 
-    root.mainloop()
+def regfile_option(args:list[str]=[], flags:list[str]=[]) -> None:
+    from regfile import edit
     
+    flags = fix_flags(flags)
+    if len(args) < 2:
+        help_option(["regfile"], flags)
+        return
+    operation, filename, paths = args[0], args[1], args[2:]
+    output = flag_value(flags, "--output")
+    dry_run = "--dry-run" in flags
+    if operation == "clean" and flag_value(flags, "--root") is None:
+        print("[REFUSED] clean checks paths inside the image: pass --root DIR, where it is mounted", file=sys.stderr)
+        sys.exit(2)
+    try:
+        changes = edit(filename, operation, paths, _scopes(flags), output, flag_value(flags, "--root"), dry_run=dry_run)
+    except (OSError, ValueError) as e:
+        print(f"[INVALID REG FILE] {filename}: {e}", file=sys.stderr)
+        sys.exit(2)
+    if not changes:
+        print(f"no Environment key of the selected scopes in {filename}", file=sys.stderr)
+        sys.exit(1)
+    for change in changes:
+        scope = "SYSTEM" if change.system else "USER"
+        print(f"[\033[34m{scope}\033[0m] {change.key}")
+        if operation == "list":
+            for p in change.after:
+                print("    ", p)
+        for p in change.removed:
+            print(f"    [REMOVED] {p}")
+        for p in change.added:
+            print(f"    [ADDED] {p}")
+    if operation != "list":
+        changed = any(change.before != change.after for change in changes)
+        if dry_run or not (changed or output):
+            print("[DRY RUN]" if dry_run else "[UNCHANGED]", filename)
+        else:
+            print("[WRITTEN]", output or filename)
+
+def sync_option(args:list[str]=[], flags:list[str]=[]) -> None:
+    from canon import canonical_key
+    from registry import PathManager
+    from sync import load_manifest, plan
     
-    return dirname
+    flags = fix_flags(flags)
+    if not args:
+        help_option(["sync"], flags)
+        return
+    try:
+        rules = load_manifest(args[0])
+    except (OSError, ValueError) as e:
+        print(f"[INVALID MANIFEST] {args[0]}: {e}", file=sys.stderr)
+        sys.exit(2)
+    check = "--check" in flags
+    drift = False
+    with PathManager().session() as session:
+        expander = session.manager.expander()
+        key = lambda path: canonical_key(path, expander)
+        for system in _scopes(flags):
+            if system not in rules:
+                continue
+            scope = "SYSTEM" if system else "USER"
+            result = plan(system, session.paths(system).raw(), rules[system], key, expander)
+            if not result.changed:
+                print(f"[IN SYNC][\033[34m{scope}\033[0m]")
+                continue
+            drift = True
+            print(f"[{'DRIFT' if check else 'SYNCED'}][\033[34m{scope}\033[0m] +{len(result.added)} -{len(result.removed)} ~{len(result.moved)}")
+            for p in result.added:
+                print(f"    \033[32m+\033[0m {p}")
+            for p in result.removed:
+                print(f"    \033[31m-\033[0m {p}")
+            for p in result.moved:
+                print(f"    \033[33m~\033[0m {p}")
+            if not check:
+                session.replace(result.after, system=system)
+    if check and drift:
+        sys.exit(1)
 
-       
+def compact_option(args:list[str]=[], flags:list[str]=[]) -> None:
+    from compact import DEFAULT_LIMIT
+    from registry import PathManager
     
-def main():
-    option, args, flags = parse_args()
+    flags = fix_flags(flags)
+    limit = flag_value(flags, "--limit")
+    limit = int(limit) if limit is not None else DEFAULT_LIMIT
+    over = False
+    with PathManager().session() as session:
+        for system in _scopes(flags):
+            result = _compact_scope(session, system, "--short-names" in flags, limit, "--dry-run" in flags)
+            over |= result.after > limit
+    # still too long: the caller has to remove entries
+    if over:
+        sys.exit(1)
+
+def has_option(args:list[str]=[], flags:list[str]=[]) -> None:
+    from registry import PathManager
+    
+    flags = fix_flags(flags)
+    pathman = PathManager()
+    scopes = {system: pathman.get_system_paths() if system else pathman.get_user_paths() for system in _scopes(flags)}
+    missing = 0
+    for arg in _add_helper(args, flags):
+        found = [system for system, paths in scopes.items() if arg in paths]
+        for system in found:
+            print(f"[FOUND][\033[34m{'SYSTEM' if system else 'USER'}\033[0m] {arg}")
+        if not found:
+            print(f"[NOT FOUND] {arg}")
+            missing += 1
+    if missing:
+        sys.exit(1)
+
+def serve_option(args:list[str]=[], flags:list[str]=[]) -> None:
+    import server
+    
+    if "--stop" in flags:
+        print("[STOPPED]" if server.stop() else "no server is running")
+        return
+    max_age = flag_value(flags, "--max-age")
+    server.serve(float(max_age) if max_age is not None else server.DEFAULT_MAX_AGE)
+
+def browse():
+    from browser import Browser
     
+    Browser(initialdir=CALLING_DIRECTORY).run()
+
+def run(option:str, args:list[str], flags:list[str]) -> None:
     match option:
         case "help":
             help_option(args, flags)
@@ -258,14 +843,77 @@ def main():
             clean_option(args, flags)
         case "audit":
             audit_option(args, flags)
+        case "dedup":
+            dedup_option(args, flags)
+        case "history":
+            history_option(args, flags)
+        case "undo":
+            undo_option(args, flags)
+        case "restore":
+            restore_option(args, flags)
+        case "which":
+            which_option(args, flags)
+        case "optimize":
+            optimize_option(args, flags)
+        case "profiles":
+            profiles_option(args, flags)
+        case "compact":
+            compact_option(args, flags)
+        case "sync":
+            sync_option(args, flags)
+        case "prune-redundant":
+            prune_redundant_option(args, flags)
+        case "regfile":
+            regfile_option(args, flags)
+        case "has":
+            has_option(args, flags)
+        case "serve":
+            serve_option(args, flags)
         case "browse":
             browse()
         case _:
             help_option(args, flags)
-        
-    
 
 
+def main():
+    started = time.perf_counter()
+    option, args, flags = parse_args()
+    if option in FORWARDED:
+        from datadir import server_running
+        
+        # a running `path serve` answers these without any of the work below
+        if server_running():
+            from server import forward
+            
+            code = forward(sys.argv[1:], (option, args, flags))
+            if code is not None:
+                sys.exit(code)
+    trace_file = flag_value(flags, "--trace")
+    if trace_file is None and "--stats" not in flags:
+        run(option, args, flags)
+        return
+    
+    import registry
+    import tracing
+    
+    # route registry calls and console output through the tracer
+    tracer = tracing.Tracer(origin=started)
+    tracer.add("parse_args", tracing.CLI, started, time.perf_counter())
+    tracing.install(tracer)
+    registry.winreg = tracing.TracedRegistry(registry.winreg)
+    stdout = sys.stdout
+    sys.stdout = tracing.TracedStream(stdout)
+    try:
+        with tracing.span(option or "help", tracing.CLI):
+            run(option, args, flags)
+    finally:
+        sys.stdout = stdout
+        tracing.install(None)
+        if trace_file is not None:
+            tracer.write(trace_file)
+        if "--stats" in flags:
+            print(tracer.summary(option or "help"), file=sys.stderr)
+    
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,253 @@
+"""Reordering PATH entries to make command lookups cheaper.
+
+Every process launch searches PATH front to back, so a lookup pays a miss
+probe in every directory before the one that holds the command. Given the
+cost of a miss in each directory and how often each command is looked up,
+:func:`optimize` proposes an order with a lower expected cost per lookup.
+It never changes which file a name runs: if two directories hold files for
+the same name, the one that wins today stays in front of the other.
+
+Entries only move within their scope, since Windows always searches the
+system entries before the user entries.
+"""
+import heapq
+import ntpath
+import os
+import time
+from typing import Callable, Iterable, NamedTuple
+
+from resolve import ExecutableIndex
+
+
+PROBE_REPEAT = 3
+
+
+def probe_latency(directory: str, repeat: int = PROBE_REPEAT) -> float:
+    """Returns the median seconds a failed lookup takes in ``directory``."""
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        try:
+            os.stat(os.path.join(directory, f"pathcleaner-missing-{i}.exe"))
+        except (OSError, ValueError):
+            pass
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def read_frequencies(lines: Iterable[str]) -> dict[str, float]:
+    """Parses a command-lookup log into lookups per command name.
+
+    Each line holds a command name, optionally followed by a count. A name
+    may include a directory or extension, as shell histories often do.
+    """
+    counts: dict[str, float] = {}
+    for line in lines:
+        parts = line.split()
+        if not parts:
+            continue
+        try:
+            count = float(parts[1]) if len(parts) > 1 else 1.0
+        except ValueError:
+            count = 1.0
+        name = ntpath.basename(parts[0].replace("/", "\\")).lower()
+        counts[name] = counts.get(name, 0.0) + count
+    return counts
+
+
+class Pin(NamedTuple):
+    """An entry kept behind another because moving it first would change what ``name`` runs."""
+
+    entry: str
+    after: str
+    name: str
+
+
+class Plan(NamedTuple):
+    """The proposed order of each scope and its estimated cost."""
+
+    system: list[str]
+    user: list[str]
+    cost_before: float
+    cost_after: float
+    latency: dict[str, float]
+    hits: dict[str, float]
+    pins: list[Pin]
+
+    def changed(self, system: bool, current: list[str]) -> bool:
+        return (self.system if system else self.user) != current
+
+
+def _winners(index: ExecutableIndex, rank: list[int]) -> tuple[dict[str, int], dict[str, int]]:
+    """Returns the positions bare names and full file names resolve to when
+    directories are searched in ``rank`` order."""
+    stems: dict[str, tuple[int, int, int]] = {}
+    files: dict[str, int] = {}
+    for filename, holders in index.files.items():
+        first = min((holder[0] for holder in holders), key=rank.__getitem__)
+        files[filename] = first
+        stem, ext = ntpath.splitext(filename)
+        key = (rank[first], index.extensions.index(ext), first)
+        if stem not in stems or key < stems[stem]:
+            stems[stem] = key
+    return {stem: key[2] for stem, key in stems.items()}, files
+
+
+def _constraints(index: ExecutableIndex) -> dict[tuple[int, int], str]:
+    """Returns the (winner, other) position pairs that must keep their order.
+
+    Each pair maps to a command name whose resolution depends on it.
+    """
+    stems, files = _winners(index, list(range(len(index.directories))))
+    edges: dict[tuple[int, int], str] = {}
+    for filename, holders in index.files.items():
+        stem = ntpath.splitext(filename)[0]
+        for position, _ in holders:
+            for winner, name in ((stems[stem], stem), (files[filename], filename)):
+                if position != winner:
+                    edges.setdefault((winner, position), name)
+    return edges
+
+
+def optimize(
+    system: list[str],
+    user: list[str],
+    scopes: list[bool] = (True, False),
+    frequencies: dict[str, float] = None,
+    latency: Callable[[str], float] = None,
+    index: ExecutableIndex = None,
+    expand: Callable[[str], str] = None,
+) -> Plan:
+    """Proposes a cheaper order for the entries of ``scopes``.
+
+    Parameters
+    ----------
+    system, user : list[str]
+        The current entries of each scope.
+    scopes : list[bool], optional
+        The scopes that may be reordered (True is system, False is user).
+    frequencies : dict[str, float], optional
+        Lookups per command name, e.g. from :func:`read_frequencies`.
+        Without it every command found on PATH counts once.
+    latency : Callable[[str], float], optional
+        Returns the seconds one failed lookup takes in a directory, e.g.
+        :func:`probe_latency`. Defaults to the time the index took to list
+        the directory, which already paid one round-trip to it.
+    index : ExecutableIndex, optional
+        A prebuilt index of ``system + user``.
+    expand : Callable[[str], str], optional
+        Expands entries when the index is built here.
+
+    Returns
+    -------
+    Plan
+        The proposed entries of both scopes and the expected seconds per
+        lookup before and after.
+
+    Entries are ordered greedily by lookups per second of probe cost
+    (Smith's rule), taking an entry only once every entry it must stay
+    behind has been placed. Empty and repeated entries go to the end of
+    their scope.
+
+    Raises
+    ------
+    ValueError
+        If the proposed order would change which file a command runs.
+    """
+    entries = system + user
+    if index is None:
+        index = ExecutableIndex(entries, expand)
+    count = len(index.directories)
+    # a bare name is tried with every extension in each directory it misses
+    tries = len(index.extensions)
+    if latency is None:
+        cost = [elapsed * tries for elapsed in index.elapsed]
+    else:
+        cost = [latency(directory) * tries for directory in index.directories]
+    owner = {}
+    for i, position in enumerate(index.positions):
+        if position is not None and position not in owner:
+            owner[position] = i
+
+    winners = _winners(index, list(range(count)))
+    stems, files = winners
+    weight = [0.0] * count
+    misses = 0.0
+    if frequencies is None:
+        frequencies = dict.fromkeys(stems, 1.0)
+    for name, lookups in frequencies.items():
+        # a name with an executable extension is only looked up as given
+        winner = files.get(name) if ntpath.splitext(name)[1] in index.extensions else stems.get(name)
+        if winner is None:
+            misses += lookups
+        else:
+            weight[winner] += lookups
+
+    def expected(order: list[int]) -> float:
+        total = sum(frequencies.values())
+        if not total:
+            return 0.0
+        elapsed = 0.0
+        spent = 0.0
+        for i in order:
+            position = index.positions[i]
+            if position is None:
+                continue
+            elapsed += cost[position]
+            if owner[position] == i:
+                spent += weight[position] * elapsed
+        return (spent + misses * elapsed) / total
+
+    edges = _constraints(index)
+    pins = []
+    proposed = {}
+    for scope, start, stop in ((True, 0, len(system)), (False, len(system), len(entries))):
+        current = list(range(start, stop))
+        if scope not in scopes:
+            proposed[scope] = current
+            continue
+        jobs = [i for i in current if index.positions[i] is not None and owner[index.positions[i]] == i]
+        rest = [i for i in current if index.positions[i] is None or owner[index.positions[i]] != i]
+        ratio = {i: weight[index.positions[i]] / max(cost[index.positions[i]], 1e-9) for i in jobs}
+        local = {index.positions[i]: i for i in jobs}
+        after: dict[int, list[int]] = {i: [] for i in jobs}
+        waiting = {i: 0 for i in jobs}
+        for (first, second), name in edges.items():
+            if first in local and second in local:
+                after[local[first]].append(local[second])
+                waiting[local[second]] += 1
+                if ratio[local[second]] > ratio[local[first]]:
+                    pins.append(Pin(entries[local[second]], entries[local[first]], name))
+        ready = [(-ratio[i], i) for i in jobs if not waiting[i]]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            _, i = heapq.heappop(ready)
+            order.append(i)
+            for j in after[i]:
+                waiting[j] -= 1
+                if not waiting[j]:
+                    heapq.heappush(ready, (-ratio[j], j))
+        proposed[scope] = order + rest
+
+    before = list(range(len(entries)))
+    after_order = proposed[True] + proposed[False]
+    if expected(after_order) >= expected(before):
+        # the greedy order is not guaranteed to be better than the current one
+        after_order = before
+        proposed = {True: before[: len(system)], False: before[len(system):]}
+    rank = [0] * count
+    for new, i in enumerate(i for i in after_order if index.positions[i] is not None and owner[index.positions[i]] == i):
+        rank[index.positions[i]] = new
+    if _winners(index, rank) != winners:
+        raise ValueError("the proposed order changes which file a command runs")
+
+    return Plan(
+        [entries[i] for i in proposed[True]],
+        [entries[i] for i in proposed[False]],
+        expected(before),
+        expected(after_order),
+        {index.entries[p]: cost[p] for p in range(count)},
+        {index.entries[p]: weight[p] for p in range(count)},
+        pins,
+    )
@@ -1,63 +1,207 @@
-import argparse
-import textwrap 
 import sys
 
 
 
-parser = argparse.ArgumentParser(
-    prog="path", 
-    description="Manage the PATH(s) environment variable(s) for the current user and system",
-    epilog="Use 'path help' to get help on a specific command"
-)
+PROG = "path"
+DESCRIPTION = "Manage the PATH(s) environment variable(s) for the current user and system"
+EPILOG = "Use 'path help' to get help on a specific command"
 
-commands = parser.add_subparsers(dest="commands")
+# options accepted anywhere on the command line, and whether they take a value
+GLOBAL_OPTIONS = {"--trace": True, "--stats": False}
 
-helpParser = commands.add_parser(
-    "help",
-    help="Get help on a command",
-    description="path help <command>",
-)
+GLOBAL_ARGUMENTS = [
+    (("--trace",), {"metavar": "FILE", "help": "Write a Chrome trace-event JSON file of the run"}),
+    (("--stats",), {"action": "store_true", "help": "Print registry, filesystem and output totals when done"}),
+]
 
-helpOptions = ["add", "list", "remove", "get", "clean", "help"]
-for option in helpOptions:
-    helpParser.add_argument(option, action="store", nargs="?",  help=f"Get help on the {option} command")
+FLAG_ACTIONS = {"store_true", "store_false", "count", "help", "version"}
 
-listParser = commands.add_parser("list", description="List all paths", argument_default=None)
-listParser.add_argument("-u", "--user", action="store_true", help="List the user PATH environment variable")
-listParser.add_argument("-s", "--system", action="store_true", help="List the system PATH environment variable")
+# commands a running `path serve` answers; the others always run locally
+FORWARDED = {
+    "list", "get", "has", "which", "audit", "add", "remove", "clean", "dedup",
+    "undo", "restore", "sync", "compact", "optimize", "prune-redundant",
+}
 
+EXPORT_FORMATS = ["ndjson", "json", "csv", "msgpack"]
+EXPORT_ARGUMENTS = [
+    (("--format",), {"choices": EXPORT_FORMATS, "help": "Write one machine-readable record per entry"}),
+    (("--output",), {"metavar": "FILE", "help": "Write the --format records to FILE instead of stdout"}),
+]
+VARIABLE_ARGUMENTS = [
+    (("--var",), {"action": "append", "metavar": "NAME", "help": "Work on another ;-separated variable, e.g. PSModulePath; repeatable"}),
+]
 
-removeParser = commands.add_parser("remove", description="Remove a path")
-removeParser.add_argument("-u", "--user", action="store_true", help="Remove the path from the user PATH environment variable")
-removeParser.add_argument("-s", "--system", action="store_true", help="Remove the path from the system PATH environment variable")
+# command -> (description, [(names, add_argument keyword arguments), ...])
+# parse_args only builds the argparse tree when it has to report an error
+# or print argparse help, so most runs never import argparse at all.
+COMMANDS = {
+    "help": ("path help <command>", [
+        (("topics",), {"nargs": "*", "help": "Commands to get help on"}),
+    ]),
+    "list": ("List all paths", [
+        (("-u", "--user"), {"action": "store_true", "help": "List the user PATH environment variable"}),
+        (("-s", "--system"), {"action": "store_true", "help": "List the system PATH environment variable"}),
+        (("--effective",), {"action": "store_true", "help": "List the merged, expanded PATH a new process gets"}),
+        *EXPORT_ARGUMENTS,
+        *VARIABLE_ARGUMENTS,
+    ]),
+    "remove": ("Remove a path", [
+        (("paths",), {"nargs": "*", "help": "Paths to remove, or - to read them from stdin"}),
+        (("-u", "--user"), {"action": "store_true", "help": "Remove the path from the user PATH environment variable"}),
+        (("-s", "--system"), {"action": "store_true", "help": "Remove the path from the system PATH environment variable"}),
+        (("--from-file",), {"metavar": "FILE", "help": "Also remove the newline- or NUL-separated paths in FILE"}),
+        *VARIABLE_ARGUMENTS,
+    ]),
+    "add": ("Add a path", [
+        (("paths",), {"nargs": "*", "help": "Paths to add, or - to read them from stdin"}),
+        (("-s", "--system"), {"action": "store_true", "help": "Add the path to the system PATH environment variable"}),
+        (("-u", "--user"), {"action": "store_true", "help": "Add the path to the user PATH environment variable"}),
+        (("--from-file",), {"metavar": "FILE", "help": "Also add the newline- or NUL-separated paths in FILE"}),
+        *VARIABLE_ARGUMENTS,
+    ]),
+    "get": ("Get paths", [
+        (("-u", "--user"), {"action": "store_true", "help": "Get the user PATH environment variable"}),
+        (("-s", "--system"), {"action": "store_true", "help": "Get the system PATH environment variable"}),
+        *EXPORT_ARGUMENTS,
+        *VARIABLE_ARGUMENTS,
+    ]),
+    "clean": ("Clean all paths, remove unfindable paths", [
+        (("-u", "--user"), {"action": "store_true", "help": "Clean the user PATH environment variable"}),
+        (("-s", "--system"), {"action": "store_true", "help": "Clean the system PATH environment variable"}),
+        (("--no-cache",), {"action": "store_true", "help": "Probe every path instead of trusting cached results"}),
+        (("--deep",), {"action": "store_true", "help": "Also remove empty directories, files and broken links"}),
+        *VARIABLE_ARGUMENTS,
+    ]),
+    "audit": ("Audit all paths", [
+        (("-u", "--user"), {"action": "store_true", "help": "Audit the user PATH environment variable"}),
+        (("-s", "--system"), {"action": "store_true", "help": "Audit the system PATH environment variable"}),
+        (("--no-cache",), {"action": "store_true", "help": "Probe every path instead of trusting cached results"}),
+        (("--full",), {"action": "store_true", "help": "Probe every path, not just the ones that changed since the last audit"}),
+        (("--deep",), {"action": "store_true", "help": "List every directory: report empty, inaccessible and executable-free ones"}),
+        (("--fail-fast",), {"action": "store_true", "help": "Stop and exit with status 1 at the first broken path"}),
+        (("--max-broken",), {"type": int, "metavar": "N", "help": "Stop and exit with status 1 once more than N paths are broken"}),
+        *EXPORT_ARGUMENTS,
+        *VARIABLE_ARGUMENTS,
+    ]),
+    "dedup": ("Remove duplicate and equivalent paths", [
+        (("-u", "--user"), {"action": "store_true", "help": "Deduplicate the user PATH environment variable"}),
+        (("-s", "--system"), {"action": "store_true", "help": "Deduplicate the system PATH environment variable"}),
+        (("--dry-run",), {"action": "store_true", "help": "Only report the duplicates"}),
+        (("--long-names",), {"action": "store_true", "help": "Resolve 8.3 short names before comparing"}),
+        *VARIABLE_ARGUMENTS,
+    ]),
+    "history": ("Show recorded PATH changes", [
+        (("count",), {"nargs": "?", "type": int, "default": 20, "help": "Number of changes to show"}),
+        (("-u", "--user"), {"action": "store_true", "help": "Show changes to the user PATH environment variable"}),
+        (("-s", "--system"), {"action": "store_true", "help": "Show changes to the system PATH environment variable"}),
+    ]),
+    "undo": ("Undo the last PATH changes", [
+        (("count",), {"nargs": "?", "type": int, "default": 1, "help": "Number of changes to undo"}),
+        (("-u", "--user"), {"action": "store_true", "help": "Only undo changes to the user PATH environment variable"}),
+        (("-s", "--system"), {"action": "store_true", "help": "Only undo changes to the system PATH environment variable"}),
+    ]),
+    "restore": ("Restore PATH as it was at a point in time", [
+        (("timestamp",), {"help": "Time shown by 'path history', e.g. 2024-05-01T09:30:00"}),
+        (("-u", "--user"), {"action": "store_true", "help": "Only restore the user PATH environment variable"}),
+        (("-s", "--system"), {"action": "store_true", "help": "Only restore the system PATH environment variable"}),
+    ]),
+    "which": ("Show the file a command name runs", [
+        (("names",), {"nargs": "*", "help": "Command names, or - to read them from stdin"}),
+        (("-a", "--all"), {"action": "store_true", "help": "Show every match, not just the one that runs"}),
+        (("-u", "--user"), {"action": "store_true", "help": "Only search the user PATH environment variable"}),
+        (("-s", "--system"), {"action": "store_true", "help": "Only search the system PATH environment variable"}),
+    ]),
+    "optimize": ("Reorder paths so commands are found faster", [
+        (("-u", "--user"), {"action": "store_true", "help": "Reorder the user PATH environment variable"}),
+        (("-s", "--system"), {"action": "store_true", "help": "Reorder the system PATH environment variable"}),
+        (("--log",), {"metavar": "FILE", "help": "Command-lookup log, one name (and optional count) per line"}),
+        (("--dry-run",), {"action": "store_true", "help": "Only report the proposed order and savings"}),
+    ]),
+    "profiles": ("Run list, audit, clean or add on the user PATH of every profile", [
+        (("operation",), {"choices": ["list", "audit", "clean", "add"], "help": "What to run on each profile"}),
+        (("paths",), {"nargs": "*", "help": "Paths to add"}),
+        (("--hives",), {"metavar": "DIR", "help": "Also load the offline hives in DIR (<name>\\NTUSER.DAT or <name>.json)"}),
+        (("--workers",), {"type": int, "metavar": "N", "help": "Number of profiles processed at once"}),
+        (("--no-cache",), {"action": "store_true", "help": "Probe every path instead of trusting cached results"}),
+    ]),
+    "compact": ("Shorten PATH without changing what it resolves to", [
+        (("-u", "--user"), {"action": "store_true", "help": "Compact the user PATH environment variable"}),
+        (("-s", "--system"), {"action": "store_true", "help": "Compact the system PATH environment variable"}),
+        (("--short-names",), {"action": "store_true", "help": "Also use 8.3 short names where they are shorter"}),
+        (("--limit",), {"type": int, "metavar": "N", "help": "Length to report headroom against (default 2047)"}),
+        (("--dry-run",), {"action": "store_true", "help": "Only report what would change"}),
+    ]),
+    "sync": ("Bring PATH to the state described by a manifest", [
+        (("manifest",), {"help": "TOML manifest with [system] and [user] tables"}),
+        (("-u", "--user"), {"action": "store_true", "help": "Only sync the user PATH environment variable"}),
+        (("-s", "--system"), {"action": "store_true", "help": "Only sync the system PATH environment variable"}),
+        (("--check",), {"action": "store_true", "help": "Only report drift; exit with status 1 if there is any"}),
+    ]),
+    "regfile": ("Edit PATH in an exported .reg file", [
+        (("operation",), {"choices": ["list", "add", "remove", "clean", "dedup"], "help": "What to run on each PATH in the file"}),
+        (("file",), {"help": "The .reg export to edit"}),
+        (("paths",), {"nargs": "*", "help": "Paths to add or remove"}),
+        (("-u", "--user"), {"action": "store_true", "help": "Only edit user Environment keys"}),
+        (("-s", "--system"), {"action": "store_true", "help": "Only edit the system Environment key"}),
+        (("--output",), {"metavar": "FILE", "help": "Write the result to FILE instead of editing the file in place"}),
+        (("--root",), {"metavar": "DIR", "help": "Where the image is mounted; clean looks for C:\\... paths below it and needs it"}),
+        (("--dry-run",), {"action": "store_true", "help": "Only report what would change"}),
+    ]),
+    "prune-redundant": ("Remove user paths that repeat a system path", [
+        (("--dry-run",), {"action": "store_true", "help": "Only report the redundant entries"}),
+    ]),
+    "has": ("Check whether paths are on PATH", [
+        (("paths",), {"nargs": "*", "help": "Paths to look for"}),
+        (("-u", "--user"), {"action": "store_true", "help": "Only look in the user PATH environment variable"}),
+        (("-s", "--system"), {"action": "store_true", "help": "Only look in the system PATH environment variable"}),
+    ]),
+    "serve": ("Answer commands from a resident process", [
+        (("--max-age",), {"type": float, "metavar": "SECONDS", "help": "Re-read registry values older than this (default 1)"}),
+        (("--stop",), {"action": "store_true", "help": "Stop the running server"}),
+    ]),
+    "browse": ("Browse and edit both PATHs in a window", []),
+}
 
 
-addParser = commands.add_parser("add", description="Add a path")
-addParser.add_argument("-s", "--system", action="store_true", help="Add the path to the system PATH environment variable")
-addParser.add_argument("-u", "--user", action="store_true", help="Add the path to the user PATH environment variable")
 
-getParser = commands.add_parser("get", description="Get paths")
-getParser.add_argument("-u", "--user", action="store_true", help="Get the user PATH environment variable")
-getParser.add_argument("-s", "--system", action="store_true", help="Get the system PATH environment variable")
 
-cleanParser = commands.add_parser("clean", description="Clean all paths, remove unfindable paths")
-cleanParser.add_argument("-u", "--user", action="store_true", help="Clean the user PATH environment variable")
-cleanParser.add_argument("-s", "--system", action="store_true", help="Clean the system PATH environment variable")
+def build_parser(only:list[str]=None):
+    """builds the argparse tree, for all commands or just the ones in ``only``
 
-auditParser = commands.add_parser("audit", description="Audit all paths")
-auditParser.add_argument("-u", "--user", action="store_true", help="Audit the user PATH environment variable")
-auditParser.add_argument("-s", "--system", action="store_true", help="Audit the system PATH environment variable")
+    returns (parser, commands), the parser and its subparsers action.
+    """
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog=PROG, description=DESCRIPTION, epilog=EPILOG)
+    for names, kwargs in GLOBAL_ARGUMENTS:
+        parser.add_argument(*names, **kwargs)
+    commands = parser.add_subparsers(dest="commands")
+    for name, (description, arguments) in COMMANDS.items():
+        if only is not None and name not in only:
+            continue
+        subparser = commands.add_parser(name, description=description)
+        for names, kwargs in arguments:
+            subparser.add_argument(*names, **kwargs)
+    return parser, commands
 
-browseParser = commands.add_parser("browse", description="Browse for paths")
 
+def __getattr__(name:str):
+    # ``parser`` and ``commands`` used to be built at import time; build the
+    # full tree on first use for code that still reads them.
+    if name in ("parser", "commands"):
+        parser, commands = build_parser()
+        globals().update(parser=parser, commands=commands)
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-all_commands = ["list", "remove", "add", "get", "clean"]
 all_flags = ["-u", "-s"]
 usage = "path <command> [<args>]"
 
 
 def format_columns(options, descriptions, col_width=30, desc_width=50):
+    import textwrap
+    
     result = []
     for opt, desc in zip(options, descriptions):
         # Format the options (left column)
@@ -70,12 +214,12 @@ def format_columns(options, descriptions, col_width=30, desc_width=50):
 
 
 def help_option(args:list=[], flags:list=[]):
-    print(parser.prog)
-    print("\nDescription:\n    " + parser.description)
+    print(PROG)
+    print("\nDescription:\n    " + DESCRIPTION)
     print("Usage:\n   ", usage)
     print("\nCommands:")
-    desc = [cmd.description for cmd in commands.choices.values()]
-    options = ["    " + cmd for cmd in commands.choices.keys()]
+    desc = [description for description, _ in COMMANDS.values()]
+    options = ["    " + cmd for cmd in COMMANDS.keys()]
     print(format_columns(options, desc))
     print("")
     if "add" in args:
@@ -83,66 +227,325 @@ def help_option(args:list=[], flags:list=[]):
         print("    path add .my_directory           add a directory in the current working directory to both paths")
         print("\n    path add -s c:\\path\\to\\a\\thing\n    Add the path to the system PATH environment variable")
         print("    path add -u c:\\path\\to\\a\\thing\n    Add the path to the user PATH environment variable")
+        print("    path add --from-file paths.txt\n    Add every path in the file, one per line (or NUL-separated), writing each PATH once")
+        print("    dir /s /b /ad bin | path add -u -\n    Add the paths read from stdin")
     if "list" in args:
         print("Help on list:\n    path list -s\n    List the system PATH environment variable")
         print("    path list -u\n    List the user PATH environment variable")
+        print("    path list --format csv\n    Write scope, index, raw, expanded, status and variable columns")
+        print("    path list --var PSModulePath --var PYTHONPATH\n    List other ;-separated variables instead of PATH")
+        print("    path list --effective\n    List the expanded PATH a new process gets, system entries first, marking\n    user entries that repeat a system entry")
     if "remove" in args:
         print("Help on remove:\n    path remove -s c:\\path\\to\\a\\thing\n    Remove the path from the system PATH environment variable")
         print("    path remove -u c:\\path\\to\\a\\thing\n    Remove the path from the user PATH environment variable")
+        print("    path remove --from-file paths.txt\n    Remove every path in the file, writing each PATH once")
     if "get" in args:
-        get_Extra = """
-        just like list, will print out the paths in the system PATH environment variable 
-        but allows you to get the user PATH environment as json / xml / bytes / .pickle
-        """
         print("Help on get:\n    path get -s\n    Get the system PATH environment variable")
         print("    path get -u\n    Get the user PATH environment variable")
+        print("    path get --format ndjson\n    Write one JSON record per entry (also json, csv and msgpack)")
+        print("    path get --format msgpack --output path.bin\n    Write the records to a file")
     if "clean" in args:
         print("Help on clean:")
         print("""\
     the clean command goes through all the PATH environment variables
     and removes any paths that are not found on your system.
-    this does not include %<NAME>% variables.
+    %<NAME>% variables are expanded first, as a new process would see them.
               """)
         print("    path clean -s\n    Clean the system PATH environment variable")
         print("    path clean -u\n    Clean the user PATH environment variable")
+        print("    path clean --no-cache\n    Probe every path instead of trusting cached results")
+        print("    path clean --deep\n    Also remove empty directories, files and broken links (see 'path audit --deep')")
+        print("    path clean --var PSModulePath\n    Clean another ;-separated variable instead of PATH")
     
     if "audit" in args:
         print("Help on audit:")
         print("    path audit -s\n    Audit the system PATH environment variable")
         print("    path audit -u\n    Audit the user PATH environment variable")
+        print("    path audit --no-cache\n    Probe every path instead of trusting cached results")
+        print("    path audit --full\n    Probe every path, even if PATH has not changed since the last audit")
+        print("    path audit --fail-fast\n    Stop at the first broken path and exit with status 1")
+        print("    path audit --max-broken 3\n    Stop and exit with status 1 once more than 3 paths are broken")
+        print("    path audit --format ndjson\n    Stream one JSON record per entry as it is checked; the summary goes to stderr")
+        print("    path audit --deep\n    List every directory and report missing, empty, inaccessible, broken-link and\n    executable-free ones, with executable counts and listing times")
+        print("    path audit --var Path --var PSModulePath --var PYTHONPATH\n    Audit several variables at once, reading each Environment key once")
     
+    if "dedup" in args:
+        print("Help on dedup:")
+        print("""\
+    entries are compared ignoring case, slash direction, trailing slashes,
+    . and .. segments and %<NAME>% variables. the first entry is kept and
+    later equivalents are removed; a user entry that repeats a system entry
+    is removed from the user PATH.
+              """)
+        print("    path dedup\n    Deduplicate both PATH environment variables, within and across them")
+        print("    path dedup -u --dry-run\n    Show the duplicates in the user PATH environment variable")
+        print("    path dedup --var PATHEXT\n    Deduplicate another ;-separated variable instead of PATH")
+
+    if "history" in args:
+        print("Help on history:")
+        print("    path history\n    Show the last 20 recorded PATH changes")
+        print("    path history 100 -u\n    Show the last 100 changes to the user PATH environment variable")
+
+    if "undo" in args:
+        print("Help on undo:")
+        print("    path undo\n    Undo the last PATH change")
+        print("    path undo 3\n    Undo the last 3 PATH changes, writing each PATH once")
+
+    if "restore" in args:
+        print("Help on restore:")
+        print("    path restore 2024-05-01T09:30:00\n    Restore both PATHs as they were at that time (see path history)")
+        print("    path restore -s 2024-05-01T09:30:00\n    Restore only the system PATH environment variable")
+
+    if "which" in args:
+        print("Help on which:")
+        print("""\
+    names are resolved like windows does: each PATH entry in turn, system
+    entries first, trying every PATHEXT extension. each directory is listed
+    once, so resolving many names at a time is cheap.
+              """)
+        print("    path which python git\n    Show the file each name runs")
+        print("    path which -a python\n    Show every python on PATH, the one that runs first")
+        print("    type names.txt | path which -\n    Resolve one name per line read from stdin")
+
+    if "optimize" in args:
+        print("Help on optimize:")
+        print("""\
+    every command lookup probes PATH entries in order until one holds the
+    command. optimize measures how slow each entry is to probe and moves
+    the entries that are hit often and cheap to probe forward. it never
+    changes which file a command runs, and writes each PATH once.
+              """)
+        print("    path optimize --dry-run\n    Show the proposed order and estimated savings")
+        print("    path optimize -u --log commands.txt\n    Reorder the user PATH, weighting commands by the lookups in the log")
+
+    if "profiles" in args:
+        print("Help on profiles:")
+        print("""\
+    runs an operation on the user PATH of every signed-in profile, and with
+    --hives on the offline hives of everyone else, several profiles at a
+    time. loading offline NTUSER.DAT hives needs an administrator prompt.
+              """)
+        print("    path profiles audit\n    Audit the user PATH of every signed-in profile")
+        print("    path profiles clean --hives C:\\Users\n    Clean every profile, including users who are not signed in")
+        print("    path profiles add C:\\Tools\\bin --workers 4\n    Add a path to every profile, four at a time")
+
+    if "compact" in args:
+        print("Help on compact:")
+        print("""\
+    rewrites entries to their shortest equivalent spelling, using
+    %ProgramFiles%, %SystemRoot% and similar references, and drops empty,
+    repeated and shadowed entries. every rewrite is expanded again and
+    checked to name the same directory. add runs it automatically when a
+    PATH grows past 2047 characters. exits with status 1 if a PATH is still
+    over the limit.
+              """)
+        print("    path compact --dry-run\n    Show how short each PATH can get")
+        print("    path compact -s --short-names\n    Compact the system PATH, also using 8.3 short names")
+
+    if "sync" in args:
+        print("Help on sync:")
+        print("""\
+    a manifest lists the entries each scope should have:
+        [system]
+        pinned = ["%SystemRoot%\\\\system32"]   # always first, in this order
+        entries = ["C:\\\\Tools\\\\bin"]          # in this relative order
+        allow_extra = true                    # keep entries not listed here
+        remove = ["*\\\\Temp\\\\*"]               # except the ones matching these
+    entries are compared by canonical key, entries already in order stay
+    put, and each PATH is written once, only if it differs.
+              """)
+        print("    path sync manifest.toml\n    Bring both PATHs in line with the manifest")
+        print("    path sync --check manifest.toml\n    Report drift without writing; exit with status 1 if there is any")
+
+    if "regfile" in args:
+        print("Help on regfile:")
+        print("""\
+    edits the Path value of the Environment keys in a regedit export
+    (UTF-16 or REGEDIT4, string or hex(2) values) without a registry, so it
+    runs on any OS. the file is read once, and only the Path value lines
+    are rewritten; everything else is copied byte for byte.
+              """)
+        print("    path regfile list image.reg\n    Show the PATH of every Environment key in the file")
+        print("    path regfile add -s image.reg C:\\Tools\\bin\n    Add a path to the system PATH in the file")
+        print("    path regfile clean image.reg --root /mnt/image\n    Remove entries that do not exist in the image mounted at /mnt/image")
+
+    if "prune-redundant" in args:
+        print("Help on prune-redundant:")
+        print("""\
+    windows searches the system PATH before the user PATH, so a user entry
+    that points at the same directory as a system entry is never where a
+    command is found; it only adds a failed lookup. these are removed from
+    the user PATH in one write.
+              """)
+        print("    path prune-redundant\n    Remove them")
+        print("    path prune-redundant --dry-run\n    Only list them")
+
+    if "has" in args:
+        print("Help on has:")
+        print("    path has C:\\Tools\\bin\n    Show which PATHs hold the path or an equivalent entry; exit with status 1 if neither does")
+        print("    path has -u C:\\Tools\\bin\n    Only look in the user PATH environment variable")
+
+    if "serve" in args:
+        print("Help on serve:")
+        print("""\
+    keeps PATH, the environment and directory listings in memory and answers
+    the commands other path invocations forward to it, one at a time, so
+    each costs about one round-trip. set PATHCLEANER_NO_SERVER to run a
+    command locally anyway. registry changes made by other programs are
+    picked up within --max-age seconds.
+              """)
+        print("    path serve\n    Run the server in the foreground")
+        print("    path serve --stop\n    Stop the running server")
+
     if "browse" in args:
         print("Help on browse:")
-        print("    path browse\n    Browse for paths")
+        print("""\
+    shows both PATHs with the status, executable count and listing time of
+    each entry, checked in the background. add, remove and move entries,
+    then apply to write each changed PATH once.
+              """)
+        print("    path browse\n    Open the PATH browser")
     
 
 
         
-def parse_args() -> tuple[str, list, list]:
-    command = parser.parse_args().commands
-    sys.argv.append(None)
-    args = sys.argv[sys.argv.index(command):]
-    sys.argv.pop(-1)
-    args.pop(0)
-    flags = []
-    for arg in args:
-        if arg.startswith("-"):
-            flags.append(arg)
-    args = [arg for arg in args if arg not in flags]
+def _option(command:str, name:str):
+    """returns the add_argument keyword arguments for an option of a command, or None"""
+    if name in GLOBAL_OPTIONS:
+        return {} if GLOBAL_OPTIONS[name] else {"action": "store_true"}
+    for names, kwargs in COMMANDS.get(command, ("", []))[1]:
+        if name in names:
+            return kwargs
+    return None
+
+
+def _takes_value(command:str, option:str) -> bool:
+    kwargs = _option(command, option)
+    return kwargs is not None and kwargs.get("action") not in FLAG_ACTIONS
+
+
+def _unabbreviate(command:str, flag:str) -> str:
+    """expands an abbreviated long option that argparse accepted (--sys -> --system)"""
+    name, eq, value = flag.partition("=")
+    if not name.startswith("--") or _option(command, name) is not None:
+        return flag
+    options = [n for names, _ in COMMANDS.get(command, ("", []))[1] for n in names]
+    matches = [n for n in list(GLOBAL_OPTIONS) + options if n.startswith(name)]
+    return matches[0] + eq + value if len(matches) == 1 else flag
+
+
+def _valid(command:str, args:list[str], flags:list[str]) -> bool:
+    """checks parsed tokens against the command table without argparse
+
+    anything this does not accept is handed to argparse, which either
+    understands it (abbreviations, for example) or reports the error.
+    """
+    if command not in COMMANDS:
+        return False
+    for flag in flags:
+        name, _, value = flag.partition("=")
+        kwargs = _option(command, name)
+        if kwargs is None or kwargs.get("action") in ("help", "version"):
+            return False
+        if _takes_value(command, name) != ("=" in flag):
+            return False
+        if "type" in kwargs:
+            try:
+                kwargs["type"](value)
+            except (TypeError, ValueError):
+                return False
+        if "choices" in kwargs and value not in kwargs["choices"]:
+            return False
     
-    return command, args, flags
+    positionals = [kwargs for names, kwargs in COMMANDS[command][1] if not names[0].startswith("-")]
+    remaining = list(args)
+    for kwargs in positionals:
+        nargs = kwargs.get("nargs")
+        if nargs in ("*", "+"):
+            taken, remaining = remaining, []
+        elif nargs == "?":
+            taken, remaining = remaining[:1], remaining[1:]
+        else:
+            taken, remaining = remaining[:1], remaining[1:]
+            if not taken:
+                return False
+        if nargs == "+" and not taken:
+            return False
+        if "type" in kwargs:
+            try:
+                [kwargs["type"](value) for value in taken]
+            except (TypeError, ValueError):
+                return False
+        if "choices" in kwargs and any(value not in kwargs["choices"] for value in taken):
+            return False
+    return not remaining
+
+
+def flag_value(flags:list[str], name:str, default=None):
+    """returns the value of a ``--name=value`` flag from parse_args, or default"""
+    prefix = name + "="
+    for flag in reversed(flags):
+        if flag.startswith(prefix):
+            return flag[len(prefix):]
+    return default
 
-def test(*args):
-    import sys
-    sys.argv.extend(args)
-    print("args: ", sys.argv)
-    namespace = parse_args()
-    print(namespace)
-    sys.argv.pop(-1)
 
-def testall():
-    print_help()
-    input("...")
-    for cmd in all_commands:
-        test(cmd)
+def flag_values(flags:list[str], name:str) -> list[str]:
+    """returns the values of a repeatable ``--name=value`` flag, in order"""
+    prefix = name + "="
+    return [flag[len(prefix):] for flag in flags if flag.startswith(prefix)]
 
+
+def parse_args(argv:list[str]=None) -> tuple[str, list, list]:
+    """parses the command line into (command, args, flags)
+
+    options that take a value come back in flags as ``--name=value``.
+    global options (--trace, --stats) may appear anywhere on the line.
+    """
+    argv = list(sys.argv[1:] if argv is None else argv)
+    
+    # pull the global options out so they can appear anywhere
+    front = []
+    rest = []
+    i = 0
+    while i < len(argv):
+        name = argv[i].split("=")[0]
+        if name in GLOBAL_OPTIONS:
+            front.append(argv[i])
+            if GLOBAL_OPTIONS[name] and "=" not in argv[i] and i + 1 < len(argv):
+                i += 1
+                front.append(argv[i])
+        else:
+            rest.append(argv[i])
+        i += 1
+    
+    # the command is the first token that is not an option
+    command = next((arg for arg in rest if not arg.startswith("-")), None)
+    tokens = front + (rest[rest.index(command) + 1:] if command is not None else rest)
+    
+    args = []
+    flags = []
+    i = 0
+    while i < len(tokens):
+        arg = tokens[i]
+        if arg.startswith("-") and arg != "-":
+            # resolve --form to --format first, so its value is taken with it
+            name, eq, value = arg.partition("=")
+            arg = _unabbreviate(command, name) + eq + value
+            if "=" not in arg and _takes_value(command, arg) and i + 1 < len(tokens):
+                i += 1
+                arg = f"{arg}={tokens[i]}"
+            flags.append(arg)
+        else:
+            args.append(arg)
+        i += 1
+    
+    if command is None and not rest:
+        return None, args, flags
+    if not _valid(command, args, flags):
+        # let argparse report the problem (or print its help and exit)
+        parser, _ = build_parser(only=[command] if command in COMMANDS else None)
+        command = parser.parse_args(front + rest).commands
+        flags = [_unabbreviate(command, flag) for flag in flags]
+    
+    return command, args, flags
@@ -0,0 +1,282 @@
+"""The in-memory model of a PATH value.
+
+A :class:`PathList` is parsed from the registry string once, edited in
+place, and serialized back once with :meth:`PathList.value`. Each entry is a
+:class:`PathEntry` that carries its raw text together with its canonical key
+(see ``canon.canonical_key``) and expanded form, each computed the first
+time it is needed and then kept, so listing PATH never pays for them. Once
+the list is first searched it keeps a count of every key and the position
+of its first occurrence, so membership tests are O(1) and position lookups
+are O(1) between edits; edits in the middle of the list only mark the
+positions stale, and they are rebuilt on the next lookup.
+
+Anywhere a path is accepted, either a raw string or a :class:`PathEntry`
+may be passed.
+"""
+import sys
+from collections.abc import MutableSequence
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+
+class PathEntry:
+    """One PATH entry.
+
+    Attributes
+    ----------
+    raw : str
+        The entry as stored in the registry.
+    system : bool
+        Whether the entry belongs to the system (True) or user (False) PATH.
+    status : str or None
+        The last probe result (see ``checker``), None until it is checked.
+    key : str
+        The canonical key, interned; "" for an empty entry.
+    expanded : str
+        The entry, unquoted, with its variable references expanded.
+    """
+
+    __slots__ = ("raw", "system", "status", "_expand", "_key", "_expanded")
+
+    def __init__(self, raw: str, system: bool, expand: Callable[[str], str] = None, status: str = None) -> None:
+        self.raw = raw
+        self.system = system
+        self.status = status
+        self._expand = expand
+        self._key = None
+        self._expanded = None
+
+    @property
+    def key(self) -> str:
+        if self._key is None:
+            from canon import canonical_key
+
+            self._key = sys.intern(canonical_key(self.raw, self._expander()))
+        return self._key
+
+    @property
+    def expanded(self) -> str:
+        if self._expanded is None:
+            stripped = self.raw.strip().strip('"')
+            self._expanded = self._expander()(stripped) if stripped else ""
+        return self._expanded
+
+    def _expander(self) -> Callable[[str], str]:
+        if self._expand is None:
+            from expand import environment
+
+            self._expand = environment()
+        return self._expand
+
+    def __str__(self) -> str:
+        return self.raw
+
+    def __repr__(self) -> str:
+        return f"PathEntry({self.raw!r}, system={self.system})"
+
+
+class PathList(MutableSequence):
+    """An ordered, indexed list of :class:`PathEntry`.
+
+    Parameters
+    ----------
+    paths : Iterable[str | PathEntry], optional
+        The entries, in PATH order.
+    system : bool, optional
+        The scope of entries created from strings.
+    expand : Callable[[str], str], optional
+        Expands variable references. Defaults to the process environment's
+        ``expand.Expander``.
+    """
+
+    __slots__ = ("system", "expand", "_entries", "_counts", "_first")
+
+    def __init__(self, paths: Iterable = (), system=True, expand: Callable[[str], str] = None) -> None:
+        from expand import environment
+
+        self.system = system
+        # resolved once for every entry; environment() hashes os.environ
+        self.expand = expand if expand is not None else environment()
+        self._entries: list[PathEntry] = [self.entry(path) for path in paths]
+        # built on the first search
+        self._counts: dict[str, int] | None = None
+        self._first: dict[str, int] | None = None
+
+    @classmethod
+    def parse(cls, value: str, system=True, expand: Callable[[str], str] = None) -> "PathList":
+        """Returns the entries of a ``;``-separated registry value."""
+        return cls(value.split(";") if value else (), system, expand)
+
+    def entry(self, path) -> PathEntry:
+        """Returns ``path`` as a :class:`PathEntry` of this list's scope."""
+        if isinstance(path, PathEntry):
+            return path
+        return PathEntry(path, self.system, self.expand)
+
+    def key(self, path) -> str:
+        """Returns the canonical key of a path or entry."""
+        return self.entry(path).key
+
+    def _keys(self) -> dict[str, int]:
+        if self._counts is None:
+            counts = {}
+            for entry in self._entries:
+                counts[entry.key] = counts.get(entry.key, 0) + 1
+            self._counts = counts
+        return self._counts
+
+    def _positions(self) -> dict[str, int]:
+        if self._first is None:
+            first = {}
+            for position, entry in enumerate(self._entries):
+                first.setdefault(entry.key, position)
+            self._first = first
+        return self._first
+
+    def _count(self, entry: PathEntry, delta: int) -> None:
+        if self._counts is None:
+            return
+        count = self._counts.get(entry.key, 0) + delta
+        if count:
+            self._counts[entry.key] = count
+        else:
+            del self._counts[entry.key]
+
+    # MutableSequence
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[PathEntry]:
+        return iter(self._entries)
+
+    def __getitem__(self, index):
+        return self._entries[index]
+
+    def __setitem__(self, index, path) -> None:
+        if isinstance(index, slice):
+            old = self._entries[index]
+            new = [self.entry(p) for p in path]
+        else:
+            old = [self._entries[index]]
+            new = [self.entry(path)]
+        self._entries[index] = new if isinstance(index, slice) else new[0]
+        for entry in old:
+            self._count(entry, -1)
+        for entry in new:
+            self._count(entry, 1)
+        self._first = None
+
+    def __delitem__(self, index) -> None:
+        old = self._entries[index]
+        del self._entries[index]
+        for entry in old if isinstance(index, slice) else [old]:
+            self._count(entry, -1)
+        self._first = None
+
+    def insert(self, index: int, path) -> None:
+        entry = self.entry(path)
+        appending = index >= len(self._entries)
+        self._entries.insert(index, entry)
+        self._count(entry, 1)
+        if appending and self._first is not None:
+            self._first.setdefault(entry.key, len(self._entries) - 1)
+        else:
+            self._first = None
+
+    def append(self, path) -> None:
+        self.insert(len(self._entries), path)
+
+    def __contains__(self, path) -> bool:
+        return self.key(path) in self._keys()
+
+    def index(self, path, start: int = 0, stop: int = None) -> int:
+        """Returns the position of the first entry equivalent to ``path``."""
+        key = self.key(path)
+        position = self._positions().get(key)
+        if position is None:
+            raise ValueError(f"{str(path)!r} is not in the list")
+        if position >= start and (stop is None or position < stop):
+            return position
+        for position in range(start, len(self._entries) if stop is None else stop):
+            if self._entries[position].key == key:
+                return position
+        raise ValueError(f"{str(path)!r} is not in the list")
+
+    def count(self, path) -> int:
+        return self._keys().get(self.key(path), 0)
+
+    # PATH operations
+
+    def discard(self, path) -> int:
+        """Removes every entry equivalent to ``path``. Returns how many were removed."""
+        return self.discard_all([path])
+
+    def discard_all(self, paths: Iterable) -> int:
+        """Removes every entry equivalent to any of ``paths`` in one pass.
+
+        Returns how many entries were removed.
+        """
+        keys = {self.key(path) for path in paths} & self._keys().keys()
+        if not keys:
+            return 0
+        before = len(self._entries)
+        self._entries = [entry for entry in self._entries if entry.key not in keys]
+        for key in keys:
+            del self._counts[key]
+        self._first = None
+        return before - len(self._entries)
+
+    def move(self, path, index: int) -> None:
+        """Moves the first entry equivalent to ``path`` to ``index``."""
+        entry = self._entries.pop(self.index(path))
+        self._entries.insert(index, entry)
+        self._first = None
+
+    def replace(self, paths: Iterable) -> None:
+        """Replaces every entry."""
+        self[:] = list(paths)
+
+    def raw(self) -> list[str]:
+        """Returns the raw text of every entry."""
+        return [entry.raw for entry in self._entries]
+
+    def value(self) -> str:
+        """Returns the registry string, ``;``-separated."""
+        return ";".join(entry.raw for entry in self._entries)
+
+    def __add__(self, other: Iterable) -> "PathList":
+        return PathList([*self._entries, *other], self.system, self.expand)
+
+    def __repr__(self) -> str:
+        return f"PathList({self.raw()!r}, system={self.system})"
+
+
+class EffectiveEntry(NamedTuple):
+    """One entry of the PATH a new process gets.
+
+    ``index`` is the entry's position within its scope. ``shadowed_by`` is
+    the system entry with the same canonical key that every lookup reaches
+    first, for a user entry that is therefore never the one a command is
+    found in; None otherwise.
+    """
+
+    entry: PathEntry
+    index: int
+    shadowed_by: PathEntry | None
+
+
+def effective(system: PathList, user: PathList) -> list[EffectiveEntry]:
+    """Merges the scopes the way Windows does: the system entries, then the user entries.
+
+    Each entry's canonical key is computed once, with the expander of its
+    list, so both lists should be built with the same one.
+    """
+    first: dict[str, PathEntry] = {}
+    merged = []
+    for index, entry in enumerate(system):
+        if entry.key:
+            first.setdefault(entry.key, entry)
+        merged.append(EffectiveEntry(entry, index, None))
+    for index, entry in enumerate(user):
+        merged.append(EffectiveEntry(entry, index, first.get(entry.key) if entry.key else None))
+    return merged
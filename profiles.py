@@ -0,0 +1,322 @@
+"""Managing the user PATH of every profile on a machine.
+
+Each user's environment lives in their own registry hive. The hives of
+signed-in users are loaded under ``HKEY_USERS\\<SID>``; everyone else's sit
+in ``NTUSER.DAT`` files that have to be loaded first. :func:`discover` lists
+both kinds and :func:`run` runs one operation against the user PATH of each
+profile in a process pool, so one slow or broken profile does not hold up
+the others.
+
+Offline hives are opened by a loader picked from the file name:
+:class:`WinregHiveLoader` for ``NTUSER.DAT`` files and :class:`FileHiveLoader`
+for ``*.json`` files holding the values of a fake hive's Environment key,
+which lets the whole mode run on machines without a registry.
+
+Entries are expanded against the profile's own environment (see
+:func:`profile_environ`). An entry that references a variable the profile
+does not define is reported as ``UNKNOWN`` and is never removed.
+"""
+import json
+import os
+from contextlib import contextmanager
+from typing import Iterable, Iterator, NamedTuple
+
+
+PROFILE_LIST = "SOFTWARE\\Microsoft\\Windows NT\\CurrentVersion\\ProfileList"
+HIVE_FILE = "NTUSER.DAT"
+FAKE_HIVE_SUFFIX = ".json"
+# the entry of a fake hive that holds its profile directory, as in ProfileList
+FAKE_HIVE_HOME = "ProfileImagePath"
+# Local and domain accounts; the well-known service SIDs have no PATH to manage.
+USER_SID_PREFIX = "S-1-5-21-"
+# variables that describe the user, dropped when a profile's home is not known
+PROFILE_VARIABLES = ("USERPROFILE", "HOMEDRIVE", "HOMEPATH", "USERNAME", "APPDATA", "LOCALAPPDATA")
+
+OPERATIONS = ["list", "audit", "clean", "add"]
+
+
+class Profile(NamedTuple):
+    """A user profile: a loaded SID, or an offline hive file."""
+
+    name: str
+    hive: str | None = None
+    home: str | None = None
+
+
+class ProfileResult(NamedTuple):
+    """The outcome of one operation on one profile."""
+
+    profile: Profile
+    paths: list[str]
+    broken: list[str]
+    timed_out: list[str]
+    unknown: list[str]
+    added: list[str]
+    removed: list[str]
+    error: str | None = None
+
+
+def loaded_profiles(reg=None) -> list[Profile]:
+    """Returns the user profiles whose hives are loaded under ``HKEY_USERS``."""
+    if reg is None:
+        from registry import winreg as reg
+    profiles = []
+    index = 0
+    while True:
+        try:
+            sid = reg.EnumKey(reg.HKEY_USERS, index)
+        except OSError:
+            break
+        index += 1
+        if not sid.startswith(USER_SID_PREFIX) or sid.endswith("_Classes"):
+            continue
+        home = None
+        try:
+            with reg.OpenKey(reg.HKEY_LOCAL_MACHINE, f"{PROFILE_LIST}\\{sid}") as key:
+                home = reg.QueryValueEx(key, "ProfileImagePath")[0]
+        except OSError:
+            pass
+        profiles.append(Profile(sid, None, home))
+    return profiles
+
+
+def offline_profiles(directory: str) -> list[Profile]:
+    """Returns the hives found in ``directory``.
+
+    Each ``<name>\\NTUSER.DAT`` (as in ``C:\\Users``) and each ``<name>.json``
+    fake hive is one profile. A fake hive declares its profile directory
+    with a :data:`FAKE_HIVE_HOME` string.
+    """
+    profiles = []
+    for entry in sorted(os.scandir(directory), key=lambda entry: entry.name.lower()):
+        if entry.is_file() and entry.name.lower().endswith(FAKE_HIVE_SUFFIX):
+            with open(entry.path, "r", encoding="utf-8") as f:
+                home = json.load(f).get(FAKE_HIVE_HOME)
+            profiles.append(Profile(entry.name[: -len(FAKE_HIVE_SUFFIX)], entry.path, home))
+        elif entry.is_dir() and os.path.isfile(os.path.join(entry.path, HIVE_FILE)):
+            profiles.append(Profile(entry.name, os.path.join(entry.path, HIVE_FILE), entry.path))
+    return profiles
+
+
+def discover(directory: str = None, reg=None) -> list[Profile]:
+    """Returns the loaded profiles followed by the offline hives in ``directory``.
+
+    A hive in ``directory`` that belongs to a loaded profile is skipped,
+    since Windows keeps it locked while it is loaded.
+    """
+    profiles = loaded_profiles(reg)
+    if directory is None:
+        return profiles
+    homes = {os.path.normcase(p.home) for p in profiles if p.home}
+    for profile in offline_profiles(directory):
+        if profile.home is None or os.path.normcase(profile.home) not in homes:
+            profiles.append(profile)
+    return profiles
+
+
+class FileHiveLoader:
+    """Loads a fake hive from JSON into a ``fakereg.FakeWinreg``.
+
+    The file maps each value name of the Environment key to ``[data, type]``,
+    plus an optional :data:`FAKE_HIVE_HOME` string that is not a value.
+    Changes are written back, atomically, when the hive is unloaded.
+    """
+
+    @contextmanager
+    def load(self, profile: Profile):
+        import fakereg
+        from registry import read_environment
+
+        with open(profile.hive, "r", encoding="utf-8") as f:
+            values = json.load(f)
+        home = values.pop(FAKE_HIVE_HOME, None)
+        reg = fakereg.FakeWinreg()
+        key = (fakereg.HKEY_USERS, f"{profile.name}\\Environment")
+        reg.CreateKey(*key).Close()
+        for name, (data, type) in values.items():
+            reg.set_value(*key, name, data, type)
+        yield reg, key
+        current = {name: [data, type] for name, (data, type) in read_environment(False, reg, key).items()}
+        if current != values:
+            if home is not None:
+                current = {FAKE_HIVE_HOME: home, **current}
+            temp = f"{profile.hive}.{os.getpid()}.tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2)
+            os.replace(temp, profile.hive)
+
+
+def _enable_privileges(*names: str) -> None:
+    """Enables privileges held by the process token, e.g. SeRestorePrivilege."""
+    import ctypes
+    from ctypes import wintypes
+
+    advapi32 = ctypes.WinDLL("advapi32", use_last_error=True)
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+
+    class LUID(ctypes.Structure):
+        _fields_ = [("LowPart", wintypes.DWORD), ("HighPart", wintypes.LONG)]
+
+    class LUID_AND_ATTRIBUTES(ctypes.Structure):
+        _fields_ = [("Luid", LUID), ("Attributes", wintypes.DWORD)]
+
+    class TOKEN_PRIVILEGES(ctypes.Structure):
+        _fields_ = [("PrivilegeCount", wintypes.DWORD), ("Privileges", LUID_AND_ATTRIBUTES * 1)]
+
+    TOKEN_ADJUST_PRIVILEGES = 0x0020
+    TOKEN_QUERY = 0x0008
+    SE_PRIVILEGE_ENABLED = 0x0002
+    ERROR_NOT_ALL_ASSIGNED = 1300
+
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    advapi32.OpenProcessToken.argtypes = (wintypes.HANDLE, wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE))
+    advapi32.AdjustTokenPrivileges.argtypes = (
+        wintypes.HANDLE, wintypes.BOOL, ctypes.POINTER(TOKEN_PRIVILEGES), wintypes.DWORD, ctypes.c_void_p, ctypes.c_void_p,
+    )
+    token = wintypes.HANDLE()
+    if not advapi32.OpenProcessToken(kernel32.GetCurrentProcess(), TOKEN_ADJUST_PRIVILEGES | TOKEN_QUERY, ctypes.byref(token)):
+        raise ctypes.WinError(ctypes.get_last_error())
+    try:
+        for name in names:
+            luid = LUID()
+            if not advapi32.LookupPrivilegeValueW(None, name, ctypes.byref(luid)):
+                raise ctypes.WinError(ctypes.get_last_error())
+            privileges = TOKEN_PRIVILEGES(1, (LUID_AND_ATTRIBUTES * 1)(LUID_AND_ATTRIBUTES(luid, SE_PRIVILEGE_ENABLED)))
+            advapi32.AdjustTokenPrivileges(token, False, ctypes.byref(privileges), 0, None, None)
+            if ctypes.get_last_error() == ERROR_NOT_ALL_ASSIGNED:
+                raise PermissionError(f"{name} is not held; run pathcleaner as an administrator")
+    finally:
+        kernel32.CloseHandle(token)
+
+
+class WinregHiveLoader:
+    """Loads an ``NTUSER.DAT`` under ``HKEY_USERS`` with ``RegLoadKey``.
+
+    Loading a hive needs the backup and restore privileges, so pathcleaner
+    has to run as an administrator. The hive is unloaded afterwards, which
+    also writes any changes back to the file.
+    """
+
+    @contextmanager
+    def load(self, profile: Profile):
+        import ctypes
+        import winreg
+
+        _enable_privileges("SeRestorePrivilege", "SeBackupPrivilege")
+        name = f"pathcleaner-{os.getpid()}-{profile.name}"
+        winreg.LoadKey(winreg.HKEY_USERS, name, profile.hive)
+        try:
+            yield winreg, (winreg.HKEY_USERS, f"{name}\\Environment")
+        finally:
+            advapi32 = ctypes.WinDLL("advapi32")
+            advapi32.RegUnLoadKeyW.argtypes = (ctypes.c_void_p, ctypes.c_wchar_p)
+            # predefined keys are sign-extended handles
+            advapi32.RegUnLoadKeyW(ctypes.c_long(winreg.HKEY_USERS).value, name)
+
+
+def loader_for(profile: Profile):
+    """Returns the loader of an offline profile's hive."""
+    if profile.hive.lower().endswith(FAKE_HIVE_SUFFIX):
+        return FileHiveLoader()
+    return WinregHiveLoader()
+
+
+@contextmanager
+def open_profile(profile: Profile):
+    """Yields ``(reg, key)``: the registry and Environment key of a profile's hive."""
+    if profile.hive is None:
+        from registry import winreg
+
+        yield winreg, (winreg.HKEY_USERS, f"{profile.name}\\Environment")
+        return
+    with loader_for(profile).load(profile) as opened:
+        yield opened
+
+
+def profile_environ(profile: Profile) -> dict[str, str]:
+    """Returns the process environment as the profile's user would see it.
+
+    Without a known home the caller's own profile variables are dropped,
+    so entries that use them are left unresolved rather than expanded
+    against the wrong user.
+    """
+    import ntpath
+
+    environ = {name: value for name, value in os.environ.items() if name.upper() not in PROFILE_VARIABLES}
+    if profile.home:
+        drive, path = ntpath.splitdrive(profile.home)
+        environ.update(
+            USERPROFILE=profile.home,
+            HOMEDRIVE=drive,
+            HOMEPATH=path,
+            USERNAME=ntpath.basename(profile.home),
+            APPDATA=ntpath.join(profile.home, "AppData", "Roaming"),
+            LOCALAPPDATA=ntpath.join(profile.home, "AppData", "Local"),
+        )
+    return environ
+
+
+def run_profile(profile: Profile, operation: str, paths: list[str] = (), use_cache=True) -> ProfileResult:
+    """Runs ``operation`` (see :data:`OPERATIONS`) on one profile's user PATH.
+
+    Errors are returned in the result rather than raised, so one bad
+    profile does not stop the others.
+    """
+    from datadir import data_dir
+    from checker import BROKEN, TIMEOUT
+    from journal import Journal
+    from registry import PathManager, check_paths
+
+    broken, timed_out, unknown, added, removed = [], [], [], [], []
+    try:
+        with open_profile(profile) as (reg, key):
+            journal = Journal(os.path.join(data_dir(), "profiles", profile.name, "journal"))
+            manager = PathManager(reg, journal, user_key=key, environ=profile_environ(profile))
+            with manager.session() as session:
+                entries = session.paths(system=False)
+                if operation in ("audit", "clean"):
+                    expander = manager.expander()
+                    unknown = [str(entry) for entry in entries if expander.unresolved(str(entry))]
+                    resolved = [entry for entry in entries if str(entry) not in unknown]
+                    for result in check_paths(resolved, use_cache, expander):
+                        if result.status == BROKEN:
+                            broken.append(result.path)
+                        elif result.status == TIMEOUT:
+                            timed_out.append(result.path)
+                if operation == "clean":
+                    session.remove_all(broken, system=False)
+                    removed = list(broken)
+                elif operation == "add":
+                    for path in paths:
+                        if session.add(path, system=False):
+                            added.append(path)
+                current = session.paths(system=False).raw()
+    except Exception as e:
+        return ProfileResult(profile, [], broken, timed_out, unknown, [], [], f"{type(e).__name__}: {e}")
+    return ProfileResult(profile, current, broken, timed_out, unknown, added, removed)
+
+
+def run(
+    profiles: Iterable[Profile], operation: str, paths: list[str] = (), workers: int = None, use_cache=True
+) -> Iterator[ProfileResult]:
+    """Runs ``operation`` on every profile, yielding results as they finish.
+
+    Profiles are processed in a pool of ``workers`` processes (by default
+    one per CPU, at most one per profile). With one worker they run in this
+    process, one after another.
+    """
+    profiles = list(profiles)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(profiles)))
+    if workers == 1:
+        for profile in profiles:
+            yield run_profile(profile, operation, list(paths), use_cache)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(run_profile, profile, operation, list(paths), use_cache) for profile in profiles]
+        for future in as_completed(futures):
+            yield future.result()
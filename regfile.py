@@ -0,0 +1,445 @@
+"""Editing PATH in exported ``.reg`` files, without a registry.
+
+Image builds set PATH in ``.reg`` exports before the image ever boots.
+:func:`edit` reads such a file once, copying every line through as it is
+read, except the lines of an Environment key: those are held back until the
+key ends. Their values are loaded into a ``fakereg.FakeWinreg``, the
+operation runs on it through a ``registry.PathSession`` as it would on the
+live registry, and the key is written back with only its ``Path`` value
+changed. Memory use is bounded by the largest Environment key, not by the
+size of the export.
+
+Both export formats are read: ``Windows Registry Editor Version 5.00``
+files (UTF-16 with a byte order mark, as regedit writes them, or UTF-8) and
+``REGEDIT4`` files (ANSI). ``Path`` may be a string or a ``hex(2):``
+REG_EXPAND_SZ blob continued over several lines, and keeps its form when it
+is rewritten. The encoding and line endings of the file are kept, and a
+file whose PATH does not change is not rewritten.
+
+The system Environment key is recognised under any control set
+(``...\\ControlSet001\\Control\\Session Manager\\Environment``), and a user
+Environment key directly below a hive root (``HKEY_CURRENT_USER\\Environment``,
+``HKEY_USERS\\<SID>\\Environment``, or a hive loaded under another name).
+
+References are expanded against the image, not this machine: the variables
+Windows sets for every process (:data:`IMAGE_VARIABLES`) plus the values of
+the Environment key. ``clean`` only runs against a mounted image (``root``),
+and never removes an entry that still has unresolved references.
+"""
+import codecs
+import io
+import ntpath
+import os
+from collections import Counter
+from typing import Iterable, Iterator, NamedTuple
+
+import fakereg
+
+
+OPERATIONS = ["list", "add", "remove", "clean", "dedup"]
+
+HEADER5 = "Windows Registry Editor Version 5.00"
+HEADER4 = "REGEDIT4"
+
+# regedit wraps hex values so no line is longer than this
+LINE_WIDTH = 80
+
+# the machine variables of a default Windows install, which exports do not hold
+IMAGE_VARIABLES = {
+    "SystemDrive": "C:",
+    "SystemRoot": "C:\\Windows",
+    "windir": "C:\\Windows",
+    "ProgramFiles": "C:\\Program Files",
+    "ProgramFiles(x86)": "C:\\Program Files (x86)",
+    "ProgramW6432": "C:\\Program Files",
+    "CommonProgramFiles": "C:\\Program Files\\Common Files",
+    "CommonProgramFiles(x86)": "C:\\Program Files (x86)\\Common Files",
+    "CommonProgramW6432": "C:\\Program Files\\Common Files",
+    "ProgramData": "C:\\ProgramData",
+    "ALLUSERSPROFILE": "C:\\ProgramData",
+    "PUBLIC": "C:\\Users\\Public",
+}
+
+_BOMS = [(codecs.BOM_UTF8, "utf-8"), (codecs.BOM_UTF16_LE, "utf-16-le"), (codecs.BOM_UTF16_BE, "utf-16-be")]
+
+
+class Change(NamedTuple):
+    """What an operation did to the PATH of one Environment key."""
+
+    system: bool
+    key: str
+    before: list[str]
+    after: list[str]
+
+    @property
+    def added(self) -> list[str]:
+        return _difference(self.after, self.before)
+
+    @property
+    def removed(self) -> list[str]:
+        return _difference(self.before, self.after)
+
+
+def _difference(a: list[str], b: list[str]) -> list[str]:
+    """Returns the items of ``a`` that ``b`` does not account for, counting repeats."""
+    left = Counter(b)
+    result = []
+    for item in a:
+        if left[item]:
+            left[item] -= 1
+        else:
+            result.append(item)
+    return result
+
+
+def scope_of(key: str) -> bool | None:
+    """Returns True for a system Environment key, False for a user one and None for any other key."""
+    parts = key.lower().split("\\")
+    if parts[-1] != "environment":
+        return None
+    if parts[0] in ("hkey_local_machine", "hklm") and parts[-3:-1] == ["control", "session manager"]:
+        return True
+    if len(parts) == 2 and parts[0] in ("hkey_current_user", "hkcu"):
+        return False
+    if len(parts) == 3 and parts[0] in ("hkey_users", "hku", "hkey_local_machine", "hklm"):
+        return False
+    return None
+
+
+# -- reading -------------------------------------------------------------
+
+
+def _open(filename: str) -> tuple[io.TextIOWrapper, str, bytes]:
+    """Opens an export for reading. Returns the text stream, its encoding and byte order mark."""
+    raw = open(filename, "rb")
+    head = raw.read(len(HEADER4) + 4)
+    bom, encoding = b"", "utf-8"
+    for mark, name in _BOMS:
+        if head.startswith(mark):
+            bom, encoding = mark, name
+            break
+    else:
+        if head.startswith(HEADER4.encode("ascii")):
+            encoding = "cp1252"
+    raw.seek(len(bom))
+    # surrogateescape carries undecodable bytes through unchanged
+    return io.TextIOWrapper(raw, encoding, errors="surrogateescape", newline=""), encoding, bom
+
+
+def _text(line: str) -> str:
+    return line.rstrip("\r\n")
+
+
+def _split_value(text: str) -> tuple[str | None, str]:
+    """Splits a value line into its name ("" for the default value) and data; the name is None for other lines."""
+    text = text.lstrip()
+    if text.startswith("@="):
+        return "", text[2:]
+    if not text.startswith('"'):
+        return None, ""
+    i = 1
+    while i < len(text) and text[i] != '"':
+        i += 2 if text[i] == "\\" else 1
+    rest = text[i + 1:].lstrip()
+    if not rest.startswith("="):
+        return None, ""
+    return _unescape(text[1:i]), rest[1:]
+
+
+def _unescape(text: str) -> str:
+    out = []
+    i = 0
+    while i < len(text):
+        if text[i] == "\\" and i + 1 < len(text):
+            i += 1
+        out.append(text[i])
+        i += 1
+    return "".join(out)
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _logical_lines(stream) -> Iterator[list[str]]:
+    """Yields each logical line as the physical lines it spans, line endings included.
+
+    Only ``hex`` values are continued, by a trailing backslash.
+    """
+    pending: list[str] = []
+    for line in stream:
+        pending.append(line)
+        if _text(line).endswith("\\") and _split_value(_text(pending[0]))[1].lstrip().lower().startswith("hex"):
+            continue
+        yield pending
+        pending = []
+    if pending:
+        yield pending
+
+
+def _joined(lines: list[str]) -> str:
+    """Returns the text of a logical line, with its continuations joined."""
+    parts = [_text(line) for line in lines]
+    return "".join(part.rstrip("\\").strip() if i else part.rstrip("\\") for i, part in enumerate(parts))
+
+
+def parse_data(data: str, unicode=True) -> tuple[object, int, bool] | None:
+    """Decodes the data of a value line.
+
+    Returns ``(data, type, hex)``, where ``hex`` tells whether it was
+    written as a ``hex`` blob, or None for a deletion or a form that is not
+    understood. ``unicode`` is False for ``REGEDIT4`` files, whose string
+    blobs are ANSI.
+    """
+    data = data.strip()
+    if len(data) >= 2 and data[0] == data[-1] == '"':
+        return _unescape(data[1:-1]), fakereg.REG_SZ, False
+    lowered = data.lower()
+    if lowered.startswith("dword:"):
+        return int(data[6:], 16), fakereg.REG_DWORD, False
+    if not lowered.startswith("hex"):
+        return None
+    kind, _, body = data.partition(":")
+    type = int(kind[4:-1], 16) if kind.lower().startswith("hex(") else fakereg.REG_BINARY
+    blob = bytes(int(byte, 16) for byte in body.replace(" ", "").split(",") if byte)
+    if type in (fakereg.REG_SZ, fakereg.REG_EXPAND_SZ, fakereg.REG_MULTI_SZ):
+        text = blob.decode("utf-16-le" if unicode else "cp1252", errors="replace")
+        if type == fakereg.REG_MULTI_SZ:
+            return [item for item in text.split("\0") if item], type, True
+        return text.split("\0", 1)[0], type, True
+    return blob, type, True
+
+
+def format_value(name: str, data: str, type: int, hex: bool, unicode=True) -> list[str]:
+    """Returns the lines of a string value, as regedit writes them (without line endings)."""
+    prefix = f'"{_escape(name)}"=' if name else "@="
+    if not hex:
+        return [f'{prefix}"{_escape(data)}"']
+    blob = (data + "\0").encode("utf-16-le" if unicode else "cp1252", errors="replace")
+    lines = []
+    line = f"{prefix}hex({type:x}):"
+    for i, byte in enumerate(blob):
+        token = f"{byte:02x}" + ("," if i < len(blob) - 1 else "")
+        # leave room for the continuation backslash
+        if len(line) + len(token) > LINE_WIDTH - 3:
+            lines.append(line + "\\")
+            line = "  "
+        line += token
+    lines.append(line)
+    return lines
+
+
+# -- editing -------------------------------------------------------------
+
+
+def _apply(manager, system: bool, operation: str, paths: list[str], root: str | None) -> None:
+    """Runs an operation on one scope of a manager, as the CLI commands do."""
+    with manager.session() as session:
+        entries = session.paths(system)
+        if operation == "add":
+            for path in paths:
+                session.add(path, system=system)
+        elif operation == "remove":
+            session.remove_all(paths, system=system)
+        elif operation == "clean":
+            from checker import BROKEN, PathChecker
+
+            expander = manager.expander()
+            # an entry the image's variables cannot resolve is not known to be gone
+            resolved = [p for p in entries.raw() if "%" not in expander.expand(p)]
+            checker = PathChecker(lambda path: os.path.exists(locate(expander.expand(path.strip().strip('"')), root)))
+            session.remove_all([r.path for r in checker.check(resolved) if r.status == BROKEN], system=system)
+        elif operation == "dedup":
+            from canon import find_duplicates
+
+            raw = entries.raw()
+            drop = {d.index for d in find_duplicates([(system, raw)], expand=manager.expander())}
+            if drop:
+                session.replace([p for i, p in enumerate(raw) if i not in drop], system=system)
+
+
+def locate(path: str, root: str | None) -> str:
+    """Maps a drive-letter path of the image onto ``root``, where the image is mounted.
+
+    Each component is matched case-insensitively, as Windows would, against
+    the names in the mounted file system.
+    """
+    if root is None:
+        return path
+    drive, rest = ntpath.splitdrive(path)
+    if len(drive) != 2:
+        return path
+    located = root
+    for part in rest.replace("/", "\\").split("\\"):
+        if not part or part == ".":
+            continue
+        candidate = os.path.join(located, part)
+        if part != ".." and not os.path.lexists(candidate):
+            try:
+                names = os.listdir(located)
+            except OSError:
+                names = []
+            folded = part.casefold()
+            candidate = next((os.path.join(located, name) for name in names if name.casefold() == folded), candidate)
+        located = candidate
+    return located
+
+
+class _Section:
+    """The held-back lines of one Environment key."""
+
+    def __init__(self, header: list[str], key: str, system: bool) -> None:
+        self.lines = [header]
+        self.key = key
+        self.system = system
+
+    def edit(self, operation: str, paths: list[str], unicode: bool, newline: str, root, environ) -> tuple[list[list[str]], Change]:
+        from registry import KEY1, KEY2, PathManager
+
+        reg = fakereg.FakeWinreg()
+        key = KEY2 if self.system else KEY1
+        reg.CreateKey(*key).Close()
+        at = None
+        for position, lines in enumerate(self.lines[1:], 1):
+            name, data = _split_value(_joined(lines))
+            if name is None:
+                continue
+            value = parse_data(data, unicode)
+            if value is None or not isinstance(value[0], str):
+                continue
+            reg.set_value(*key, name, value[0], value[1])
+            if name.upper() == "PATH":
+                at, name_as_written, type, hex = position, name, value[1], value[2]
+        manager = PathManager(reg, journal=False, user_key=KEY1, environ=environ)
+        before = manager._read(self.system)
+        _apply(manager, self.system, operation, paths, root)
+        after = manager._read(self.system)
+        change = Change(self.system, self.key, before.split(";") if before else [], after.split(";") if after else [])
+        if after == before:
+            return self.lines, change
+        if at is None:
+            # regedit writes REG_EXPAND_SZ as hex(2)
+            name_as_written, type, hex = "Path", fakereg.REG_EXPAND_SZ, True
+        replacement = [line + newline for line in format_value(name_as_written, after, type, hex, unicode)]
+        lines = list(self.lines)
+        if at is not None:
+            lines[at] = replacement
+        else:
+            # before the blank line that ends the key
+            end = len(lines)
+            while end > 1 and not _text(lines[end - 1][0]).strip():
+                end -= 1
+            lines.insert(end, replacement)
+        return lines, change
+
+
+def edit(
+    filename: str,
+    operation: str,
+    paths: Iterable[str] = (),
+    scopes: Iterable[bool] = (True, False),
+    output: str = None,
+    root: str = None,
+    environ: dict[str, str] = None,
+    dry_run=False,
+) -> list[Change]:
+    """Runs an operation on the PATH of every Environment key in a ``.reg`` export.
+
+    Parameters
+    ----------
+    filename : str
+        The export to read.
+    operation : str
+        One of :data:`OPERATIONS`.
+    paths : Iterable[str], optional
+        The paths to add or remove.
+    scopes : Iterable[bool], optional
+        The scopes to edit (True is system); other Environment keys are copied unchanged.
+    output : str, optional
+        Where to write the result. Defaults to ``filename``, which is then
+        only replaced if a PATH changed.
+    root : str, optional
+        Where the image is mounted; ``clean`` looks for drive-letter paths
+        below it instead of on this machine, and needs it.
+    environ : dict[str, str], optional
+        The variables references are expanded against, besides those in
+        the Environment key itself. Defaults to :data:`IMAGE_VARIABLES`.
+    dry_run : bool, optional
+        Only report the changes.
+
+    Returns
+    -------
+    list[Change]
+        One change per Environment key of the selected scopes, in file order.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a registry export, or ``clean`` has no ``root``.
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"unknown operation {operation!r}")
+    if operation == "clean" and root is None:
+        raise ValueError("clean needs the directory the image is mounted at (--root)")
+    paths = list(paths)
+    scopes = set(scopes)
+    environ = dict(IMAGE_VARIABLES) if environ is None else environ
+    writing = operation != "list" and not dry_run
+    target = output if output is not None else filename
+    temp = f"{target}.{os.getpid()}.tmp"
+    changes = []
+    stream, encoding, bom = _open(filename)
+    out = None
+    try:
+        if writing:
+            out = io.TextIOWrapper(open(temp, "wb"), encoding, errors="surrogateescape", newline="")
+            out.buffer.write(bom)
+        lines = _logical_lines(stream)
+        header = next(lines, None)
+        first = _text(header[0]).strip() if header else ""
+        if first not in (HEADER5, HEADER4):
+            raise ValueError("not a registry export (no 'Windows Registry Editor Version 5.00' or 'REGEDIT4' header)")
+        unicode = first == HEADER5
+        newline = header[0][len(_text(header[0])):] or "\r\n"
+        section = None
+
+        def flush() -> None:
+            if section is None:
+                return
+            edited, change = section.edit(operation, paths, unicode, newline, root, environ)
+            changes.append(change)
+            if out is not None:
+                for logical in edited:
+                    out.writelines(logical)
+
+        if out is not None:
+            out.writelines(header)
+        for logical in lines:
+            text = _text(logical[0]).strip()
+            if text.startswith("[") and text.endswith("]"):
+                flush()
+                key = text[1:-1]
+                system = None if key.startswith("-") else scope_of(key)
+                section = _Section(logical, key, system) if system in scopes else None
+                if section is not None:
+                    continue
+            elif section is not None:
+                section.lines.append(logical)
+                continue
+            if out is not None:
+                out.writelines(logical)
+        flush()
+    except BaseException:
+        if out is not None:
+            out.close()
+            os.unlink(temp)
+        raise
+    finally:
+        stream.close()
+    if out is not None:
+        out.close()
+        if output is None and all(change.before == change.after for change in changes):
+            os.unlink(temp)
+        else:
+            os.replace(temp, target)
+    return changes
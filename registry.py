@@ -1,5 +1,18 @@
 import os
-import winreg
+import sys
+from contextlib import contextmanager
+
+import tracing
+
+# The probe engine, cache, canonical keys and journal are imported where
+# they are used, so listing PATH does not pay for loading them.
+
+try:
+    import winreg
+except ImportError:
+    # Not on Windows: use the in-memory stand-in so the module can still be
+    # imported and exercised.
+    import fakereg as winreg
 
 
 KEY1 = (winreg.HKEY_CURRENT_USER, "Environment")
@@ -16,16 +29,21 @@ PATH2 = (
 TYPE1 = winreg.REG_EXPAND_SZ
 TYPE2 = winreg.REG_EXPAND_SZ
 
+# Other ;-separated variables kept under the Environment keys. Any value can
+# be managed with ``PathManager.with_variable``; these are the usual ones.
+VARIABLES = ("Path", "PSModulePath", "PATHEXT", "PYTHONPATH", "LIB", "INCLUDE", "CLASSPATH")
+# Variables whose entries are not paths, so probing them means nothing.
+NOT_PATHS = {"PATHEXT"}
+
 
 def expand_string(string: str) -> str:
     """Expands a string containing environment variable references.
 
-    If the string contains one or more substrings of the form %envar%,
-    then each such substring is replaced by the value of the environment
-    variable ``envar`` if it exists, otherwise the original substring is
-    left unchanged. If ``envar`` is the string "PATH", then the substring
-    is left unchanged. The returned string is the original string with all
-    such substrings replaced.
+    Every substring of the form %envar% is replaced by the value of the
+    environment variable ``envar`` if it exists, otherwise it is left
+    unchanged. References to "PATH" are always left unchanged. Results are
+    memoized for as long as the environment does not change (see
+    ``expand.Expander``).
 
     Parameters
     ----------
@@ -37,21 +55,47 @@ def expand_string(string: str) -> str:
     str
         The expanded string.
     """
-    if string.startswith("%"):
-        end = string.rindex("%")
-        start = string.index("%")
-        envar = string[start + 1 : end].strip("%")
-        if envar == "PATH":
-            return string
-        p = os.environ[envar]
-        print(envar, " <--", p)
-        return p + string[end + 1 :]
-    else:
-        return string
-
-
-def get_path_variable(system=True) -> list[str]:
-    """Returns the PATH environment variable as a list of strings.
+    from expand import environment
+
+    return environment().expand(string)
+
+
+def read_environment(system=True, reg=None, key: tuple[int, str] = None) -> dict[str, tuple[object, int]]:
+    """Returns every value stored under a scope's Environment key.
+
+    Parameters
+    ----------
+    system : bool, optional
+        Whether to read the system-wide (the default) or the user-specific key.
+    reg : optional
+        The winreg-compatible module to read from. Defaults to ``winreg``.
+    key : tuple[int, str], optional
+        The (root, sub key) to read instead, e.g. another profile's
+        Environment key under ``HKEY_USERS``.
+
+    Returns
+    -------
+    dict[str, tuple[object, int]]
+        Value name -> (data, registry type), in the order the key lists them.
+    """
+    reg = reg if reg is not None else winreg
+    if key is None:
+        key = KEY2 if system else KEY1
+    values = {}
+    with reg.OpenKey(key[0], key[1]) as handle:
+        index = 0
+        while True:
+            try:
+                name, data, type = reg.EnumValue(handle, index)
+            except OSError:
+                break
+            values[name] = (data, type)
+            index += 1
+    return values
+
+
+def get_path_variable(system=True) -> "PathList":
+    """Returns the PATH environment variable as a ``PathList``.
 
     If `system` is ``True`` (the default), the system-wide PATH is returned.
     If `system` is ``False``, the user-specific PATH is returned.
@@ -69,26 +113,21 @@ def get_path_variable(system=True) -> list[str]:
 
     Returns
     -------
-    list[str]
-        The expanded PATH environment variable as a list of strings.
+    PathList
+        The PATH environment variable, one ``PathEntry`` per entry, each
+        holding its raw and expanded form.
     """
+    from pathlist import PathList
+
     if system == False:
         with winreg.OpenKey(KEY1[0], KEY1[1]) as key:
             value, type = winreg.QueryValueEx(key, PATH1[2])
-            value = value.split(";")
-            return value
+            return PathList.parse(value, system=False)
 
     elif system == True:
         with winreg.OpenKey(KEY2[0], KEY2[1]) as key:
             value, type = winreg.QueryValueEx(key, PATH2[2])
-            value: list[str] = value.split(";")
-            v = []
-            for val in value:
-                if val[1] == "%PATH%":
-                    continue
-                else:
-                    v.append(val)
-        return v
+        return PathList((val for val in value.split(";") if val != "%PATH%") if value else (), system=True)
 
 
 def add_to_user_path(path: str) -> None:
@@ -103,13 +142,8 @@ def add_to_user_path(path: str) -> None:
     -------
     None
     """
-    strings = get_path_variable(system=False)
-    strings.append(path)
-    strings = ";".join(strings)
-
-    with winreg.OpenKey(KEY1[0], KEY1[1]) as key:
-        winreg.SetValueEx(key, PATH1[2], 0, TYPE1, strings)
-        winreg.FlushKey(key)
+    with PathManager().session() as session:
+        session.add(path, system=False)
 
 
 def add_to_system_path(path: str) -> None:
@@ -124,13 +158,8 @@ def add_to_system_path(path: str) -> None:
     -------
     None
     """
-    strings = get_path_variable(system=True)
-    strings.append(path)
-    strings = ";".join(strings)
-
-    with winreg.OpenKey(KEY2[0], KEY2[1]) as key:
-        winreg.SetValueEx(key, PATH2[2], 0, TYPE2, strings)
-        winreg.FlushKey(key)
+    with PathManager().session() as session:
+        session.add(path, system=True)
 
 
 def remove_from_user_path(path: str) -> None:
@@ -145,13 +174,8 @@ def remove_from_user_path(path: str) -> None:
     -------
     None
     """
-    strings = get_path_variable(system=False)
-    strings.remove(path)
-    strings = ";".join(strings)
-
-    with winreg.OpenKey(KEY1[0], KEY1[1]) as key:
-        winreg.SetValueEx(key, PATH1[2], 0, TYPE1, strings)
-        winreg.FlushKey(key)
+    with PathManager().session() as session:
+        session.paths(system=False).remove(path)
 
 
 def remove_from_system_path(path: str) -> None:
@@ -166,13 +190,8 @@ def remove_from_system_path(path: str) -> None:
     -------
     None
     """
-    strings = get_path_variable(system=True)
-    strings.remove(path)
-    strings = ";".join(strings)
-
-    with winreg.OpenKey(KEY2[0], KEY2[1]) as key:
-        winreg.SetValueEx(key, PATH2[2], 0, TYPE2, strings)
-        winreg.FlushKey(key)
+    with PathManager().session() as session:
+        session.paths(system=True).remove(path)
 
 
 def remove_paths_from_system_path(paths: list[str]) -> None:
@@ -187,14 +206,8 @@ def remove_paths_from_system_path(paths: list[str]) -> None:
     -------
     None
     """
-    strings = get_path_variable(system=True)
-    for path in paths:
-        strings.remove(path)
-    strings = ";".join(strings)
-
-    with winreg.OpenKey(KEY2[0], KEY2[1]) as key:
-        winreg.SetValueEx(key, PATH2[2], 0, TYPE2, strings)
-        winreg.FlushKey(key)
+    with PathManager().session() as session:
+        session.remove_all(paths, system=True)
 
 
 def remove_paths_from_user_path(paths: list[str]) -> None:
@@ -209,14 +222,8 @@ def remove_paths_from_user_path(paths: list[str]) -> None:
     -------
     None
     """
-    strings = get_path_variable(system=False)
-    for path in paths:
-        strings.remove(path)
-    strings = ";".join(strings)
-
-    with winreg.OpenKey(KEY1[0], KEY1[1]) as key:
-        winreg.SetValueEx(key, PATH1[2], 0, TYPE1, strings)
-        winreg.FlushKey(key)
+    with PathManager().session() as session:
+        session.remove_all(paths, system=False)
 
 
 def add_to_path(path: str, system=True) -> None:
@@ -235,21 +242,106 @@ def add_to_path(path: str, system=True) -> None:
     -------
     None
     """
-    strings = get_path_variable(system=system)
-    strings.append(path)
-    strings = ";".join(strings)
+    with PathManager().session() as session:
+        session.add(path, system=system)
 
-    if system == False:
-        with winreg.OpenKey(KEY1[0], KEY1[1]) as key:
-            winreg.SetValueEx(key, PATH1[2], 0, TYPE1, strings)
-            winreg.FlushKey(key)
-    elif system == True:
-        with winreg.OpenKey(KEY2[0], KEY2[1]) as key:
-            winreg.SetValueEx(key, PATH2[2], 0, TYPE2, path)
-            winreg.FlushKey(key)
 
+def entry_exists(path: str, expand=expand_string) -> bool:
+    """Returns True if a PATH entry exists, as written or once expanded."""
+    with tracing.span("exists", tracing.FILESYSTEM, path=path):
+        if os.path.exists(path):
+            return True
+    expanded = expand(path)
+    if expanded == path:
+        return False
+    with tracing.span("exists", tracing.FILESYSTEM, path=expanded):
+        return os.path.exists(expanded)
+
+
+def default_checker(cache: "StatCache" = None, expand=expand_string) -> "PathChecker":
+    """Returns the checker shared by audit, clean and the non-existing helpers.
+
+    With a ``cache``, fresh cached results are used instead of probing.
+    ``expand`` expands the entries that do not exist as written, e.g. an
+    ``expand.Expander``.
+    """
+    from checker import PathChecker
+
+    if cache is None:
+        return PathChecker(lambda path: entry_exists(path, expand))
 
-def get_non_existing_paths() -> list[tuple[str, str]]:
+    def cached_entry_exists(path: str) -> bool:
+        if cache.exists(path):
+            return True
+        expanded = expand(path)
+        return expanded != path and cache.exists(expanded)
+
+    return PathChecker(cached_entry_exists)
+
+
+def check_paths(paths: "list[str] | PathList", use_cache=True, expander: "Expander" = None) -> list["ProbeResult"]:
+    """Probes PATH entries with the default checker.
+
+    Parameters
+    ----------
+    paths : list[str] or PathList
+        PATH entries to probe. The status of each ``PathEntry`` is updated.
+    use_cache : bool, optional
+        Whether to consult and update the on-disk ``StatCache``. Defaults to True.
+    expander : Expander, optional
+        Expands variable references. Defaults to ``PathManager().expander()``,
+        which also sees the variables stored in the registry.
+
+    Returns
+    -------
+    list[ProbeResult]
+        One result per entry, in the same order.
+    """
+    from cache import StatCache
+
+    if expander is None:
+        expander = PathManager().expander()
+    strings = [str(path) for path in paths]
+    # expand the whole list up front so the probe threads only hit the memo
+    expander.expand_all(strings)
+    cache = StatCache.load() if use_cache else None
+    results = default_checker(cache, expander.expand).check(strings)
+    if cache is not None:
+        cache.save()
+    for path, result in zip(paths, results):
+        if not isinstance(path, str):
+            path.status = result.status
+    return results
+
+
+def find_non_existing(paths: "list[str] | PathList", use_cache=True, expander: "Expander" = None) -> list[str]:
+    """
+    Returns the entries of ``paths`` that do not exist on the file system.
+
+    Each entry is checked as written and, failing that, with any environment
+    variable placeholders expanded. Entries whose probe times out are not
+    reported, since an unreachable share is not proof that a path is gone.
+
+    Parameters
+    ----------
+    paths : list[str] or PathList
+        PATH entries, for example from ``get_path_variable`` or a ``PathSession``.
+    use_cache : bool, optional
+        Whether to consult and update the on-disk ``StatCache``. Defaults to True.
+    expander : Expander, optional
+        Passed through to ``check_paths``.
+
+    Returns
+    -------
+    list[str]
+        The non-existing entries, in their original order.
+    """
+    from checker import BROKEN
+
+    return [result.path for result in check_paths(paths, use_cache, expander) if result.status == BROKEN]
+
+
+def get_non_existing_paths(use_cache=True) -> list[tuple[str, str]]:
     """
     Retrieves a list of non-existing paths from the system and user PATH environment variables.
 
@@ -258,36 +350,30 @@ def get_non_existing_paths() -> list[tuple[str, str]]:
     expand any environment variable placeholders in the path and checks again. Non-existing
     paths are categorized as either "SYSTEM" or "USER" based on their origin.
 
+    Parameters
+    ----------
+    use_cache : bool, optional
+        Whether to consult and update the on-disk ``StatCache``. Defaults to True.
+
     Returns
     -------
     list[tuple[str, str]]
         A list of tuples, where each tuple contains a string indicating the path's origin
         ("SYSTEM" or "USER") and the non-existing path itself.
     """
-    system_paths = get_path_variable(system=True)
-    user_paths = get_path_variable(system=False)
+    from checker import BROKEN
+
+    paths = get_path_variable(system=True) + get_path_variable(system=False)
+    check_paths(paths, use_cache)
     retv = []
-    for path in system_paths:
-        if os.path.exists(path) == False:
-            expanded = expand_string(path)
-            if os.path.exists(expanded):
-                continue
-            else:
-                retv.append(["SYSTEM", path])
-                continue
-
-    for path in user_paths:
-        if os.path.exists(path) == False:
-            expanded = expand_string(path)
-            if os.path.exists(expanded):
-                continue
-            else:
-                retv.append(["USER", path])
+    for entry in paths:
+        if entry.status == BROKEN:
+            retv.append(["SYSTEM" if entry.system else "USER", entry.raw])
 
     return retv
 
 
-def get_non_existing_user_paths() -> list[str]:
+def get_non_existing_user_paths(use_cache=True) -> list[str]:
     """
     Retrieves a list of non-existing user-specific paths from the PATH environment variable.
 
@@ -296,50 +382,36 @@ def get_non_existing_user_paths() -> list[str]:
     expand any environment variable placeholders in the path and checks again.
     Non-existing paths are collected and returned.
 
+    Parameters
+    ----------
+    use_cache : bool, optional
+        Whether to consult and update the on-disk ``StatCache``. Defaults to True.
+
     Returns
     -------
     list[str]
         A list of non-existing paths from the user-specific PATH environment variable.
     """
-    user_paths = get_path_variable(system=False)
-    retv = []
+    return find_non_existing(get_path_variable(system=False), use_cache)
 
-    for path in user_paths:
-        if os.path.exists(path):
-            continue
-
-        expanded = expand_string(path)
-        if os.path.exists(expanded):
-            continue
 
-        retv.append(path)
-
-    return retv
-
-
-def get_non_existing_system_paths() -> list[str]:
+def get_non_existing_system_paths(use_cache=True) -> list[str]:
     """
     Retrieves a list of non-existing system-wide paths from the PATH environment variable.
 
     This function checks the system-wide PATH environment variable for paths that do not exist on the file system. If a path is not found, it attempts to expand any environment variable placeholders in the path and checks again. Non-existing paths are collected and returned.
 
+    Parameters
+    ----------
+    use_cache : bool, optional
+        Whether to consult and update the on-disk ``StatCache``. Defaults to True.
+
     Returns
     -------
     list[str]
         A list of non-existing paths from the system-wide PATH environment variable.
     """
-    system_paths = get_path_variable(system=True)
-    retv = []
-    for path in system_paths:
-        if os.path.exists(path):
-            continue
-        expanded = expand_string(path)
-        if os.path.exists(expanded):
-            continue
-
-        retv.append(path)
-
-    return retv
+    return find_non_existing(get_path_variable(system=True), use_cache)
 
 
 def remove_non_existing_user_paths():
@@ -357,7 +429,8 @@ def remove_non_existing_user_paths():
 
     for item in non_existing:
         print(f"removing {item}")
-        remove_from_user_path(item)
+    with PathManager().session() as session:
+        session.remove_all(non_existing, system=False)
 
 
 def remove_non_existing_paths():
@@ -372,11 +445,9 @@ def remove_non_existing_paths():
     None
     """
     non_existing = get_non_existing_paths()
-    for item in non_existing:
-        if item[0] == "SYSTEM":
-            remove_from_system_path(item[1])
-        elif item[0] == "USER":
-            remove_from_user_path(item[1])
+    with PathManager().session() as session:
+        session.remove_all([item[1] for item in non_existing if item[0] == "SYSTEM"], system=True)
+        session.remove_all([item[1] for item in non_existing if item[0] == "USER"], system=False)
 
 
 def remove_non_existing_system_paths():
@@ -393,163 +464,394 @@ def remove_non_existing_system_paths():
 
     paths = get_non_existing_system_paths()
 
-    for path in paths:
-        remove_from_system_path(path)
+    with PathManager().session() as session:
+        session.remove_all(paths, system=True)
         
 
 
+class PathSession:
+    """Batched, in-memory edits to the user and system PATH values.
+
+    Each scope is read from the registry at most once, the first time it is
+    touched. Edits are applied to the in-memory lists and :meth:`commit`
+    writes each changed scope back with a single ``SetValueEx``. Use it
+    through :meth:`PathManager.session`, which commits on a clean exit and
+    discards the edits if the block raises.
+
+    Membership is decided on canonical keys (see ``canon.canonical_key``),
+    so ``C:\\Tools`` and ``c:/tools/`` count as the same entry. References
+    are expanded with the manager's variables, so ``%TOOLS%\\bin`` and
+    ``C:\\Tools\\bin`` do too when the Environment key sets ``TOOLS``. A
+    reference of the system scope to the variable itself (``%PATH%``) is
+    left out, as in :meth:`PathManager.get_system_paths`.
+    """
+
+    def __init__(self, manager: "PathManager") -> None:
+        self.manager = manager
+        self._original: dict[bool, str] = {}
+        # scope -> the working value as loaded or last committed
+        self._loaded: dict[bool, str] = {}
+        self._paths: dict[bool, "PathList"] = {}
+        # scope -> how its next commit is marked in the journal, e.g. {"undone": 2}
+        self.marks: dict[bool, dict] = {}
+
+    def _parse(self, value: str, system: bool) -> "PathList":
+        from pathlist import PathList
+
+        paths = value.split(";") if value else []
+        if system:
+            own = f"%{self.manager.variable.upper()}%"
+            paths = [p for p in paths if p.upper() != own]
+        return PathList(paths, system, self.manager.expand)
+
+    def _entries(self, system: bool) -> "PathList":
+        if system not in self._paths:
+            value = self.manager._read(system)
+            self._original[system] = value
+            self._paths[system] = self._parse(value, system)
+            self._loaded[system] = self._paths[system].value()
+        return self._paths[system]
+
+    def paths(self, system=True) -> "PathList":
+        """Returns the working entries of a scope.
+
+        The list may be modified in place; it is what :meth:`commit` writes.
+        """
+        return self._entries(system)
+
+    def has(self, path: str, system=True) -> bool:
+        """Returns True if the scope contains the path or an equivalent entry."""
+        return path in self._entries(system)
+
+    def add(self, path: str, system=True) -> bool:
+        """Appends a path to a scope unless an equivalent entry is present.
+
+        Returns True if the path was added.
+        """
+        entries = self._entries(system)
+        if path in entries:
+            return False
+        entries.append(path)
+        return True
+
+    def remove(self, path: str, system=True) -> bool:
+        """Removes every entry equivalent to a path from a scope.
+
+        Returns True if anything was removed.
+        """
+        return self._entries(system).discard(path) > 0
+
+    def remove_all(self, paths: list[str], system=True) -> int:
+        """Removes every entry equivalent to any of ``paths`` in one pass.
+
+        Returns how many entries were removed.
+        """
+        return self._entries(system).discard_all(paths)
+
+    def move(self, path: str, index: int, system=True) -> None:
+        """Moves a path to ``index`` within its scope."""
+        self._entries(system).move(path, index)
+
+    def replace(self, paths: list[str], system=True) -> None:
+        """Replaces every entry of a scope."""
+        self._entries(system).replace(paths)
+
+    def value(self, system=True) -> str:
+        """Returns the working value of a scope as a registry string."""
+        return self._entries(system).value()
+
+    def changed(self, system=True) -> bool:
+        """Returns True if the scope was loaded and differs from the registry."""
+        return system in self._paths and self.value(system) != self._loaded[system]
+
+    def commit(self) -> list[bool]:
+        """Writes each changed scope back to the registry.
+
+        If a write fails, scopes already written by this call are restored to
+        their original values before the error is re-raised.
+
+        Returns
+        -------
+        list[bool]
+            The scopes that were written (True for system, False for user).
+        """
+        written = []
+        try:
+            for system in (True, False):
+                if self.changed(system):
+                    self.manager._write(system, self.value(system))
+                    written.append(system)
+        except BaseException:
+            for system in written:
+                self.manager._write(system, self._original[system])
+            raise
+        for system in written:
+            old = self._original[system]
+            self._original[system] = self._loaded[system] = self.value(system)
+            self.manager._record(system, old, self._original[system], **self.marks.pop(system, {}))
+        return written
+
+    def rollback(self) -> None:
+        """Discards all uncommitted edits."""
+        for system, value in self._original.items():
+            self._paths[system] = self._parse(value, system)
+
+
 class PathManager:
-    def __init__(self) -> None:
+    def __init__(self, reg=None, journal=None, user_key: tuple[int, str] = None, environ: dict[str, str] = None) -> None:
         self.domain = {"System", "User"}
+        # Anything implementing the winreg API, e.g. a fakereg.FakeWinreg.
+        self.reg = reg if reg is not None else winreg
+        # Committed changes are journaled unless journal=False is passed.
+        self._journal = journal
+        # The user scope lives under HKEY_CURRENT_USER unless another
+        # profile's key (HKEY_USERS\<SID>\Environment) is given.
+        self.user_key = user_key if user_key is not None else KEY1
+        # The process environment variables are expanded against.
+        self.environ = environ if environ is not None else os.environ
+        # The ;-separated value this manager reads and writes.
+        self.variable = "Path"
+        self._expander = None
+        # scope -> every value under its Environment key, see snapshot()
+        self._snapshots: dict[bool, dict[str, tuple[object, int]]] = {}
+
+    @property
+    def journal(self) -> "Journal | None":
+        """The journal committed changes are recorded in, created on first use."""
+        if self._journal is None:
+            from journal import Journal
+
+            self._journal = Journal()
+        return self._journal or None
+
+    def expand(self, path: str) -> str:
+        """Expands a path with :meth:`expander`, which is only built for paths with references."""
+        return self.expander().expand(path) if "%" in path else path
+
+    def expander(self) -> "Expander":
+        """Returns the variable expander for new processes, read once per manager.
+
+        Values stored under the system and then the user Environment key
+        override the process environment, as they do for a new process.
+        ``REG_EXPAND_SZ`` values are expanded recursively.
+        """
+        if self._expander is None:
+            from expand import snapshot
+
+            variables = dict(self.environ)
+            expandable = set()
+            for system in (True, False):
+                try:
+                    values = self.snapshot(system)
+                except OSError:
+                    continue
+                for name, (data, type) in values.items():
+                    if not isinstance(data, str) or name.upper() == "PATH":
+                        continue
+                    variables[name.upper()] = data
+                    if type == self.reg.REG_EXPAND_SZ:
+                        expandable.add(name.upper())
+            self._expander = snapshot(variables, expandable)
+        return self._expander
+
+    def snapshot(self, system=True) -> dict[str, tuple[object, int]]:
+        """Returns every value under a scope's Environment key, read once per manager.
+
+        The key is opened once and all of its values are enumerated with
+        their types in one pass (see :func:`read_environment`), so PATH, the
+        other ;-separated variables and the variables :meth:`expander` needs
+        all come from the same read. Managers made with
+        :meth:`with_variable` share the snapshot, and :meth:`_write` keeps it
+        up to date.
+
+        Raises
+        ------
+        OSError
+            If the key cannot be opened.
+        """
+        if system not in self._snapshots:
+            self._snapshots[system] = read_environment(system, self.reg, KEY2 if system else self.user_key)
+        return self._snapshots[system]
+
+    def _lookup(self, system: bool) -> tuple[str, object, int] | None:
+        """Returns (name, data, type) of :attr:`variable` in a scope, None if it is not set."""
+        values = self.snapshot(system)
+        if self.variable in values:
+            return (self.variable, *values[self.variable])
+        # value names are case-insensitive
+        wanted = self.variable.upper()
+        for name, (data, type) in values.items():
+            if name.upper() == wanted:
+                return (name, data, type)
+        return None
+
+    def with_variable(self, name: str) -> "PathManager":
+        """Returns a manager for another ;-separated variable, e.g. ``PSModulePath``.
+
+        It shares this manager's registry, journal and snapshots, so working
+        on several variables still reads each scope once.
+        Changes to variables other than PATH are not journaled.
+        """
+        import copy
+
+        manager = copy.copy(self)
+        manager.variable = name
+        return manager
+
+    def _record(self, system: bool, old: str, new: str, **marks) -> None:
+        """Journals a committed change. Failing to journal never undoes the write.
+
+        ``marks`` are passed on to ``Journal.record`` (``undone``, ``restored``).
+        """
+        if self.journal is None or self.variable.upper() != "PATH":
+            return
+        try:
+            self.journal.record(system, old.split(";") if old else [], new.split(";") if new else [], **marks)
+        except OSError as e:
+            print(f"pathcleaner: could not write journal: {e}", file=sys.stderr)
+
+    def _read(self, system=True) -> str:
+        """Returns the raw value of :attr:`variable` in a scope, "" if the key does not hold it."""
+        found = self._lookup(system)
+        if found is None or not isinstance(found[1], str):
+            return ""
+        return found[1]
+
+    def _write(self, system: bool, value: str) -> None:
+        """Replaces the raw value of :attr:`variable` in a scope.
+
+        An existing value keeps its name and string type; a new one is
+        written as ``REG_EXPAND_SZ``, as PATH always is.
+        """
+        key, kind = (KEY2, TYPE2) if system else (self.user_key, TYPE1)
+        name = self.variable
+        found = self._lookup(system)
+        if found is not None:
+            name = found[0]
+            if self.variable.upper() != "PATH" and found[2] in (self.reg.REG_SZ, self.reg.REG_EXPAND_SZ):
+                kind = found[2]
+        with self.reg.OpenKey(key[0], key[1], 0, self.reg.KEY_SET_VALUE) as handle:
+            self.reg.SetValueEx(handle, name, 0, kind, value)
+        self._snapshots[system][name] = (value, kind)
+
+    @contextmanager
+    def session(self):
+        """Context manager yielding a :class:`PathSession`.
+
+        The session's edits are committed when the block exits normally and
+        discarded if it raises, so each scope costs at most one registry read
+        and one write no matter how many edits are made.
+
+        Example
+        -------
+        >>> with PathManager().session() as session:
+        ...     session.remove("C:\\\\Old\\\\bin", system=False)
+        ...     session.add("C:\\\\New\\\\bin", system=False)
+        """
+        session = PathSession(self)
+        try:
+            yield session
+        except BaseException:
+            session.rollback()
+            raise
+        session.commit()
 
     def user_path(self):
         """Returns the user-specific PATH environment variable value"""
 
-        with winreg.OpenKey(KEY1[0], KEY1[1]) as key:
-            value, type = winreg.QueryValueEx(key, PATH1[2])
-            return value
+        return self._read(system=False)
 
     def system_path(self):
         """Returns the system PATH environment variable value"""
 
         try:
-            with winreg.OpenKey(KEY2[0], KEY2[1]) as key:
-                value, type = winreg.QueryValueEx(key, PATH2[2])
-                return value
+            return self._read(system=True)
         except:
             None
 
-    def get_user_paths(self) -> list[str]:
+    def get_user_paths(self) -> "PathList":
         """Returns the PATH environment variable values"""
+        from pathlist import PathList
 
-        with winreg.OpenKey(KEY1[0], KEY1[1]) as key:
-            value, type = winreg.QueryValueEx(key, PATH1[2])
-            value = value.split(";")
-            return value
+        return PathList.parse(self._read(system=False), system=False)
 
-    def get_system_paths(self) -> list[str]:
+    def get_system_paths(self) -> "PathList":
         """Returns the PATH environment variable values"""
+        from pathlist import PathList
 
-        with winreg.OpenKey(KEY2[0], KEY2[1]) as key:
-            value, type = winreg.QueryValueEx(key, PATH2[2])
-            value: list[str] = value.split(";")
-            v = []
-            for val in value:
-                if val[1] == "%PATH%":
-                    continue
-                else:
-                    v.append(val)
-
-        return v
+        value = self._read(system=True)
+        # a reference to the variable itself, as in "%PATH%", adds nothing
+        own = f"%{self.variable.upper()}%"
+        return PathList((p for p in value.split(";") if p.upper() != own) if value else (), system=True)
 
     def add_user_path(self, path: str) -> None:
         """Adds a path to the user-specific PATH environment variable."""
-        with winreg.OpenKey(KEY1[0], KEY1[1]) as key:
-            value, type = winreg.QueryValueEx(key, PATH1[2])
-
-        value = value.split(";")
-
-        for val in value:
-            if value == path:
-                return
-
-        value.append(path)
-        value = ";".join(value)
-
-        with winreg.OpenKey(KEY1[0], KEY1[1]) as key:
-            winreg.SetValueEx(key, PATH1[2], 0, TYPE1, value)
+        with self.session() as session:
+            session.add(path, system=False)
 
     def add_system_path(self, path: str) -> None:
         """Adds a path to the system-wide PATH environment variable."""
-
-        with winreg.OpenKey(KEY2[0], KEY2[1]) as key:
-            value, type = winreg.QueryValueEx(key, PATH2[2])
-
-        value = value.split(";")
-
-        for val in value:
-            if value == path:
-                return
-
-        value.append(path)
-        value = ";".join(value)
-
-        with winreg.OpenKey(KEY2[0], KEY2[1]) as key:
-            winreg.SetValueEx(key, PATH2[2], 0, TYPE2, value)
+        with self.session() as session:
+            session.add(path, system=True)
 
     def system_has_path(self, path: str) -> bool:
-        """Returns True if the system-wide PATH environment variable contains the specified path, False otherwise."""
+        """Returns True if the system-wide PATH environment variable contains the specified path (or an equivalent one), False otherwise."""
 
-        with winreg.OpenKey(KEY2[0], KEY2[1]) as key:
-            value, type = winreg.QueryValueEx(key, PATH2[2])
-
-        value = value.split(";")
-
-        for val in value:
-            if val == path:
-                return True
+        from pathlist import PathList
 
-        return False
+        return path in PathList.parse(self._read(system=True), system=True)
 
     def user_has_path(self, path: str) -> bool:
-        """Returns True if the user-specific PATH environment variable contains the specified path, False otherwise."""
-
-        with winreg.OpenKey(KEY1[0], KEY1[1]) as key:
-            value, type = winreg.QueryValueEx(key, PATH1[2])
+        """Returns True if the user-specific PATH environment variable contains the specified path (or an equivalent one), False otherwise."""
 
-        value = value.split(";")
+        from pathlist import PathList
 
-        for val in value:
-            if val == path:
-                return True
-
-        return False
+        return path in PathList.parse(self._read(system=False), system=False)
 
     def remove_user_path(self, path: str):
         """Removes a path from the user-specific PATH environment variable."""
-        with winreg.OpenKey(KEY1[0], KEY1[1]) as key:
-            value, type = winreg.QueryValueEx(key, PATH1[2])
-
-        value = value.split(";")
-
-        for val in value:
-            if val == path:
-                value.remove(val)
-
-        value = ";".join(value)
-
-        with winreg.OpenKey(KEY1[0], KEY1[1]) as key:
-            winreg.SetValueEx(key, PATH1[2], 0, TYPE1, value)
+        with self.session() as session:
+            session.remove(path, system=False)
 
     def remove_system_path(self, path: str):
         """Removes a path from the system-wide PATH environment variable."""
-        with winreg.OpenKey(KEY2[0], KEY2[1]) as key:
-            value, type = winreg.QueryValueEx(key, PATH2[2])
-
-        value = value.split(";")
-
-        for val in value:
-            if val == path:
-                value.remove(val)
-
-        value = ";".join(value)
-
-        with winreg.OpenKey(KEY2[0], KEY2[1]) as key:
-            winreg.SetValueEx(key, PATH2[2], 0, TYPE2, value)
+        with self.session() as session:
+            session.remove(path, system=True)
 
     def add_systemwide_path(self, path: str) -> None:
-        if self.system_has_path(path) == False:
-            self.add_system_path(path)
-        if self.user_has_path(path) == False:
-            self.add_user_path(path)
+        with self.session() as session:
+            session.add(path, system=True)
+            session.add(path, system=False)
 
     def remove_systemwide_path(self, path: str) -> None:
-        if self.system_has_path(path) == True:
-            self.remove_system_path(path)
-        if self.user_has_path(path) == True:
-            self.remove_user_path(path)
+        with self.session() as session:
+            session.remove(path, system=True)
+            session.remove(path, system=False)
 
-    def list_paths(self) -> list[str]:
+    def list_paths(self) -> "PathList":
         system = self.get_system_paths()
         user = self.get_user_paths()
         return system + user
+
+    def effective_paths(self, system: "list[str]" = None, user: "list[str]" = None) -> "list[EffectiveEntry]":
+        """Returns the PATH a new process gets, system entries first.
+
+        Unlike :meth:`list_paths`, entries carry their expanded form and
+        canonical key, both computed once with :meth:`expander`, and user
+        entries that repeat a system entry are marked (see
+        ``pathlist.effective``).
+
+        Parameters
+        ----------
+        system, user : list[str], optional
+            The raw entries of each scope, e.g. a session's working entries.
+            Default to the values in the registry.
+        """
+        from pathlist import PathList, effective
+
+        expander = self.expander()
+        if system is None:
+            system = self.get_system_paths().raw()
+        if user is None:
+            user = self.get_user_paths().raw()
+        return effective(PathList(system, True, expander), PathList(user, False, expander))
@@ -0,0 +1,177 @@
+"""Resolving command names the way Windows does.
+
+A command name without an extension is tried with each ``PATHEXT``
+extension, in ``PATHEXT`` order, in every PATH directory in turn (the
+expanded system entries first, then the user entries); the first file found
+wins. Probing every combination costs one stat per name, directory and
+extension, so :class:`ExecutableIndex` instead lists each directory once
+with ``os.scandir`` and answers lookups from memory.
+
+The current directory, which ``cmd.exe`` searches before PATH, is not
+searched.
+"""
+import ntpath
+import os
+import time
+from typing import Iterable, NamedTuple
+
+import tracing
+
+
+DEFAULT_PATHEXT = ".COM;.EXE;.BAT;.CMD;.VBS;.VBE;.JS;.JSE;.WSF;.WSH;.MSC"
+
+# The file names of each directory listed so far, with the directory's
+# modification time, reused while it is unchanged. A long-running process
+# (see server.py) sets this to a dict; None lists every directory afresh.
+listings: dict[str, tuple[float, list[str]]] | None = None
+
+
+def pathext(value: str = None) -> list[str]:
+    """Returns the executable extensions, lower-cased, in search order.
+
+    ``value`` defaults to the ``PATHEXT`` environment variable, or the
+    Windows default where it is not set.
+    """
+    if value is None:
+        value = os.environ.get("PATHEXT") or DEFAULT_PATHEXT
+    extensions = []
+    for ext in value.split(";"):
+        ext = ext.strip().lower()
+        if ext and ext not in extensions:
+            extensions.append(ext if ext.startswith(".") else "." + ext)
+    return extensions
+
+
+def candidates(name: str, extensions: list[str]) -> list[str]:
+    """Returns the file names tried for a command name, lower-cased, in order.
+
+    A name that already ends in one of ``extensions`` is only tried as
+    given; any other name is tried with each extension appended.
+    """
+    name = name.lower()
+    if ntpath.splitext(name)[1] in extensions:
+        return [name]
+    return [name + ext for ext in extensions]
+
+
+class Match(NamedTuple):
+    """A file a command name resolves to."""
+
+    name: str
+    path: str
+    position: int
+    entry: str
+
+
+class ExecutableIndex:
+    """Maps executable file names to the PATH entries that contain them.
+
+    Parameters
+    ----------
+    entries : Iterable[str]
+        PATH entries in search order, as stored in the registry.
+    expand : Callable[[str], str], optional
+        Expands ``%VAR%`` references in an entry, e.g.
+        ``PathManager().expander()``. Defaults to the process environment.
+    extensions : list[str], optional
+        Executable extensions, as returned by :func:`pathext`.
+
+    Each distinct directory is listed once, when the index is built. Only
+    files with one of ``extensions`` are indexed. Entries that are empty,
+    repeat an earlier directory or cannot be listed are skipped; the latter
+    are kept in :attr:`unreadable`. :attr:`positions` maps every given
+    entry to the position of its directory (None for empty entries) and
+    :attr:`elapsed` holds the seconds each listing took.
+    """
+
+    def __init__(self, entries: Iterable[str], expand=None, extensions: list[str] = None) -> None:
+        from canon import canonical_key
+        from expand import environment
+
+        if expand is None:
+            expand = environment()
+        self.extensions = extensions if extensions is not None else pathext()
+        self.entries: list[str] = []
+        self.directories: list[str] = []
+        self.files: dict[str, list[tuple[int, str]]] = {}
+        self.unreadable: list[str] = []
+        self.positions: list[int | None] = []
+        self.elapsed: list[float] = []
+
+        seen: dict[str, int] = {}
+        for entry in entries:
+            directory = expand(entry.strip().strip('"'))
+            key = canonical_key(directory, expand=lambda path: path)
+            if not key or key in seen:
+                self.positions.append(seen.get(key))
+                continue
+            position = seen[key] = len(self.directories)
+            self.positions.append(position)
+            self.entries.append(entry)
+            self.directories.append(directory)
+            if not self._scan(position, directory):
+                self.unreadable.append(entry)
+
+    def _scan(self, position: int, directory: str) -> bool:
+        start = time.perf_counter()
+        try:
+            for filename in self._list(directory, self.extensions):
+                if ntpath.splitext(filename.lower())[1] in self.extensions:
+                    self.files.setdefault(filename.lower(), []).append((position, filename))
+        except OSError:
+            return False
+        finally:
+            self.elapsed.append(time.perf_counter() - start)
+        return True
+
+    @staticmethod
+    def _list(directory: str, extensions: list[str]) -> list[str]:
+        """Returns the names of the files in a directory that may have one of ``extensions``.
+
+        With :data:`listings`, every file name is kept and reused while the
+        directory is unchanged.
+        """
+        mtime = None
+        if listings is not None:
+            with tracing.span("stat", tracing.FILESYSTEM, path=directory):
+                mtime = os.stat(directory).st_mtime
+            cached = listings.get(directory)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+        names = []
+        with tracing.span("scandir", tracing.FILESYSTEM, path=directory):
+            with os.scandir(directory) as listing:
+                for item in listing:
+                    if listings is None and ntpath.splitext(item.name.lower())[1] not in extensions:
+                        continue
+                    try:
+                        if item.is_file():
+                            names.append(item.name)
+                    except OSError:
+                        continue
+        if listings is not None:
+            listings[directory] = (mtime, names)
+        return names
+
+    def _match(self, name: str, position: int, filename: str) -> Match:
+        return Match(name, os.path.join(self.directories[position], filename), position, self.entries[position])
+
+    def find_all(self, name: str) -> list[Match]:
+        """Returns every file ``name`` could resolve to in search order; the first one wins."""
+        found = []
+        for rank, candidate in enumerate(candidates(name, self.extensions)):
+            for position, filename in self.files.get(candidate, ()):
+                found.append((position, rank, filename))
+        found.sort()
+        return [self._match(name, position, filename) for position, _, filename in found]
+
+    def find(self, name: str) -> "Match | None":
+        """Returns the file ``name`` resolves to, or None."""
+        best = None
+        for rank, candidate in enumerate(candidates(name, self.extensions)):
+            hits = self.files.get(candidate)
+            if hits and (best is None or hits[0][0] < best[0]):
+                best = (hits[0][0], rank, hits[0][1])
+        if best is None:
+            return None
+        return self._match(name, best[0], best[2])
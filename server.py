@@ -0,0 +1,344 @@
+"""A resident pathcleaner process that answers commands over a local socket.
+
+``path serve`` keeps the registry values of both scopes, the expanded
+environment and the directory listings behind ``which`` in memory, and runs
+the commands other ``path`` invocations forward to it. A forwarded command
+skips interpreter warm-up, module imports and registry reads, so it costs
+about one round-trip. Commands run one at a time, which also serializes
+every write made through the server.
+
+The server listens on a Unix domain socket, or on a named pipe on Windows,
+and records its address and a random authentication key in
+:data:`STATE_FILE` under ``data_dir()``. Each request carries the client's
+working directory and environment, and the command runs with both, so
+``PATHEXT``, ``%USERPROFILE%`` and ``PATHCLEANER_HOME`` mean what they mean
+to the client. :func:`forward` only tries to connect when that file exists,
+so without a server a command costs one extra ``stat``. Setting
+``PATHCLEANER_NO_SERVER`` disables forwarding.
+
+Registry values are re-read once they are :data:`DEFAULT_MAX_AGE` seconds
+old, so changes made by other programs show up within that time for the
+:data:`READ_ONLY` commands. Every other command starts from fresh values,
+so its read-modify-write never reverts a change made in the meantime.
+
+Any process of the same user can read the authentication key, so the
+server must not lend an elevated token to it: commands that may change the
+system PATH are never forwarded and the server refuses them. They run
+locally, with the caller's own token.
+"""
+import os
+import sys
+import time
+
+from datadir import SERVER_STATE_FILE as STATE_FILE, data_dir, server_running
+from parser import FORWARDED, parse_args
+
+
+DEFAULT_MAX_AGE = 1.0
+
+# commands that never write the registry, and may read values up to max_age old
+READ_ONLY = {"list", "get", "has", "which", "audit"}
+
+
+def state_file() -> str:
+    return os.path.join(data_dir(), STATE_FILE)
+
+
+def writes_system(command: str, flags: list[str]) -> bool:
+    """Returns True if a command may change the system PATH.
+
+    Only commands limited to the user scope with ``-u`` are safe to run
+    with another process's token.
+    """
+    if command in READ_ONLY:
+        return False
+    if "-u" not in flags and "--user" not in flags:
+        return True
+    # -s, --system, or -s combined with other short flags
+    return any(flag == "--system" or (flag[:1] == "-" and flag[1:2] != "-" and "s" in flag[1:]) for flag in flags)
+
+
+class _Handle:
+    """A registry key opened through :class:`CachedRegistry`."""
+
+    def __init__(self, handle, path: tuple) -> None:
+        self.handle = handle
+        self.path = path
+
+    def Close(self) -> None:
+        self.handle.Close()
+
+    def __enter__(self) -> "_Handle":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.Close()
+
+
+def _unwrap(key):
+    return key.handle if isinstance(key, _Handle) else key
+
+
+class CachedRegistry:
+    """Wraps a winreg-compatible object, answering value reads from memory.
+
+    ``QueryValueEx`` and ``EnumValue`` results, including "not found"
+    errors, are kept until they are ``max_age`` seconds old. Any write made
+    through the wrapper drops everything it has kept.
+    """
+
+    def __init__(self, reg, max_age: float = DEFAULT_MAX_AGE) -> None:
+        self._reg = reg
+        self.max_age = max_age
+        self._values: dict[tuple, object] = {}
+        self._loaded = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name):
+        return getattr(self._reg, name)
+
+    def invalidate(self) -> None:
+        self._values.clear()
+        self._loaded = time.monotonic()
+
+    def _cached(self, key: tuple, read):
+        if time.monotonic() - self._loaded > self.max_age:
+            self.invalidate()
+        if key not in self._values:
+            self.misses += 1
+            try:
+                self._values[key] = read()
+            except OSError as e:
+                self._values[key] = e
+        else:
+            self.hits += 1
+        value = self._values[key]
+        if isinstance(value, OSError):
+            raise value
+        return value
+
+    def OpenKey(self, key, sub_key, *args):
+        path = (*key.path, sub_key.lower()) if isinstance(key, _Handle) else (key, sub_key.lower())
+        return _Handle(self._reg.OpenKey(_unwrap(key), sub_key, *args), path)
+
+    def CreateKey(self, key, sub_key):
+        self.invalidate()
+        path = (*key.path, sub_key.lower()) if isinstance(key, _Handle) else (key, sub_key.lower())
+        return _Handle(self._reg.CreateKey(_unwrap(key), sub_key), path)
+
+    def CloseKey(self, key) -> None:
+        self._reg.CloseKey(_unwrap(key))
+
+    def QueryValueEx(self, key, name):
+        return self._cached((key.path, "value", name.lower()), lambda: self._reg.QueryValueEx(key.handle, name))
+
+    def EnumValue(self, key, index):
+        return self._cached((key.path, "enum", index), lambda: self._reg.EnumValue(key.handle, index))
+
+    def SetValueEx(self, key, name, reserved, type, value) -> None:
+        self.invalidate()
+        self._reg.SetValueEx(_unwrap(key), name, reserved, type, value)
+
+    def DeleteValue(self, key, name) -> None:
+        self.invalidate()
+        self._reg.DeleteValue(_unwrap(key), name)
+
+    def EnumKey(self, key, index):
+        return self._reg.EnumKey(_unwrap(key), index)
+
+    def QueryInfoKey(self, key):
+        return self._reg.QueryInfoKey(_unwrap(key))
+
+    def FlushKey(self, key):
+        return self._reg.FlushKey(_unwrap(key))
+
+
+class _Stream:
+    """A stdout/stderr replacement that sends each write to the client."""
+
+    def __init__(self, conn, name: str, binary=False) -> None:
+        self.conn = conn
+        self.name = name
+        if not binary:
+            self.buffer = _Stream(conn, name, binary=True)
+
+    def write(self, data) -> int:
+        if data:
+            self.conn.send((self.name, data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def isatty(self) -> bool:
+        return False
+
+
+def _address() -> tuple[str, str]:
+    """Returns the (family, address) the server listens on."""
+    if sys.platform == "win32":
+        user = os.environ.get("USERNAME", "user")
+        return "AF_PIPE", f"\\\\.\\pipe\\pathcleaner-{user}"
+    return "AF_UNIX", os.path.join(data_dir(), "server.sock")
+
+
+def _execute(conn, request: dict) -> None:
+    """Runs one forwarded command with its output sent back over ``conn``."""
+    import io
+    import traceback
+
+    import main
+    import registry
+
+    cwd = os.getcwd()
+    environ = dict(os.environ)
+    stdin, stdout, stderr = sys.stdin, sys.stdout, sys.stderr
+    sys.stdin = io.StringIO()
+    sys.stdout, sys.stderr = _Stream(conn, "stdout"), _Stream(conn, "stderr")
+    code = 0
+    try:
+        # relative paths, such as --output FILE, are the client's
+        os.chdir(request["cwd"])
+        main.CALLING_DIRECTORY = request["cwd"]
+        os.environ.clear()
+        os.environ.update(request["environ"])
+        option, args, flags = main.parse_args(request["argv"])
+        if writes_system(option, flags):
+            print("pathcleaner: the server does not change the system PATH; run the command without it", file=sys.stderr)
+            raise SystemExit(1)
+        if option not in READ_ONLY and isinstance(registry.winreg, CachedRegistry):
+            registry.winreg.invalidate()
+        main.run(option, args, flags)
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if not isinstance(e.code, (int, type(None))):
+            print(e.code, file=sys.stderr)
+    except Exception:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdin, sys.stdout, sys.stderr = stdin, stdout, stderr
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(environ)
+    conn.send(("exit", code))
+
+
+def serve(max_age: float = DEFAULT_MAX_AGE) -> None:
+    """Answers forwarded commands until a client asks the server to stop."""
+    import json
+    import secrets
+    from multiprocessing.connection import Listener
+
+    import registry
+    import resolve
+
+    registry.winreg = CachedRegistry(registry.winreg, max_age)
+    resolve.listings = {}
+    family, address = _address()
+    if family == "AF_UNIX" and os.path.exists(address):
+        os.unlink(address)
+    os.makedirs(os.path.dirname(state_file()), exist_ok=True)
+    authkey = secrets.token_bytes(32)
+    with Listener(address, family, authkey=authkey) as listener:
+        temp = f"{state_file()}.{os.getpid()}.tmp"
+        with open(os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+            json.dump({"family": family, "address": address, "authkey": authkey.hex(), "pid": os.getpid()}, f)
+        os.replace(temp, state_file())
+        print(f"[SERVING] {address} (pid {os.getpid()})", flush=True)
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except OSError:
+                    # a client that failed authentication or went away
+                    continue
+                with conn:
+                    try:
+                        request = conn.recv()
+                        if request.get("stop"):
+                            conn.send(("exit", 0))
+                            break
+                        _execute(conn, request)
+                    except (EOFError, OSError):
+                        pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            try:
+                os.unlink(state_file())
+            except OSError:
+                pass
+    print("[STOPPED]")
+
+
+def _connect():
+    """Returns a connection to the running server, or None if there is none."""
+    import json
+
+    try:
+        with open(state_file(), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    from multiprocessing.connection import Client
+
+    try:
+        return Client(state["address"], state["family"], authkey=bytes.fromhex(state["authkey"]))
+    except (OSError, KeyError, ValueError, EOFError):
+        return None
+
+
+def forward(argv: list[str], parsed: tuple[str, list, list] = None) -> int | None:
+    """Runs a command on the server, if one is running and takes it.
+
+    ``parsed`` is ``parse_args(argv)``, when the caller already has it.
+    Returns the command's exit status, or None if it has to run locally.
+    """
+    if not server_running():
+        return None
+    command, args, flags = parsed if parsed is not None else parse_args(argv)
+    if (
+        command not in FORWARDED
+        # stdin stays with the client
+        or "-" in args
+        or (command == "which" and not args)
+        or any(flag == "--stats" or flag.startswith("--trace=") for flag in flags)
+        or writes_system(command, flags)
+    ):
+        return None
+    conn = _connect()
+    if conn is None:
+        return None
+    with conn:
+        try:
+            conn.send({"argv": argv, "cwd": os.getcwd(), "environ": dict(os.environ)})
+            while True:
+                kind, data = conn.recv()
+                if kind == "exit":
+                    return data
+                stream = sys.stdout if kind == "stdout" else sys.stderr
+                if isinstance(data, bytes):
+                    stream.flush()
+                    stream.buffer.write(data)
+                else:
+                    stream.write(data)
+                    stream.flush()
+        except (EOFError, OSError):
+            print("pathcleaner: lost the connection to the server", file=sys.stderr)
+            return 1
+
+
+def stop() -> bool:
+    """Asks the running server to stop. Returns False if none is running."""
+    conn = _connect()
+    if conn is None:
+        return False
+    with conn:
+        try:
+            conn.send({"stop": True})
+            conn.recv()
+        except (EOFError, OSError):
+            pass
+    return True
@@ -0,0 +1,152 @@
+"""Classifying what each PATH directory holds.
+
+``audit`` only asks whether an entry exists, but an entry that exists can
+still be dead weight: the empty leftover of an uninstalled tool, a
+directory the user may not list, or a junction whose target is gone. Every
+process that searches PATH still pays a lookup in each of them.
+:func:`survey` lists every entry with ``os.scandir`` on the
+``checker.PathChecker`` thread pool, so a hung network share costs one
+deadline like it does for ``audit``, and classifies it:
+
+* :data:`MISSING`, :data:`NOT_A_DIRECTORY` and :data:`BROKEN_LINK`
+  entries can never be searched;
+* :data:`ACCESS_DENIED` entries cannot be listed by this user, but may be
+  by others;
+* :data:`EMPTY` entries hold nothing at all;
+* :data:`NO_EXECUTABLES` entries hold no file with a ``PATHEXT``
+  extension, so no command resolves to them. They may still hold DLLs a
+  program loads through PATH, so they are reported but never pruned.
+
+:data:`PRUNABLE` are the classes ``clean --deep`` removes.
+"""
+import ntpath
+import os
+import time
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+import tracing
+from checker import DEFAULT_WORKERS, TIMEOUT, PathChecker
+
+
+VALID = "VALID"
+MISSING = "MISSING"
+NOT_A_DIRECTORY = "NOT A DIRECTORY"
+ACCESS_DENIED = "ACCESS DENIED"
+BROKEN_LINK = "BROKEN LINK"
+EMPTY = "EMPTY"
+NO_EXECUTABLES = "NO EXECUTABLES"
+
+PRUNABLE = {MISSING, NOT_A_DIRECTORY, BROKEN_LINK, EMPTY}
+
+# Listing a large directory takes longer than an existence probe.
+DEFAULT_TIMEOUT = 10.0
+
+# ERROR_CANT_ACCESS_FILE, ERROR_CANT_RESOLVE_FILENAME, ERROR_NOT_A_REPARSE_POINT
+_LINK_ERRORS = {1920, 1921, 4390}
+
+
+class DirectoryReport(NamedTuple):
+    """What one PATH entry holds.
+
+    ``executables`` and ``files`` are 0 unless the entry could be listed;
+    ``elapsed`` is the time the listing took, in seconds.
+    """
+
+    path: str
+    status: str
+    executables: int
+    files: int
+    elapsed: float
+
+
+def classify(path: str, extensions: Iterable[str]) -> DirectoryReport:
+    """Lists an expanded PATH entry and returns what it holds.
+
+    Parameters
+    ----------
+    path : str
+        The entry, unquoted, with its variable references expanded.
+    extensions : Iterable[str]
+        The executable extensions, lower-cased (see ``resolve.pathext``).
+    """
+    extensions = set(extensions)
+    start = time.perf_counter()
+    executables = files = 0
+    try:
+        if not path:
+            raise FileNotFoundError(path)
+        with tracing.span("scandir", tracing.FILESYSTEM, path=path):
+            with os.scandir(path) as listing:
+                for item in listing:
+                    files += 1
+                    if ntpath.splitext(item.name)[1].lower() not in extensions:
+                        continue
+                    try:
+                        if item.is_file():
+                            executables += 1
+                    except OSError:
+                        continue
+        status = VALID if executables else (NO_EXECUTABLES if files else EMPTY)
+    except NotADirectoryError:
+        status = NOT_A_DIRECTORY
+    except PermissionError:
+        status = ACCESS_DENIED
+    except OSError as e:
+        # a link or junction that exists itself but not its target
+        if getattr(e, "winerror", None) in _LINK_ERRORS or (path and os.path.lexists(path)):
+            status = BROKEN_LINK
+        else:
+            status = MISSING
+    return DirectoryReport(path, status, executables, files, time.perf_counter() - start)
+
+
+def survey(
+    paths: Iterable[str],
+    expand: Callable[[str], str],
+    extensions: Iterable[str],
+    workers: int = DEFAULT_WORKERS,
+    timeout: float = DEFAULT_TIMEOUT,
+    ordered=True,
+) -> Iterator[DirectoryReport]:
+    """Classifies PATH entries concurrently, yielding reports as they are known.
+
+    Parameters
+    ----------
+    paths : Iterable[str]
+        The raw entries.
+    expand : Callable[[str], str]
+        Expands variable references, e.g. an ``expand.Expander``.
+    extensions : Iterable[str]
+        The executable extensions, lower-cased.
+    workers : int, optional
+        Maximum number of listings in flight at once.
+    timeout : float, optional
+        Seconds each listing may run before it is reported as ``TIMEOUT``.
+    ordered : bool, optional
+        Whether to yield the reports in input order, each as soon as it and
+        every report before it are known, or in the order they finish.
+
+    Returns
+    -------
+    Iterator[DirectoryReport]
+        One report per entry. The ``path`` of each is the raw entry, and an
+        entry whose listing missed its deadline has a ``checker.TIMEOUT``
+        status.
+    """
+    paths = list(paths)
+    extensions = set(extensions)
+    expanded = {path: expand(path.strip().strip('"')) for path in set(paths)}
+    reports: dict[str, DirectoryReport] = {}
+
+    def probe(path: str) -> bool:
+        reports[path] = classify(expanded[path], extensions)._replace(path=path)
+        return True
+
+    checker = PathChecker(probe, workers, timeout)
+    results = checker.iter_check(paths) if ordered else (result for _, result in checker.iter_completed(paths))
+    for result in results:
+        report = reports.get(result.path)
+        if result.status == TIMEOUT or report is None:
+            yield DirectoryReport(result.path, TIMEOUT, 0, 0, result.elapsed)
+        else:
+            yield report
@@ -0,0 +1,198 @@
+"""Declarative desired state for PATH.
+
+A manifest describes each scope as a TOML table::
+
+    [system]
+    pinned = ["%SystemRoot%\\\\system32", "%SystemRoot%"]
+    entries = ["C:\\\\Program Files\\\\Git\\\\cmd"]
+    allow_extra = true
+    remove = ["*\\\\Temp\\\\*", "C:\\\\OldTool*"]
+
+    [user]
+    entries = ["%USERPROFILE%\\\\bin"]
+
+``pinned`` entries come first, in the given order. ``entries`` follow in the
+given relative order. With ``allow_extra`` (the default), entries the
+manifest does not mention are kept where they are, unless they match a
+``remove`` glob; without it, the scope is exactly ``pinned + entries``.
+Entries are compared by canonical key, so ``C:\\Tools`` matches
+``c:/tools/``.
+
+:func:`plan` computes the desired value with as few moves as possible: the
+managed entries that are already in the right relative order stay put, and
+only the others are moved or inserted.
+"""
+import fnmatch
+from typing import Callable, NamedTuple
+
+
+SCOPES = {"system": True, "user": False}
+
+
+class ScopeRule(NamedTuple):
+    """The desired state of one scope."""
+
+    pinned: list[str]
+    entries: list[str]
+    allow_extra: bool
+    remove: list[str]
+
+
+class ScopePlan(NamedTuple):
+    """The changes that bring one scope to its desired state."""
+
+    system: bool
+    before: list[str]
+    after: list[str]
+    added: list[str]
+    removed: list[str]
+    moved: list[str]
+
+    @property
+    def changed(self) -> bool:
+        return self.before != self.after
+
+
+def _strings(table: dict, name: str, scope: str) -> list[str]:
+    value = table.get(name, [])
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"[{scope}] {name} must be a list of strings")
+    return value
+
+
+def parse_manifest(data: dict) -> dict[bool, ScopeRule]:
+    """Validates a parsed manifest and returns its rules by scope (True is system)."""
+    unknown = set(data) - set(SCOPES)
+    if unknown:
+        raise ValueError(f"unknown table(s): {', '.join(sorted(unknown))}")
+    rules = {}
+    for scope, system in SCOPES.items():
+        if scope not in data:
+            continue
+        table = data[scope]
+        extra = set(table) - {"pinned", "entries", "allow_extra", "remove"}
+        if extra:
+            raise ValueError(f"[{scope}] unknown key(s): {', '.join(sorted(extra))}")
+        allow_extra = table.get("allow_extra", True)
+        if not isinstance(allow_extra, bool):
+            raise ValueError(f"[{scope}] allow_extra must be true or false")
+        rules[system] = ScopeRule(
+            _strings(table, "pinned", scope),
+            _strings(table, "entries", scope),
+            allow_extra,
+            _strings(table, "remove", scope),
+        )
+    return rules
+
+
+def load_manifest(filename: str) -> dict[bool, ScopeRule]:
+    """Reads a TOML manifest. Raises ValueError if it is malformed."""
+    try:
+        import tomllib
+    except ImportError:
+        # Python < 3.11
+        import tomli as tomllib
+
+    with open(filename, "rb") as f:
+        try:
+            data = tomllib.load(f)
+        except tomllib.TOMLDecodeError as e:
+            raise ValueError(str(e)) from None
+    return parse_manifest(data)
+
+
+def _lcs(a: list[str], b: list[str]) -> set[str]:
+    """Returns the keys of a longest common subsequence of two lists of unique keys."""
+    # The keys are unique, so this is a longest increasing subsequence of
+    # the positions in ``b`` of the items of ``a``; O(n log n).
+    import bisect
+
+    where = {key: i for i, key in enumerate(b)}
+    positions = [where[key] for key in a if key in where]
+    tails: list[int] = []
+    tail_index: list[int] = []
+    parent = [-1] * len(positions)
+    for i, position in enumerate(positions):
+        j = bisect.bisect_left(tails, position)
+        if j == len(tails):
+            tails.append(position)
+            tail_index.append(i)
+        else:
+            tails[j] = position
+            tail_index[j] = i
+        parent[i] = tail_index[j - 1] if j else -1
+    keep = set()
+    i = tail_index[-1] if tail_index else -1
+    while i >= 0:
+        keep.add(b[positions[i]])
+        i = parent[i]
+    return keep
+
+
+def plan(system: bool, current: list[str], rule: ScopeRule, key: Callable[[str], str], expand: Callable[[str], str]) -> ScopePlan:
+    """Computes the desired entries of a scope and how they differ from ``current``.
+
+    ``key`` returns an entry's canonical key and ``expand`` its expanded
+    form, which ``remove`` globs are also matched against. Entries that are
+    already present keep their current spelling.
+    """
+    patterns = [pattern.lower() for pattern in rule.remove]
+
+    def unwanted(entry: str) -> bool:
+        return any(fnmatch.fnmatchcase(entry.lower(), p) or fnmatch.fnmatchcase(expand(entry).lower(), p) for p in patterns)
+
+    pinned = {}
+    for entry in rule.pinned:
+        pinned.setdefault(key(entry), entry)
+    managed = {}
+    for entry in rule.entries:
+        k = key(entry)
+        if k not in pinned:
+            managed.setdefault(k, entry)
+
+    # what is left of the current value once pinned, unwanted, repeated and
+    # (without allow_extra) unmanaged entries are dropped
+    kept = []
+    seen = set(pinned)
+    for entry in current:
+        k = key(entry)
+        if not k or k in seen or (k not in managed and (not rule.allow_extra or unwanted(entry))):
+            continue
+        seen.add(k)
+        kept.append((k, entry))
+
+    # managed entries already in the right relative order stay where they
+    # are; every other one goes right after its predecessor in the manifest
+    stay = _lcs([k for k, _ in kept if k in managed], list(managed))
+    keys = [k for k, _ in kept if k not in managed or k in stay]
+    # an entry already present keeps its spelling, so a value that only
+    # differs from the manifest in case or separators is left alone
+    spelled = dict(kept)
+    previous = None
+    for k in managed:
+        if k not in stay:
+            if previous is not None:
+                at = keys.index(previous) + 1
+            else:
+                at = next((i for i, other in enumerate(keys) if other in stay), len(keys))
+            keys.insert(at, k)
+            spelled.setdefault(k, managed[k])
+        previous = k
+
+    first = {}
+    present = {}
+    for i, entry in enumerate(current):
+        first.setdefault(key(entry), i)
+        present.setdefault(key(entry), entry)
+    desired = [present.get(k, entry) for k, entry in pinned.items()] + [spelled[k] for k in keys]
+    wanted = set(pinned) | set(keys)
+    moved = [entry for i, (k, entry) in enumerate(pinned.items()) if k in first and first[k] != i]
+    moved += [managed[k] for k in managed if k in first and k not in stay]
+    return ScopePlan(
+        system,
+        list(current),
+        desired,
+        [entry for entry in desired if key(entry) not in first],
+        [entry for i, entry in enumerate(current) if key(entry) not in wanted or first[key(entry)] != i],
+        moved,
+    )
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# the modules live at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakereg
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """Keeps the caches and journal of every test in its own directory."""
+    monkeypatch.setenv("PATHCLEANER_HOME", str(tmp_path / "data"))
+    monkeypatch.setenv("PATHCLEANER_NO_SERVER", "1")
+    return tmp_path / "data"
+
+
+@pytest.fixture
+def reg():
+    """A fresh in-memory registry holding both PATH values."""
+    return fakereg.seeded(system_path="C:\\Windows;C:\\Windows\\system32", user_path="C:\\a;C:\\b")
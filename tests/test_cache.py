@@ -0,0 +1,107 @@
+import os
+import time
+
+import fakereg
+import main
+import registry
+from cache import AuditRecord, AuditState, CacheEntry, StatCache
+
+
+def test_reexpanded_entries_are_not_reused(tmp_path):
+    state = AuditState(str(tmp_path / "audit.json"))
+    state.update(False, "%TOOLS%;C:\\a", {
+        "%TOOLS%": AuditRecord("VALID", "C:\\tools", time.time()),
+        "C:\\a": AuditRecord("BROKEN", "C:\\a", time.time()),
+    })
+
+    assert state.get(False, "%TOOLS%", expand=lambda raw: "C:\\tools").status == "VALID"
+    assert state.get(False, "%TOOLS%", expand=lambda raw: "D:\\tools") is None
+    assert state.get(False, "%TOOLS%") is None
+    assert state.get(False, "C:\\a").status == "BROKEN"
+
+
+def test_audit_probes_entries_whose_variables_changed(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(registry, "winreg", fakereg.seeded("", "%TOOLS%"))
+    monkeypatch.setenv("TOOLS", str(tmp_path))
+    main.run(*main.parse_args(["audit", "-u"]))
+    assert "[VALID" in capsys.readouterr().out.replace("\033[32m", "")
+
+    monkeypatch.setenv("TOOLS", str(tmp_path / "missing"))
+    main.run(*main.parse_args(["audit", "-u"]))
+
+    assert "BROKEN" in capsys.readouterr().out
+
+
+def test_probes_are_reused_until_the_ttl_passes(tmp_path):
+    cache = StatCache(str(tmp_path / "stat.json"), ttl=60)
+    path = str(tmp_path)
+
+    assert cache.exists(path) and cache.exists(path)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.entries[path] = cache.entries[path]._replace(checked=time.time() - 61)
+    assert cache.exists(path)
+    assert cache.misses == 2
+
+
+def test_a_change_in_the_parent_makes_an_entry_stale(tmp_path):
+    cache = StatCache(str(tmp_path / "stat.json"))
+    path = str(tmp_path / "tool")
+
+    assert not cache.exists(path)
+    os.mkdir(path)
+    # a new run stats the parent again
+    cache._parents.clear()
+    os.utime(tmp_path, (time.time() + 10, time.time() + 10))
+
+    assert cache.exists(path)
+    assert cache.misses == 2
+
+
+def test_the_least_recently_used_entries_are_evicted(tmp_path):
+    cache = StatCache(str(tmp_path / "stat.json"), max_entries=2)
+    a, b, c = (str(tmp_path / name) for name in "abc")
+    cache.stat(a)
+    cache.stat(b)
+    cache.stat(a)
+    cache.stat(c)
+
+    assert list(cache.entries) == [a, c]
+
+
+def test_the_cache_survives_a_save_and_load(tmp_path):
+    filename = str(tmp_path / "stat.json")
+    cache = StatCache(filename)
+    cache.stat(str(tmp_path))
+    assert cache.save()
+
+    loaded = StatCache.load(filename, max_entries=1)
+
+    assert loaded.entries == cache.entries
+    assert isinstance(loaded.entries[str(tmp_path)], CacheEntry)
+
+
+def test_a_missing_or_corrupt_file_gives_an_empty_cache(tmp_path):
+    corrupt = tmp_path / "corrupt.json"
+    corrupt.write_text('[["C:\\\\a", true')
+    wrong = tmp_path / "wrong.json"
+    wrong.write_text('{"C:\\\\a": 1}')
+
+    for filename in (tmp_path / "missing.json", corrupt, wrong):
+        assert not StatCache.load(str(filename)).entries
+        assert not AuditState.load(str(filename)).results
+
+
+def test_audit_results_expire_and_persist(tmp_path):
+    filename = str(tmp_path / "audit.json")
+    state = AuditState(filename, ttl=60)
+    state.update(True, "C:\\a", {"C:\\a": AuditRecord("VALID", "C:\\a", time.time() - 61)})
+    state.update(False, "C:\\b", {"C:\\b": AuditRecord("BROKEN", "C:\\b", time.time())})
+    assert state.save()
+
+    loaded = AuditState.load(filename, ttl=60)
+
+    assert loaded.get(True, "C:\\a") is None
+    assert loaded.get(False, "C:\\b").status == "BROKEN"
+    assert loaded.unchanged(False, "C:\\b") and not loaded.unchanged(False, "C:\\b;C:\\c")
+    assert loaded.get(False, "C:\\b", variable="PSModulePath") is None
@@ -0,0 +1,69 @@
+import fakereg
+import main
+import registry
+from canon import canonical_key
+from compact import DEFAULT_LIMIT, compact, variable_names
+from expand import Expander
+from registry import PathManager
+
+
+EXPANDER = Expander({"ProgramFiles": "C:\\Program Files", "SystemRoot": "C:\\Windows"})
+NAMES = ["ProgramFiles", "SystemRoot"]
+
+
+def test_prefixes_become_references_when_shorter():
+    # %SystemRoot% is longer than C:\Windows, so that entry stays
+    result = compact(["C:\\Program Files\\Git\\cmd", "C:\\Windows\\system32", "D:\\Tools"], EXPANDER, NAMES)
+
+    assert result.entries == ["%ProgramFiles%\\Git\\cmd", "C:\\Windows\\system32", "D:\\Tools"]
+    assert result.rewritten == [("C:\\Program Files\\Git\\cmd", "%ProgramFiles%\\Git\\cmd")]
+    assert result.saved == len("C:\\Program Files") - len("%ProgramFiles%")
+
+
+def test_trailing_separators_go_except_a_drive_root():
+    result = compact(["D:\\Tools\\", "D:\\", "E:/bin//"], EXPANDER, NAMES)
+
+    assert result.entries == ["D:\\Tools", "D:\\", "E:/bin"]
+
+
+def test_empty_repeated_and_shadowed_entries_are_dropped():
+    shadowed = [canonical_key("C:\\Shared", EXPANDER)]
+
+    result = compact(["D:\\a", "", "d:\\A\\", "c:/shared"], EXPANDER, NAMES, shadowed)
+
+    assert result.entries == ["D:\\a"]
+    assert result.dropped == [("", "empty"), ("d:\\A\\", "duplicate"), ("c:/shared", "also in the system PATH")]
+
+
+def test_rewrites_that_change_the_directory_are_rejected():
+    result = compact(["D:\\Long Directory Name"], EXPANDER, NAMES, short_names=True, shorten=lambda path: "D:\\LONGDI~2")
+
+    assert result.entries == ["D:\\Long Directory Name"]
+    assert result.rewritten == []
+
+
+def test_user_variables_are_only_offered_to_the_user_scope():
+    reg = fakereg.seeded("C:\\Windows", "C:\\a")
+    reg.set_value(fakereg.HKEY_CURRENT_USER, fakereg.USER_ENVIRONMENT, "TOOLS", "C:\\Tools")
+    manager = PathManager(reg, journal=False)
+
+    system, user = variable_names(manager, True), variable_names(manager, False)
+
+    assert "TOOLS" in user and "USERPROFILE" in user
+    assert "TOOLS" not in system and "USERPROFILE" not in system
+    assert "ProgramFiles" in system
+    assert not any(name.upper() == "PATH" for name in system + user)
+
+
+def test_add_past_the_limit_reports_what_it_drops(monkeypatch, capsys):
+    user = ";".join(f"C:\\Program Files\\tool{i:03}" for i in range(DEFAULT_LIMIT // 20)) + ";C:\\Shared"
+    reg = fakereg.seeded("C:\\Shared", user)
+    monkeypatch.setattr(registry, "winreg", reg)
+    monkeypatch.setenv("ProgramFiles", "C:\\Program Files")
+
+    main.run(*main.parse_args(["add", "-u", "C:\\New"]))
+
+    out = capsys.readouterr().out
+    assert "[DROPPED]" in out and "C:\\Shared (also in the system PATH)" in out
+    assert "[REWRITTEN]" in out and "%ProgramFiles%\\tool000" in out
+    assert "[COMPACTED]" in out
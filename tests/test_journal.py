@@ -0,0 +1,61 @@
+from journal import Journal
+from registry import PathManager
+
+
+def test_undo_only_counts_the_selected_scope(tmp_path):
+    journal = Journal(str(tmp_path))
+    journal.record(False, ["C:\\a"], ["C:\\a", "C:\\b"])
+    journal.record(True, ["C:\\s"], ["C:\\s", "C:\\t"])
+
+    assert journal.undo(1, scopes=[False]) == {False: (["C:\\a"], 1)}
+    assert journal.undo(1, scopes=[True]) == {True: (["C:\\s"], 1)}
+    assert journal.undo(2) == {False: (["C:\\a"], 1), True: (["C:\\s"], 1)}
+
+
+def test_undo_steps_past_earlier_undos(tmp_path):
+    journal = Journal(str(tmp_path))
+    journal.record(False, ["C:\\a"], ["C:\\a", "C:\\b"])
+    journal.record(False, ["C:\\a", "C:\\b"], ["C:\\a", "C:\\b", "C:\\c"])
+    # what undo writes: the value before the last change, marked as an undo
+    journal.record(False, ["C:\\a", "C:\\b", "C:\\c"], ["C:\\a", "C:\\b"], undone=1)
+
+    assert journal.undo(1) == {False: (["C:\\a"], 1)}
+    journal.record(False, ["C:\\a", "C:\\b"], ["C:\\a"], undone=1)
+    assert journal.undo(1) == {}
+
+
+def test_repeated_undo_walks_back(reg, tmp_path):
+    import main
+
+    journal = Journal(str(tmp_path / "journal"))
+    manager = PathManager(reg, journal)
+    for path in ("C:\\c", "C:\\d"):
+        with manager.session() as session:
+            session.add(path, system=False)
+
+    for expected in ("C:\\a;C:\\b;C:\\c", "C:\\a;C:\\b"):
+        found = journal.undo(1, [False])
+        main._restore(
+            manager, {s: paths for s, (paths, _) in found.items()}, ["-u"], {s: n for s, (_, n) in found.items()}
+        )
+        assert manager.user_path() == expected
+    assert journal.undo(1, [False]) == {}
+    assert [change.undone for change in journal.history()] == [0, 0, 1, 1]
+
+
+
+def test_undo_does_not_step_into_compacted_days(tmp_path):
+    journal = Journal(str(tmp_path), segment_records=2, keep_segments=1)
+    day = 86400.0
+    journal.record(False, ["C:\\a"], ["C:\\a", "C:\\b"], t=day)
+    journal.record(False, ["C:\\a", "C:\\b"], ["C:\\a"], t=day + 1, undone=1)
+    journal.record(False, ["C:\\a"], ["C:\\a", "C:\\c"], t=2 * day)
+    journal.record(False, ["C:\\a", "C:\\c"], ["C:\\a", "C:\\c", "C:\\d"], t=3 * day)
+    journal.record(False, ["C:\\a", "C:\\c", "C:\\d"], ["C:\\e"], t=10 * day)
+    journal.compact()
+
+    history = journal.history()
+    assert any(change.compacted for change in history)
+    assert history[-1].after == ["C:\\e"] and not history[-1].compacted
+    # only the change after the compacted days can be undone
+    assert journal.undo(5) == {False: (["C:\\a", "C:\\c", "C:\\d"], 1)}
@@ -0,0 +1,43 @@
+import fakereg
+import main
+import optimize
+import pytest
+import registry
+from resolve import ExecutableIndex
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    paths = []
+    for name in ("slow", "fast"):
+        directory = tmp_path / name
+        directory.mkdir()
+        (directory / f"{name}.exe").write_text("")
+        paths.append(str(directory))
+    return paths
+
+
+def test_listing_time_is_the_default_cost(dirs):
+    index = ExecutableIndex(dirs, lambda path: path, [".exe"])
+    index.elapsed = [0.5, 0.001]
+
+    plan = optimize.optimize([], dirs, [False], index=index)
+
+    assert plan.user == dirs[::-1]
+    assert plan.latency == {dirs[0]: 0.5, dirs[1]: 0.001}
+
+
+def test_refused_order_leaves_path_alone(dirs, monkeypatch, capsys):
+    def refuse(*args, **kwargs):
+        raise ValueError("the proposed order changes which file a command runs")
+
+    reg = fakereg.seeded("", ";".join(dirs))
+    monkeypatch.setattr(registry, "winreg", reg)
+    monkeypatch.setattr(optimize, "optimize", refuse)
+
+    with pytest.raises(SystemExit) as exit:
+        main.run(*main.parse_args(["optimize", "-u"]))
+
+    assert exit.value.code == 1
+    assert "REFUSED" in capsys.readouterr().err
+    assert reg.get_value(fakereg.HKEY_CURRENT_USER, fakereg.USER_ENVIRONMENT, "Path") == ";".join(dirs)
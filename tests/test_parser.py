@@ -0,0 +1,14 @@
+import pytest
+from parser import parse_args
+
+
+@pytest.mark.parametrize("argv, expected", [
+    (["list", "--format", "ndjson"], ("list", [], ["--format=ndjson"])),
+    (["list", "--form", "ndjson"], ("list", [], ["--format=ndjson"])),
+    (["list", "--form=csv"], ("list", [], ["--format=csv"])),
+    (["audit", "--max-b", "3", "--sys"], ("audit", [], ["--max-broken=3", "--system"])),
+    (["--trace", "t.json", "list", "-u"], ("list", [], ["--trace=t.json", "-u"])),
+    (["add", "-u", "C:\\bin", "--var", "PSModulePath"], ("add", ["C:\\bin"], ["-u", "--var=PSModulePath"])),
+])
+def test_parse_args(argv, expected):
+    assert parse_args(argv) == expected
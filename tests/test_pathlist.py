@@ -0,0 +1,40 @@
+import fakereg
+from pathlist import PathList, effective
+from registry import PathManager
+
+
+def expand(path):
+    return path.replace("%SystemRoot%", "C:\\Windows")
+
+
+def marks(merged):
+    return [(e.entry.raw, e.entry.system, e.index, e.shadowed_by and e.shadowed_by.raw) for e in merged]
+
+
+def test_user_entries_repeating_a_system_entry_are_shadowed():
+    system = PathList(["C:\\Windows", "C:\\Windows\\system32", "C:\\windows\\"], True, expand)
+    user = PathList(['"C:\\WINDOWS\\System32"', "%SystemRoot%", "C:\\a", "", "C:\\a"], False, expand)
+
+    assert marks(effective(system, user)) == [
+        ("C:\\Windows", True, 0, None),
+        ("C:\\Windows\\system32", True, 1, None),
+        ("C:\\windows\\", True, 2, None),
+        ('"C:\\WINDOWS\\System32"', False, 0, "C:\\Windows\\system32"),
+        ("%SystemRoot%", False, 1, "C:\\Windows"),
+        ("C:\\a", False, 2, None),
+        ("", False, 3, None),
+        ("C:\\a", False, 4, None),
+    ]
+
+
+def test_effective_paths_reads_both_scopes_with_the_registry_variables():
+    reg = fakereg.seeded(system_path="%Tools%;C:\\Windows", user_path="C:\\Tools\\;C:\\b")
+    reg.set_value(fakereg.HKEY_LOCAL_MACHINE, fakereg.SYSTEM_ENVIRONMENT, "Tools", "C:\\Tools")
+    manager = PathManager(reg, journal=False, environ={})
+
+    merged = manager.effective_paths()
+    assert [e.entry.raw for e in merged] == ["%Tools%", "C:\\Windows", "C:\\Tools\\", "C:\\b"]
+    assert [e.shadowed_by and e.shadowed_by.raw for e in merged] == [None, None, "%Tools%", None]
+
+    merged = manager.effective_paths(user=["C:\\Windows", "C:\\c"])
+    assert [e.shadowed_by and e.shadowed_by.raw for e in merged[2:]] == ["C:\\Windows", None]
@@ -0,0 +1,68 @@
+import json
+
+import profiles
+
+
+def write_hive(tmp_path, name, path, home=None):
+    values = {"Path": [path, 2]}
+    if home is not None:
+        values[profiles.FAKE_HIVE_HOME] = home
+    hive = tmp_path / f"{name}.json"
+    hive.write_text(json.dumps(values), encoding="utf-8")
+    return hive
+
+
+def test_fake_hive_declares_its_home(tmp_path):
+    write_hive(tmp_path, "alice", "C:\\a", home="C:\\Users\\alice")
+
+    [profile] = profiles.offline_profiles(str(tmp_path))
+
+    assert profile.home == "C:\\Users\\alice"
+    environ = profiles.profile_environ(profile)
+    assert environ["USERPROFILE"] == "C:\\Users\\alice"
+    assert environ["APPDATA"] == "C:\\Users\\alice\\AppData\\Roaming"
+
+
+def test_profile_variables_of_the_caller_are_not_used(tmp_path, monkeypatch):
+    monkeypatch.setenv("USERPROFILE", str(tmp_path))
+    write_hive(tmp_path, "bob", "C:\\a")
+
+    [profile] = profiles.offline_profiles(str(tmp_path))
+
+    assert profile.home is None
+    assert "USERPROFILE" not in profiles.profile_environ(profile)
+
+
+def test_clean_keeps_unresolved_entries(tmp_path, monkeypatch):
+    monkeypatch.setenv("USERPROFILE", str(tmp_path))
+    missing = str(tmp_path / "missing")
+    hive = write_hive(tmp_path, "bob", f"%USERPROFILE%\\bin;%APPDATA%\\tools;{missing}")
+    [profile] = profiles.offline_profiles(str(tmp_path))
+
+    result = profiles.run_profile(profile, "clean", use_cache=False)
+
+    assert result.error is None
+    assert result.unknown == ["%USERPROFILE%\\bin", "%APPDATA%\\tools"]
+    assert result.removed == [missing]
+    assert json.loads(hive.read_text(encoding="utf-8"))["Path"][0] == "%USERPROFILE%\\bin;%APPDATA%\\tools"
+
+
+def test_writing_back_keeps_the_home(tmp_path):
+    hive = write_hive(tmp_path, "alice", "C:\\a", home="C:\\Users\\alice")
+    [profile] = profiles.offline_profiles(str(tmp_path))
+
+    result = profiles.run_profile(profile, "add", ["C:\\b"], use_cache=False)
+
+    assert result.added == ["C:\\b"]
+    assert json.loads(hive.read_text(encoding="utf-8"))[profiles.FAKE_HIVE_HOME] == "C:\\Users\\alice"
+
+
+def test_add_sees_entries_through_the_profile_home(tmp_path):
+    hive = write_hive(tmp_path, "alice", "%USERPROFILE%\\bin", home="C:\\Users\\alice")
+    [profile] = profiles.offline_profiles(str(tmp_path))
+
+    result = profiles.run_profile(profile, "add", ["C:\\Users\\alice\\bin"], use_cache=False)
+
+    assert result.error is None
+    assert result.added == []
+    assert json.loads(hive.read_text(encoding="utf-8"))["Path"][0] == "%USERPROFILE%\\bin"
@@ -0,0 +1,220 @@
+import fakereg
+import pytest
+import regfile
+
+
+SYSTEM_KEY = "HKEY_LOCAL_MACHINE\\SYSTEM\\CurrentControlSet\\Control\\Session Manager\\Environment"
+
+
+def hex_lines(name, text, type=2):
+    """Returns the lines regedit writes for a string value stored as hex(N)."""
+    tokens = [f"{byte:02x}" for byte in (text + "\0").encode("utf-16-le")]
+    lines = []
+    line = f'"{name}"=hex({type}):'
+    for i, token in enumerate(tokens):
+        token += "," if i < len(tokens) - 1 else ""
+        if len(line) + len(token) > 77:
+            lines.append(line + "\\")
+            line = "  "
+        line += token
+    return lines + [line]
+
+
+def export(tmp_path, system_path, user_path, utf16=True, name="image.reg"):
+    """Writes a small export: the Path values between other values that must survive unchanged."""
+    lines = [
+        "Windows Registry Editor Version 5.00" if utf16 else "REGEDIT4",
+        "",
+        "[HKEY_LOCAL_MACHINE\\SOFTWARE\\Vendor]",
+        '"Path"="C:\\\\Vendor\\\\not-an-environment-key"',
+        "",
+        f"[{SYSTEM_KEY}]",
+        *hex_lines("ComSpec", "%SystemRoot%\\system32\\cmd.exe"),
+        '"OS"="Windows_NT"',
+        *hex_lines("Path", system_path),
+        '"NUMBER_OF_PROCESSORS"="8"',
+        "",
+        "[HKEY_CURRENT_USER\\Environment]",
+        f'"Path"="{user_path.replace(chr(92), chr(92) * 2)}"',
+        '"TEMP"=hex(2):25,00,55,00,53,00,45,00,52,00,50,00,52,00,4f,00,46,00,49,00,4c,00,45,00,25,00,00,00',
+        "",
+    ]
+    text = "\r\n".join(lines) + "\r\n"
+    path = tmp_path / name
+    path.write_bytes(b"\xff\xfe" + text.encode("utf-16-le") if utf16 else text.encode("cp1252"))
+    return path
+
+
+def read_lines(path, utf16=True):
+    data = path.read_bytes()
+    return (data[2:].decode("utf-16-le") if utf16 else data.decode("cp1252")).split("\r\n")
+
+
+def value_lines(lines, key, name):
+    """Returns the (start, stop) line range of a value inside a key."""
+    start = lines.index(f"[{key}]") + 1
+    while not lines[start].startswith(f'"{name}"='):
+        start += 1
+    stop = start + 1
+    while lines[stop - 1].endswith("\\"):
+        stop += 1
+    return start, stop
+
+
+SYSTEM_PATH = "%SystemRoot%\\system32;%SystemRoot%;C:\\Program Files\\Git\\cmd;C:\\Program Files\\nodejs\\"
+
+
+def test_hex2_is_decoded_as_expand_sz():
+    data = "".join(line.rstrip("\\").strip() for line in hex_lines("Path", SYSTEM_PATH)).split("=", 1)[1]
+    assert regfile.parse_data(data) == (SYSTEM_PATH, fakereg.REG_EXPAND_SZ, True)
+
+
+def test_list_reads_utf16_and_continued_lines(tmp_path):
+    path = export(tmp_path, SYSTEM_PATH, "C:\\Users\\me\\bin;C:\\Tools")
+    original = path.read_bytes()
+
+    changes = regfile.edit(str(path), "list", environ={})
+
+    assert [(c.system, c.before) for c in changes] == [
+        (True, SYSTEM_PATH.split(";")),
+        (False, ["C:\\Users\\me\\bin", "C:\\Tools"]),
+    ]
+    # the Vendor key is not an Environment key
+    assert len(changes) == 2
+    assert path.read_bytes() == original
+
+
+def test_add_rewraps_hex2_and_leaves_other_bytes_alone(tmp_path):
+    path = export(tmp_path, SYSTEM_PATH, "C:\\Tools")
+    before = read_lines(path)
+
+    (change,) = regfile.edit(str(path), "add", ["C:\\Program Files\\PowerShell\\7"], scopes=[True], environ={})
+
+    assert change.added == ["C:\\Program Files\\PowerShell\\7"]
+    assert path.read_bytes()[:2] == b"\xff\xfe"
+    after = read_lines(path)
+    start, stop = value_lines(before, SYSTEM_KEY, "Path")
+    new_start, new_stop = value_lines(after, SYSTEM_KEY, "Path")
+    assert new_start == start
+    # every line outside the Path value is byte for byte the same
+    assert after[:start] == before[:start]
+    assert after[new_stop:] == before[stop:]
+    # still hex(2), wrapped to regedit's width with indented continuations
+    rewritten = after[new_start:new_stop]
+    assert rewritten[0].startswith('"Path"=hex(2):')
+    assert all(len(line) <= regfile.LINE_WIDTH for line in rewritten)
+    assert all(line.startswith("  ") for line in rewritten[1:])
+    assert all(line.endswith("\\") for line in rewritten[:-1])
+    data = regfile._joined([line + "\r\n" for line in rewritten]).split("=", 1)[1]
+    assert regfile.parse_data(data) == (SYSTEM_PATH + ";C:\\Program Files\\PowerShell\\7", fakereg.REG_EXPAND_SZ, True)
+
+
+def test_remove_keeps_the_string_form(tmp_path):
+    path = export(tmp_path, SYSTEM_PATH, "C:\\Users\\me\\bin;C:\\Tools;C:\\Old")
+    before = read_lines(path)
+
+    (change,) = regfile.edit(str(path), "remove", ["c:\\old\\"], scopes=[False], environ={})
+
+    assert change.removed == ["C:\\Old"]
+    after = read_lines(path)
+    start, stop = value_lines(before, "HKEY_CURRENT_USER\\Environment", "Path")
+    assert after[start] == '"Path"="C:\\\\Users\\\\me\\\\bin;C:\\\\Tools"'
+    assert after[:start] + after[start + 1:] == before[:start] + before[stop:]
+
+
+def test_dedup(tmp_path):
+    path = export(tmp_path, "C:\\Tools;c:\\tools\\;C:/Tools;C:\\Git", "C:\\a")
+
+    (change,) = regfile.edit(str(path), "dedup", scopes=[True], environ={})
+
+    assert change.after == ["C:\\Tools", "C:\\Git"]
+    (listed,) = regfile.edit(str(path), "list", scopes=[True], environ={})
+    assert listed.before == ["C:\\Tools", "C:\\Git"]
+
+
+def test_clean_looks_inside_the_mounted_image(tmp_path):
+    root = tmp_path / "image"
+    (root / "Tools").mkdir(parents=True)
+    (root / "Windows" / "system32").mkdir(parents=True)
+    path = export(tmp_path, "C:\\Windows\\system32;C:\\Gone", "%SystemRoot%\\system32;C:\\Tools;C:\\Missing")
+
+    changes = regfile.edit(str(path), "clean", root=str(root), environ={"SYSTEMROOT": "C:\\Windows"})
+
+    assert [c.removed for c in changes] == [["C:\\Gone"], ["C:\\Missing"]]
+
+
+def test_regedit4_files_are_ansi(tmp_path):
+    path = export(tmp_path, "C:\\Tools", "C:\\Caf\xe9", utf16=False)
+
+    (change,) = regfile.edit(str(path), "add", ["C:\\Bin"], scopes=[False], environ={})
+
+    assert change.after == ["C:\\Caf\xe9", "C:\\Bin"]
+    assert read_lines(path, utf16=False)[0] == "REGEDIT4"
+    assert '"Path"="C:\\\\Caf\xe9;C:\\\\Bin"' in read_lines(path, utf16=False)
+
+
+def test_unchanged_file_is_not_rewritten(tmp_path):
+    path = export(tmp_path, SYSTEM_PATH, "C:\\Tools")
+    original = path.read_bytes()
+    stat = path.stat()
+
+    regfile.edit(str(path), "add", ["C:\\Tools"], scopes=[False], environ={})
+
+    assert path.read_bytes() == original
+    assert path.stat().st_mtime_ns == stat.st_mtime_ns
+
+
+def test_output_and_dry_run(tmp_path):
+    path = export(tmp_path, SYSTEM_PATH, "C:\\Tools")
+    original = path.read_bytes()
+
+    regfile.edit(str(path), "add", ["C:\\Bin"], dry_run=True, environ={})
+    assert path.read_bytes() == original
+    regfile.edit(str(path), "add", ["C:\\Bin"], scopes=[False], output=str(tmp_path / "out.reg"), environ={})
+    assert path.read_bytes() == original
+    assert '"Path"="C:\\\\Tools;C:\\\\Bin"' in read_lines(tmp_path / "out.reg")
+
+
+def test_not_a_registry_export(tmp_path):
+    path = tmp_path / "notes.reg"
+    path.write_text("hello\r\n")
+    with pytest.raises(ValueError):
+        regfile.edit(str(path), "list")
+
+
+def test_clean_needs_the_mounted_image(tmp_path, monkeypatch, capsys):
+    import main
+
+    path = export(tmp_path, "%SystemRoot%\\system32;C:\\Windows", "C:\\Tools")
+    original = path.read_bytes()
+
+    with pytest.raises(ValueError):
+        regfile.edit(str(path), "clean", dry_run=True)
+    with pytest.raises(SystemExit) as exit:
+        main.run(*main.parse_args(["regfile", "clean", str(path), "--dry-run"]))
+
+    assert exit.value.code == 2
+    assert "--root" in capsys.readouterr().err
+    assert path.read_bytes() == original
+
+
+def test_clean_expands_against_the_image(tmp_path, monkeypatch):
+    monkeypatch.setenv("SystemRoot", str(tmp_path / "host"))
+    root = tmp_path / "image"
+    (root / "Windows" / "System32").mkdir(parents=True)
+    path = export(tmp_path, "%SystemRoot%\\system32;%SystemRoot%\\Gone", "%USERPROFILE%\\bin;%Nope%")
+
+    changes = regfile.edit(str(path), "clean", root=str(root))
+
+    assert [c.removed for c in changes] == [["%SystemRoot%\\Gone"], []]
+
+
+def test_clean_matches_names_case_insensitively(tmp_path):
+    root = tmp_path / "image"
+    (root / "Windows" / "System32").mkdir(parents=True)
+    path = export(tmp_path, "C:\\windows\\system32;C:\\WINDOWS;C:\\Windows\\Gone", "")
+
+    (change,) = regfile.edit(str(path), "clean", scopes=[True], root=str(root))
+
+    assert change.removed == ["C:\\Windows\\Gone"]
+    assert regfile.locate("C:\\WINDOWS\\system32", str(root)) == str(root / "Windows" / "System32")
@@ -0,0 +1,69 @@
+import resolve
+from resolve import ExecutableIndex, candidates, pathext
+
+
+def touch(directory, *names):
+    directory.mkdir(exist_ok=True)
+    for name in names:
+        (directory / name).write_text("")
+    return str(directory)
+
+
+def test_pathext_is_lowercased_deduplicated_and_dotted(monkeypatch):
+    assert pathext(".EXE;cmd;;.exe; .BAT ") == [".exe", ".cmd", ".bat"]
+    monkeypatch.delenv("PATHEXT", raising=False)
+    assert pathext() == pathext(resolve.DEFAULT_PATHEXT)
+
+
+def test_a_name_with_an_extension_is_only_tried_as_given():
+    extensions = [".com", ".exe"]
+
+    assert candidates("Git", extensions) == ["git.com", "git.exe"]
+    assert candidates("git.EXE", extensions) == ["git.exe"]
+    assert candidates("setup.py", extensions) == ["setup.py.com", "setup.py.exe"]
+
+
+def test_the_first_directory_wins_then_the_first_extension(tmp_path):
+    first = touch(tmp_path / "first", "tool.cmd")
+    second = touch(tmp_path / "second", "tool.exe", "tool.com", "readme.txt")
+    index = ExecutableIndex([first, second], lambda path: path, [".com", ".exe", ".cmd"])
+
+    assert index.find("tool").entry == first
+    assert [match.path.rsplit("/", 2)[-2:] for match in index.find_all("tool")] == [
+        ["first", "tool.cmd"], ["second", "tool.com"], ["second", "tool.exe"],
+    ]
+    assert index.find("tool.exe").entry == second
+    assert index.find("readme") is None
+
+
+def test_pathext_order_decides_within_a_directory(tmp_path):
+    directory = touch(tmp_path / "bin", "tool.exe", "tool.cmd")
+
+    assert index_of(directory, [".cmd", ".exe"]).find("tool").path.endswith("tool.cmd")
+    assert index_of(directory, [".exe", ".cmd"]).find("tool").path.endswith("tool.exe")
+
+
+def index_of(directory, extensions):
+    return ExecutableIndex([directory], lambda path: path, extensions)
+
+
+def test_empty_repeated_and_unreadable_entries(tmp_path):
+    bin = touch(tmp_path / "bin", "tool.exe")
+    missing = str(tmp_path / "missing")
+    index = ExecutableIndex([bin, "", bin + "/", missing], lambda path: path, [".exe"])
+
+    assert index.entries == [bin, missing]
+    assert index.positions == [0, None, 0, 1]
+    assert index.unreadable == [missing]
+    assert len(index.elapsed) == 2
+
+
+def test_listings_are_reused_while_the_directory_is_unchanged(tmp_path, monkeypatch):
+    directory = touch(tmp_path / "bin", "tool.exe")
+    monkeypatch.setattr(resolve, "listings", {})
+    index_of(directory, [".exe"])
+    calls = []
+    monkeypatch.setattr(resolve.os, "scandir", lambda path: calls.append(path))
+
+    assert index_of(directory, [".exe"]).find("tool") is not None
+    assert calls == []
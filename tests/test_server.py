@@ -0,0 +1,115 @@
+import os
+
+import fakereg
+import pytest
+import registry
+import server
+
+
+class Conn:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+    def output(self):
+        return "".join(data for kind, data in self.sent if kind == "stdout")
+
+
+class Client(Conn):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def send(self, request):
+        self.request = request
+
+    def recv(self):
+        return ("exit", 0)
+
+
+@pytest.fixture
+def running(monkeypatch):
+    monkeypatch.delenv("PATHCLEANER_NO_SERVER")
+    os.makedirs(os.path.dirname(server.state_file()), exist_ok=True)
+    open(server.state_file(), "w").close()
+
+
+def test_commands_run_with_the_client_environment(tmp_path, monkeypatch):
+    (tmp_path / "tool.cmd").write_text("")
+    (tmp_path / "tool.exe").write_text("")
+    monkeypatch.setattr(registry, "winreg", fakereg.seeded("", "%TOOLS%"))
+    monkeypatch.setenv("PATHEXT", ".EXE")
+    monkeypatch.delenv("TOOLS", raising=False)
+    environ = {**os.environ, "PATHEXT": ".CMD", "TOOLS": str(tmp_path)}
+    conn = Conn()
+
+    server._execute(conn, {"argv": ["which", "tool"], "cwd": str(tmp_path), "environ": environ})
+
+    assert conn.sent[-1] == ("exit", 0)
+    assert "tool.cmd" in conn.output().lower()
+    assert os.environ["PATHEXT"] == ".EXE"
+    assert "TOOLS" not in os.environ
+
+
+@pytest.mark.parametrize("argv", [
+    ["--trace", "out.json", "list"],
+    ["list", "--trace", "out.json"],
+    ["--stats", "list"],
+    ["which"],
+    ["which", "-"],
+    ["serve"],
+    ["add", "C:\\b"],
+    ["clean", "-s"],
+    ["remove", "-u", "-s", "C:\\b"],
+    ["dedup", "-us"],
+])
+def test_local_commands_are_not_forwarded(argv, running, monkeypatch):
+    monkeypatch.setattr(server, "_connect", lambda: pytest.fail("forwarded"))
+
+    assert server.forward(argv) is None
+
+
+def test_forwarded_requests_carry_the_environment(running, monkeypatch):
+    conn = Client()
+    monkeypatch.setattr(server, "_connect", lambda: conn)
+
+    assert server.forward(["list", "-u", "--format", "json"]) == 0
+    assert conn.request["argv"] == ["list", "-u", "--format", "json"]
+    assert conn.request["environ"] == dict(os.environ)
+
+
+def test_forward_does_not_parse_without_a_server(monkeypatch):
+    monkeypatch.delenv("PATHCLEANER_NO_SERVER")
+    monkeypatch.setattr(server, "parse_args", lambda argv: pytest.fail("parsed"))
+
+    assert server.forward(["list"]) is None
+
+
+def test_writes_start_from_fresh_values(monkeypatch):
+    reg = fakereg.seeded("", "C:\\a")
+    cached = server.CachedRegistry(reg, max_age=3600)
+    monkeypatch.setattr(registry, "winreg", cached)
+    request = {"cwd": os.getcwd(), "environ": dict(os.environ)}
+    server._execute(Conn(), {**request, "argv": ["list", "-u"]})
+    reg.set_value(fakereg.HKEY_CURRENT_USER, fakereg.USER_ENVIRONMENT, "Path", "C:\\a;C:\\Installer")
+
+    server._execute(Conn(), {**request, "argv": ["add", "-u", "C:\\b"]})
+
+    value = reg.get_value(fakereg.HKEY_CURRENT_USER, fakereg.USER_ENVIRONMENT, "Path")
+    assert value.split(";")[:2] == ["C:\\a", "C:\\Installer"]
+    assert value.endswith("C:\\b")
+
+
+def test_server_refuses_system_writes(monkeypatch):
+    reg = fakereg.seeded("C:\\a", "")
+    monkeypatch.setattr(registry, "winreg", reg)
+    conn = Conn()
+
+    server._execute(conn, {"argv": ["add", "-s", "C:\\b"], "cwd": os.getcwd(), "environ": dict(os.environ)})
+
+    assert conn.sent[-1] == ("exit", 1)
+    assert reg.get_value(fakereg.HKEY_LOCAL_MACHINE, fakereg.SYSTEM_ENVIRONMENT, "Path") == "C:\\a"
@@ -0,0 +1,153 @@
+import fakereg
+import main
+import pytest
+import registry
+from bench import InstrumentedWinreg
+from registry import PathManager
+
+
+def counting(system_path="", user_path=""):
+    """An in-memory registry that counts calls, seeded with both PATH values."""
+    reg = InstrumentedWinreg()
+    reg.set_value(fakereg.HKEY_LOCAL_MACHINE, fakereg.SYSTEM_ENVIRONMENT, "Path", system_path)
+    reg.set_value(fakereg.HKEY_CURRENT_USER, fakereg.USER_ENVIRONMENT, "Path", user_path)
+    reg.calls.clear()
+    return reg
+
+
+def test_many_edits_write_each_changed_scope_once():
+    reg = counting("C:\\Windows", "C:\\a;C:\\b")
+    with PathManager(reg, journal=False).session() as session:
+        for i in range(50):
+            session.add(f"C:\\tools\\{i}", system=False)
+        session.remove("C:\\a", system=False)
+        session.add("C:\\Windows", system=True)
+
+    assert reg.calls["SetValueEx"] == 1
+    assert reg.get_value(fakereg.HKEY_LOCAL_MACHINE, fakereg.SYSTEM_ENVIRONMENT, "Path") == "C:\\Windows"
+    user = reg.get_value(fakereg.HKEY_CURRENT_USER, fakereg.USER_ENVIRONMENT, "Path").split(";")
+    assert user[:2] == ["C:\\b", "C:\\tools\\0"] and len(user) == 51
+
+
+
+def test_membership_expands_the_registry_variables():
+    reg = counting("C:\\Windows", "%TOOLS%\\bin")
+    reg.set_value(fakereg.HKEY_CURRENT_USER, fakereg.USER_ENVIRONMENT, "TOOLS", "C:\\Tools")
+    reg.calls.clear()
+    with PathManager(reg, journal=False, environ={}).session() as session:
+        assert not session.add("C:\\Tools\\bin", system=False)
+        session.add("C:\\Other", system=True)
+        session.rollback()
+        assert session.has("c:\\tools\\bin\\", system=False)
+
+    assert reg.calls["SetValueEx"] == 0
+
+
+def test_the_self_reference_is_left_out_without_a_write():
+    reg = counting("C:\\Windows;%PATH%", "C:\\a")
+    with PathManager(reg, journal=False).session() as session:
+        assert session.paths(system=True).raw() == ["C:\\Windows"]
+        assert not session.changed(system=True)
+
+    assert reg.calls["SetValueEx"] == 0
+
+def test_an_exception_rolls_back_every_edit():
+    reg = counting("C:\\Windows", "C:\\a")
+    with pytest.raises(RuntimeError):
+        with PathManager(reg, journal=False).session() as session:
+            session.add("C:\\new", system=False)
+            session.remove("C:\\Windows", system=True)
+            raise RuntimeError
+
+    assert reg.calls["SetValueEx"] == 0
+    assert reg.get_value(fakereg.HKEY_CURRENT_USER, fakereg.USER_ENVIRONMENT, "Path") == "C:\\a"
+    assert reg.get_value(fakereg.HKEY_LOCAL_MACHINE, fakereg.SYSTEM_ENVIRONMENT, "Path") == "C:\\Windows"
+
+
+def test_a_failed_write_restores_the_scopes_already_written():
+    reg = counting("C:\\Windows", "C:\\a")
+    write = reg.SetValueEx
+
+    def fail_on_user(key, name, reserved, type, value):
+        if key.hkey == fakereg.HKEY_CURRENT_USER:
+            raise PermissionError(5, "Access is denied")
+        write(key, name, reserved, type, value)
+
+    reg.SetValueEx = fail_on_user
+    with pytest.raises(PermissionError):
+        with PathManager(reg, journal=False).session() as session:
+            session.add("C:\\sys", system=True)
+            session.add("C:\\usr", system=False)
+    assert reg.get_value(fakereg.HKEY_LOCAL_MACHINE, fakereg.SYSTEM_ENVIRONMENT, "Path") == "C:\\Windows"
+
+
+@pytest.fixture
+def cli(monkeypatch, tmp_path):
+    """Runs commands against a counting registry; existing entries are real directories."""
+    present = tmp_path / "present"
+    present.mkdir()
+    reg = counting(f"{present};{tmp_path / 'gone'}", f"{present};{tmp_path / 'missing'}")
+    monkeypatch.setattr(registry, "winreg", reg)
+
+    def run(*argv):
+        reg.calls.clear()
+        main.run(*main.parse_args(list(argv)))
+        return reg
+
+    run.present = present
+    run.root = tmp_path
+    return run
+
+
+def values(reg):
+    return (
+        reg.get_value(fakereg.HKEY_LOCAL_MACHINE, fakereg.SYSTEM_ENVIRONMENT, "Path"),
+        reg.get_value(fakereg.HKEY_CURRENT_USER, fakereg.USER_ENVIRONMENT, "Path"),
+    )
+
+
+def test_add_reads_and_writes_each_scope_once(cli):
+    added = [str(cli.root / name) for name in ("one", "two", "three")]
+    reg = cli("add", *added)
+
+    # one Environment key read and one write per scope
+    assert reg.calls["SetValueEx"] == 2
+    assert reg.calls["OpenKey"] == 4
+    # add normalizes separators to backslashes
+    assert all(value.endswith(";".join(added).replace("/", "\\")) for value in values(reg))
+
+
+def test_add_of_present_paths_writes_nothing(cli):
+    reg = cli("add", "-u", str(cli.present))
+    assert reg.calls["SetValueEx"] == 0
+
+
+def test_remove_writes_only_the_scopes_that_changed(cli):
+    reg = cli("remove", str(cli.root / "missing"), str(cli.present))
+
+    assert reg.calls["SetValueEx"] == 2
+    reg = cli("remove", "-u", str(cli.root / "missing"))
+    assert reg.calls["SetValueEx"] == 0
+
+
+def test_clean_removes_missing_entries_with_one_write_per_scope(cli):
+    reg = cli("clean", "--no-cache")
+
+    assert reg.calls["SetValueEx"] == 2
+    assert values(reg) == (str(cli.present), str(cli.present))
+    reg = cli("clean", "--no-cache")
+    assert reg.calls["SetValueEx"] == 0
+
+
+@pytest.mark.parametrize("helper, system", [
+    (lambda path: registry.add_to_user_path(path), False),
+    (lambda path: registry.add_to_system_path(path), True),
+    (lambda path: registry.add_to_path(path, system=False), False),
+])
+def test_module_helpers_do_not_add_duplicates(helper, system, monkeypatch):
+    reg = counting("C:\\Tools", "C:\\Tools")
+    monkeypatch.setattr(registry, "winreg", reg)
+
+    helper("c:\\tools\\")
+
+    assert reg.calls["SetValueEx"] == 0
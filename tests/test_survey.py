@@ -0,0 +1,72 @@
+import os
+import time
+
+import pytest
+
+import survey
+from checker import TIMEOUT
+from survey import classify
+
+EXTENSIONS = [".exe", ".cmd"]
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "tools").mkdir()
+    (tmp_path / "tools" / "tool.EXE").write_text("")
+    (tmp_path / "tools" / "tool.dll").write_text("")
+    (tmp_path / "libs").mkdir()
+    (tmp_path / "libs" / "lib.dll").write_text("")
+    (tmp_path / "libs" / "fake.exe").mkdir()
+    (tmp_path / "empty").mkdir()
+    (tmp_path / "file.txt").write_text("")
+    os.symlink(tmp_path / "gone", tmp_path / "link")
+    return tmp_path
+
+
+@pytest.mark.parametrize("name, status, executables, files", [
+    ("tools", survey.VALID, 1, 2),
+    ("libs", survey.NO_EXECUTABLES, 0, 2),
+    ("empty", survey.EMPTY, 0, 0),
+    ("missing", survey.MISSING, 0, 0),
+    ("file.txt", survey.NOT_A_DIRECTORY, 0, 0),
+    ("link", survey.BROKEN_LINK, 0, 0),
+])
+def test_classify(tree, name, status, executables, files):
+    report = classify(str(tree / name), EXTENSIONS)
+
+    assert (report.status, report.executables, report.files) == (status, executables, files)
+
+
+def test_an_empty_entry_is_missing():
+    assert classify("", EXTENSIONS).status == survey.MISSING
+
+
+def test_only_the_missing_and_the_empty_are_prunable():
+    assert survey.PRUNABLE == {survey.MISSING, survey.NOT_A_DIRECTORY, survey.BROKEN_LINK, survey.EMPTY}
+
+
+def test_survey_expands_and_keeps_the_raw_entries_in_order(tree):
+    paths = ['"%ROOT%/empty"', "%ROOT%/tools", "%ROOT%/missing"]
+    expand = lambda path: path.replace("%ROOT%", str(tree))
+
+    reports = list(survey.survey(paths, expand, EXTENSIONS))
+
+    assert [(r.path, r.status) for r in reports] == [
+        ('"%ROOT%/empty"', survey.EMPTY), ("%ROOT%/tools", survey.VALID), ("%ROOT%/missing", survey.MISSING),
+    ]
+
+
+def test_a_listing_past_its_deadline_times_out(tree, monkeypatch):
+    slow = str(tree / "tools")
+    real = survey.classify
+
+    def classify(path, extensions):
+        if path == slow:
+            time.sleep(0.5)
+        return real(path, extensions)
+
+    monkeypatch.setattr(survey, "classify", classify)
+    reports = list(survey.survey([slow, str(tree / "empty")], lambda path: path, EXTENSIONS, timeout=0.05))
+
+    assert [r.status for r in reports] == [TIMEOUT, survey.EMPTY]
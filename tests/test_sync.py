@@ -0,0 +1,45 @@
+import fakereg
+import main
+import registry
+from bench import InstrumentedWinreg
+from canon import canonical_key
+from sync import ScopeRule, plan
+
+
+def key(path):
+    return canonical_key(path, lambda p: p)
+
+
+def test_respelled_entries_are_in_sync():
+    rule = ScopeRule(["C:\\Windows\\system32"], ["C:\\Program Files\\Git\\cmd", "C:\\Tools"], True, [])
+    current = ["c:\\windows\\System32\\", "C:\\program files\\git\\cmd", "C:/Tools/"]
+
+    result = plan(True, current, rule, key, lambda p: p)
+
+    assert not result.changed
+    assert result.after == current
+
+
+def test_moved_entries_keep_their_spelling():
+    rule = ScopeRule([], ["C:\\A", "C:\\B"], True, [])
+
+    result = plan(True, ["c:\\b\\", "c:\\a", "C:\\extra"], rule, key, lambda p: p)
+
+    assert result.after == ["c:\\a", "c:\\b\\", "C:\\extra"]
+    assert result.moved == ["C:\\B"]
+    assert result.added == result.removed == []
+
+
+def test_sync_of_respelled_path_writes_nothing(tmp_path, monkeypatch, capsys):
+    manifest = tmp_path / "manifest.toml"
+    manifest.write_text('[user]\nentries = ["C:\\\\Tools", "C:\\\\Git\\\\cmd"]\n')
+    reg = InstrumentedWinreg()
+    reg.set_value(fakereg.HKEY_LOCAL_MACHINE, fakereg.SYSTEM_ENVIRONMENT, "Path", "C:\\Windows")
+    reg.set_value(fakereg.HKEY_CURRENT_USER, fakereg.USER_ENVIRONMENT, "Path", "c:\\tools\\;C:/Git/cmd")
+    reg.calls.clear()
+    monkeypatch.setattr(registry, "winreg", reg)
+
+    main.run(*main.parse_args(["sync", "-u", str(manifest)]))
+
+    assert reg.calls["SetValueEx"] == 0
+    assert "[IN SYNC]" in capsys.readouterr().out
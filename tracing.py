@@ -0,0 +1,157 @@
+"""Lightweight tracing of registry calls, filesystem probes and output.
+
+When a :class:`Tracer` is installed with :func:`install`, the instrumented
+call sites record one span per operation. Spans can be written as Chrome
+trace-event JSON (load the file in ``chrome://tracing`` or Perfetto), and
+per-category totals can be printed as a summary. With no tracer installed,
+:func:`span` returns a shared no-op context manager.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+REGISTRY = "registry"
+FILESYSTEM = "filesystem"
+OUTPUT = "output"
+CLI = "cli"
+
+_NULL = nullcontext()
+
+tracer: "Tracer | None" = None
+
+
+class Tracer:
+    """Collects spans and per-category call counts, bytes and time."""
+
+    def __init__(self, origin: float = None) -> None:
+        self.origin = time.perf_counter() if origin is None else origin
+        self.events: list[dict] = []
+        self.calls: dict[str, int] = {}
+        self.seconds: dict[str, float] = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+
+    def add(self, name: str, category: str, start: float, end: float, args: dict = None) -> None:
+        """Records a finished span. ``start`` and ``end`` come from ``time.perf_counter``."""
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start - self.origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+            self.calls[category] = self.calls.get(category, 0) + 1
+            self.seconds[category] = self.seconds.get(category, 0.0) + end - start
+
+    @contextmanager
+    def span(self, name: str, category: str, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, category, start, time.perf_counter(), args)
+
+    def write(self, filename: str) -> None:
+        """Writes the spans as Chrome trace-event JSON."""
+        import json
+
+        with self._lock:
+            events = list(self.events)
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def summary(self, command: str) -> str:
+        """Returns the per-category totals as printed by ``--stats``."""
+        lines = [f"stats for {command}:"]
+        for category, unit in ((REGISTRY, "calls"), (FILESYSTEM, "stats"), (OUTPUT, "writes"), (CLI, "spans")):
+            count = self.calls.get(category, 0)
+            ms = self.seconds.get(category, 0.0) * 1000
+            line = f"    {category:<11} {count:>6} {unit:<7} {ms:>10.2f} ms"
+            if category == REGISTRY:
+                line += f"   read {self.bytes_read} B, written {self.bytes_written} B"
+            lines.append(line)
+        lines.append(f"    {'wall':<11} {'':>6} {'':<7} {(time.perf_counter() - self.origin) * 1000:>10.2f} ms")
+        return "\n".join(lines)
+
+
+def install(new: "Tracer | None") -> None:
+    """Makes ``new`` the tracer used by :func:`span`. Pass None to stop tracing."""
+    global tracer
+    tracer = new
+
+
+def span(name: str, category: str, **args):
+    """Context manager recording a span on the installed tracer, if any."""
+    if tracer is None:
+        return _NULL
+    return tracer.span(name, category, **args)
+
+
+def _value_size(value) -> int:
+    # Registry strings are stored as UTF-16 with a terminating NUL.
+    if isinstance(value, str):
+        return (len(value) + 1) * 2
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return 4
+
+
+class TracedRegistry:
+    """Wraps a winreg-compatible object, recording a span for each call."""
+
+    def __init__(self, reg) -> None:
+        self._reg = reg
+
+    def __getattr__(self, name):
+        return getattr(self._reg, name)
+
+    def OpenKey(self, key, sub_key, *args):
+        with span("OpenKey", REGISTRY, key=sub_key):
+            return self._reg.OpenKey(key, sub_key, *args)
+
+    def QueryValueEx(self, key, name):
+        with span("QueryValueEx", REGISTRY, value=name):
+            value, type = self._reg.QueryValueEx(key, name)
+        if tracer is not None:
+            tracer.bytes_read += _value_size(value)
+        return value, type
+
+    def SetValueEx(self, key, name, reserved, type, value):
+        with span("SetValueEx", REGISTRY, value=name):
+            self._reg.SetValueEx(key, name, reserved, type, value)
+        if tracer is not None:
+            tracer.bytes_written += _value_size(value)
+
+    def EnumValue(self, key, index):
+        with span("EnumValue", REGISTRY):
+            value = self._reg.EnumValue(key, index)
+        if tracer is not None:
+            tracer.bytes_read += _value_size(value[1])
+        return value
+
+    def FlushKey(self, key):
+        with span("FlushKey", REGISTRY):
+            return self._reg.FlushKey(key)
+
+
+class TracedStream:
+    """Wraps a text stream, recording a span for each write."""
+
+    def __init__(self, stream) -> None:
+        self._stream = stream
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def write(self, text: str) -> int:
+        with span("write", OUTPUT):
+            return self._stream.write(text)